@@ -0,0 +1,106 @@
+""" Compares the batched NumPy kernels of the classic control envs with the gym envs
+
+    Reports env steps/sec of VectorGymSimulator with the 'sync' (gym) and
+    'batched' backends for a few numbers of envs, e.g.
+
+        python benchmarks/bench_batched.py --num-envs 1 64 4096 --steps 200
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import load_simulator_class, select_envs  # noqa: E402
+
+CLASSIC_CONTROL = ['CartPole', 'Pendulum', 'MountainCar']
+
+
+def random_actions(env, num_envs, rng):
+    """ Returns a batch of random gym actions for the env
+    """
+    values = env.actions['command']
+    if isinstance(values, tuple):
+        return rng.uniform(values[0], values[1], size=(num_envs, 1))
+    return rng.choice(values, size=num_envs)
+
+
+def run(env, simulator_class, backend, num_envs, steps, seed):
+    """ Steps num_envs envs for the given number of steps and returns env steps/sec
+    """
+    from gym_connectors import VectorGymSimulator
+
+    simulator = VectorGymSimulator(simulator_class, num_envs, backend=backend, base_seed=seed)
+    try:
+        rng = np.random.RandomState(seed)
+        actions = [random_actions(env, num_envs, rng) for _ in range(steps)]
+
+        simulator.episode_start()
+        started = perf_counter()
+        for action in actions:
+            simulator.episode_step(action)
+        elapsed = perf_counter() - started
+    finally:
+        simulator.close()
+
+    return num_envs * steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=CLASSIC_CONTROL)
+    parser.add_argument('--num-envs', nargs='*', type=int, default=[1, 64, 1024])
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--max-sync-envs', type=int, default=256,
+                        help="Larger numbers of envs are only run with the batched backend.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # the connector modules set their own log level when imported
+    import gym_connectors.gym_simulator  # noqa: F401
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('GymSimulator').setLevel(logging.WARNING)
+    os.environ['BONSAI_HEADLESS'] = 'True'
+
+    results = []
+    print("{:<12} {:>8} {:>16} {:>16} {:>10}".format('env', 'envs', 'gym steps/s', 'batched steps/s', 'speedup'))
+    for env in select_envs(args.envs):
+        try:
+            simulator_class = load_simulator_class(env)
+        except ImportError as err:
+            print("{:<12} skipped: {}".format(env.name, err))
+            continue
+
+        for num_envs in args.num_envs:
+            result = {"env": env.name, "num_envs": num_envs, "sync": None}
+            if num_envs <= args.max_sync_envs:
+                try:
+                    result["sync"] = run(env, simulator_class, 'sync', num_envs, args.steps, args.seed)
+                except Exception as err:
+                    print("{:<12} {:>8} gym backend failed: {}".format(env.name, num_envs, err))
+            try:
+                result["batched"] = run(env, simulator_class, 'batched', num_envs, args.steps, args.seed)
+            except Exception as err:
+                print("{:<12} {:>8} failed: {}".format(env.name, num_envs, err))
+                continue
+
+            results.append(result)
+            sync = "{:.0f}".format(result["sync"]) if result["sync"] else '-'
+            speedup = "{:.1f}x".format(result["batched"] / result["sync"]) if result["sync"] else '-'
+            print("{:<12} {:>8} {:>16} {:>16.0f} {:>10}".format(
+                env.name, num_envs, sync, result["batched"], speedup))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
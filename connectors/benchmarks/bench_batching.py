@@ -0,0 +1,96 @@
+""" Compares agents calling a local FakeBrain directly with agents going through
+    the batching proxy
+
+    Every agent is a thread running its own episode loop against the brain,
+    the brain answers a limited number of requests at a time like an exported
+    brain container would, e.g.
+
+        python benchmarks/bench_batching.py --agents 64 --steps 50 --latency 0.002 --concurrency 1
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import percentile  # noqa: E402
+
+
+def run_agents(url, args):
+    """ Runs the agents against the url and returns the predictions/sec and the latencies
+    """
+    from gym_connectors import PredictionClient
+
+    clients = [PredictionClient(url, name='bench') for _ in range(args.agents)]
+    latencies = [[] for _ in range(args.agents)]
+
+    def agent(index):
+        client = clients[index]
+        for step in range(args.steps):
+            started = perf_counter()
+            client.predict({"agent": index, "step": step})
+            latencies[index].append(perf_counter() - started)
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.agents) as executor:
+        list(executor.map(agent, range(args.agents)))
+    elapsed = perf_counter() - started
+
+    for client in clients:
+        client.close()
+    return args.agents * args.steps / elapsed, [latency for agent in latencies for latency in agent]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.002, help="Seconds the brain takes per request.")
+    parser.add_argument('--concurrency', type=int, default=1, help="Requests the brain evaluates at the same time.")
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    from gym_connectors import BatchingProxy, PredictionBatcher, PredictionClient
+    from gym_connectors.testing import FakeBrain
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('BatchingProxy').setLevel(logging.WARNING)
+    logging.getLogger('FakeBrain').setLevel(logging.WARNING)
+
+    results = []
+    print("{:<10} {:>14} {:>10} {:>10} {:>12}".format('mode', 'predictions/s', 'p50 ms', 'p99 ms', 'mean batch'))
+    with FakeBrain(latency=args.latency, concurrency=args.concurrency) as brain:
+        for mode in ('direct', 'proxy', 'batch'):
+            batcher = None
+            if mode == 'direct':
+                rate, latencies = run_agents(brain.url, args)
+            else:
+                client = PredictionClient(brain.url, pool_size=args.max_batch_size * 4, name='bench-proxy')
+                batcher = PredictionBatcher(client, brain.batch_url if mode == 'batch' else None,
+                                            args.max_batch_size, args.max_delay_ms / 1000.0, name=mode)
+                with BatchingProxy(batcher, port=0) as proxy:
+                    rate, latencies = run_agents(proxy.url, args)
+
+            result = {"mode": mode, "predictions_per_sec": rate,
+                      "p50": percentile(latencies, 0.50), "p99": percentile(latencies, 0.99)}
+            if batcher is not None:
+                result["stats"] = batcher.stats()
+            results.append(result)
+
+            mean_batch = "{:.1f}".format(result["stats"]["batch_size"]["mean"]) if batcher else '-'
+            print("{:<10} {:>14.0f} {:>10.2f} {:>10.2f} {:>12}".format(
+                mode, rate, result["p50"] * 1000, result["p99"] * 1000, mean_batch))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
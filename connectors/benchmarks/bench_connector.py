@@ -0,0 +1,127 @@
+""" Measures the hot path of the connector against a local FakeBonsaiService
+
+    Reports steps/sec and p50/p99 advance latency for every bundled env, e.g.
+
+        python benchmarks/bench_connector.py --episodes 20 --steps 200
+        python benchmarks/bench_connector.py --envs CartPole Hopper --latency 0.002
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import load_simulator_class, percentile, select_envs  # noqa: E402
+
+
+class TimedSession:
+    """ Wraps BonsaiSession.advance to record the latency of each call
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.latencies = []
+
+    def advance(self):
+        started = perf_counter()
+        event = self.session.advance()
+        self.latencies.append(perf_counter() - started)
+        return event
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def run_env(env, args):
+    """ Runs the scripted episodes for one env and returns the measurements
+    """
+    from microsoft_bonsai_api.simulator.client import BonsaiClient
+
+    from gym_connectors import BonsaiConnector, BonsaiSession, IdleScheduler
+    from gym_connectors.testing import EventScript, FakeBonsaiService, random_actions
+
+    simulator = load_simulator_class(env)()
+
+    script = EventScript(episodes=args.episodes, steps_per_episode=args.steps,
+                         action=random_actions(env.actions, seed=args.seed),
+                         latency=args.latency)
+
+    with FakeBonsaiService(script) as service:
+        config_client = service.client_config()
+        session = TimedSession(BonsaiSession(BonsaiConnector(simulator), BonsaiClient(config_client),
+                                             config_client, name=env.name))
+        session.register()
+
+        scheduler = IdleScheduler(name=env.name)
+        scheduler.add(session)
+
+        started = perf_counter()
+        scheduler.run()
+        elapsed = perf_counter() - started
+
+        steps = service.counts.get('EpisodeStep', 0)
+        episodes = service.counts.get('EpisodeFinish', 0)
+
+    return {
+        "env": env.name,
+        "steps": steps,
+        "episodes": episodes,
+        "seconds": elapsed,
+        "steps_per_sec": steps / elapsed if elapsed > 0 else 0.0,
+        "advance_p50_ms": percentile(session.latencies, 0.50) * 1000.0,
+        "advance_p99_ms": percentile(session.latencies, 0.99) * 1000.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=[], help="Envs to run, all bundled envs by default.")
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=200, help="Maximum steps per episode.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every advance.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args, _ = parser.parse_known_args()
+
+    # the connector modules set their own log level when imported, the package
+    # imports them on first use, so they are imported before the levels are set
+    import gym_connectors.bonsai_connector  # noqa: F401
+    import gym_connectors.bonsai_session  # noqa: F401
+    import gym_connectors.gym_simulator  # noqa: F401
+    import gym_connectors.idle_scheduler  # noqa: F401
+    import gym_connectors.testing  # noqa: F401
+
+    logging.basicConfig(level=logging.WARNING)
+    for name in ('GymSimulator', 'BonsaiConnector', 'BonsaiSession', 'IdleScheduler', 'FakeBonsaiService'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    # the simulators read it when they are created
+    os.environ['BONSAI_HEADLESS'] = 'True'
+
+    results = []
+    print("{:<12} {:>8} {:>10} {:>12} {:>12}".format('env', 'steps', 'steps/s', 'p50 ms', 'p99 ms'))
+    for env in select_envs(args.envs):
+        try:
+            result = run_env(env, args)
+        except ImportError as err:
+            print("{:<12} skipped: {}".format(env.name, err))
+            continue
+        except Exception as err:
+            print("{:<12} failed: {}".format(env.name, err))
+            continue
+
+        results.append(result)
+        print("{:<12} {:>8} {:>10.1f} {:>12.3f} {:>12.3f}".format(
+            result['env'], result['steps'], result['steps_per_sec'],
+            result['advance_p50_ms'], result['advance_p99_ms']))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
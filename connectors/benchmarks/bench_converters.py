@@ -0,0 +1,149 @@
+""" Compares the converters compiled from simulator_interface.json with the
+    hand-written conversions the envs used before
+
+    Reports the time per call of gym_to_state and action_to_gym. The action
+    times include the np.clip the continuous environments apply to the
+    action, which converts a list into a new array on every step, e.g.
+
+        python benchmarks/bench_converters.py --calls 200000
+"""
+import argparse
+import json
+import os
+import sys
+from timeit import timeit
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import BUNDLED_ENVS, env_folder  # noqa: E402
+from gym_connectors.converters import (compile_action_converter,  # noqa: E402
+                                       compile_state_converter, interface_fields)
+
+
+def cartpole_state(observation):
+    return {"cart_position": float(observation[0]),
+            "cart_velocity": float(observation[1]),
+            "pole_angle":    float(observation[2]),
+            "pole_angular_velocity": float(observation[3])}
+
+
+def command_action(action):
+    return action['command']
+
+
+def reacher_state(observation):
+    return {"target_x": float(observation[0]),
+            "target_y": float(observation[1]),
+            "to_target_x": float(observation[2]),
+            "to_target_y": float(observation[3]),
+            "cos_theta": float(observation[4]),
+            "sin_theta": float(observation[5]),
+            "theta_velocity": float(observation[6]),
+            "gama": float(observation[7]),
+            "gama_velocity": float(observation[8])}
+
+
+def reacher_action(action):
+    return [action['central_joint_torque'], action['elbow_joint_torque']]
+
+
+# the pybullet envs looked up the robot through the environment wrappers on every step
+_env = SimpleNamespace(unwrapped=SimpleNamespace(robot=SimpleNamespace(body_xyz=tuple(np.float32([0.1, 0.2, 1.2])))))
+_robot = _env.unwrapped.robot
+
+
+def hopper_state(observation):
+    x = float(_env.unwrapped.robot.body_xyz[0])
+    y = float(_env.unwrapped.robot.body_xyz[1])
+    z = float(_env.unwrapped.robot.body_xyz[2])
+    return {"obs": observation.tolist(), "rew": 0.0, "body_x": x, "body_y": y, "body_z": z}
+
+
+def hopper_compiled_extras(converter):
+    def gym_to_state(observation):
+        state = converter(observation)
+        x, y, z = _robot.body_xyz
+        state["body_x"] = float(x)
+        state["body_y"] = float(y)
+        state["body_z"] = float(z)
+        state["rew"] = 0.0
+        return state
+    return gym_to_state
+
+
+def hopper_action(action):
+    return [action['j1'], action['j2'], action['j3']]
+
+
+def discrete_env(action):
+    return action
+
+
+def continuous_env(action):
+    return np.clip(action, -1.0, 1.0)
+
+
+# env name -> (observation size, state mapping, action mapping,
+#              hand-written state and action conversions, how the env uses the action)
+CASES = {
+    'CartPole': (4, {"cart_position": 0, "cart_velocity": 1, "pole_angle": 2, "pole_angular_velocity": 3},
+                 {"command": None}, cartpole_state, command_action, discrete_env),
+    'Reacher': (9, {"target_x": 0, "target_y": 1, "to_target_x": 2, "to_target_y": 3, "cos_theta": 4,
+                    "sin_theta": 5, "theta_velocity": 6, "gama": 7, "gama_velocity": 8},
+                {"central_joint_torque": 0, "elbow_joint_torque": 1}, reacher_state, reacher_action,
+                continuous_env),
+    'Hopper': (15, {"obs": ...}, {"j1": 0, "j2": 1, "j3": 2}, hopper_state, hopper_action, continuous_env),
+}
+
+
+def run_case(name, calls):
+    """ Times the hand-written and the compiled conversions of one env
+    """
+    size, state_mapping, action_mapping, hand_state, hand_action, env_step = CASES[name]
+    env = next(env for env in BUNDLED_ENVS if env.name == name)
+
+    with open(os.path.join(env_folder(env), 'simulator_interface.json')) as file:
+        interface = json.load(file)
+
+    state_converter = compile_state_converter(interface_fields(interface, 'state'), state_mapping)
+    if name == 'Hopper':
+        state_converter = hopper_compiled_extras(state_converter)
+    action_converter = compile_action_converter(interface_fields(interface, 'action'), action_mapping)
+
+    observation = np.random.RandomState(0).uniform(-1.0, 1.0, size).astype(np.float32)
+    action = {field: 0.5 for field in action_mapping}
+
+    # both produce the same state
+    assert state_converter(observation) == hand_state(observation)
+
+    results = {}
+    for label, function, argument, consume in (
+            ('state hand-written', hand_state, observation, discrete_env),
+            ('state compiled', state_converter, observation, discrete_env),
+            ('action hand-written', hand_action, action, env_step),
+            ('action compiled', action_converter, action, env_step)):
+        seconds = timeit(lambda: consume(function(argument)), number=calls)
+        results[label] = seconds / calls * 1e9
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=list(CASES), help="Envs to compare.")
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    print("{:<10} {:>20} {:>20} {:>20} {:>20}".format(
+        'env', 'state hand ns', 'state compiled ns', 'action hand ns', 'action compiled ns'))
+    for name in args.envs:
+        results = run_case(name, args.calls)
+        print("{:<10} {:>20.0f} {:>20.0f} {:>20.0f} {:>20.0f}".format(
+            name, results['state hand-written'], results['state compiled'],
+            results['action hand-written'], results['action compiled']))
+
+
+if __name__ == '__main__':
+    main()
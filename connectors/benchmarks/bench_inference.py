@@ -0,0 +1,122 @@
+""" Compares the inference paths of a cross-entropy policy net
+
+    Reports the microseconds per observation of torch one step at a time
+    (as the trainer used to run it, with and without no_grad), torch on a
+    batch of observations and NumpyPolicy on one observation and on a batch.
+    Uses the net saved by cross_entropy_agent.py if given, random weights of
+    the same shape otherwise, e.g.
+
+        python benchmarks/bench_inference.py --model ../envs/classic_controls/CartPole/cartpole_net.npz
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def random_policy(obs_size, hidden_size, n_actions, seed):
+    """ Returns a NumpyPolicy with random weights in the layout of the trainer's Net
+    """
+    from gym_connectors import NumpyPolicy
+
+    rng = np.random.RandomState(seed)
+    weights = [rng.randn(hidden_size, obs_size) / np.sqrt(obs_size),
+               rng.randn(n_actions, hidden_size) / np.sqrt(hidden_size)]
+    biases = [np.zeros(hidden_size), np.zeros(n_actions)]
+    return NumpyPolicy(weights, biases, ["x{}".format(index) for index in range(obs_size)])
+
+
+def torch_net(policy):
+    """ Returns the torch equivalent of the policy, or None if torch is not installed
+    """
+    try:
+        import torch
+        import torch.nn as nn
+    except ImportError:
+        return None
+
+    layers = []
+    for index, (weight, bias) in enumerate(zip(policy.weights, policy.biases)):
+        linear = nn.Linear(*weight.shape)
+        with torch.no_grad():
+            linear.weight.copy_(torch.from_numpy(weight.T.copy()))
+            linear.bias.copy_(torch.from_numpy(bias))
+        layers.append(linear)
+        if index < len(policy.weights) - 1:
+            layers.append(nn.ReLU())
+    return nn.Sequential(*layers)
+
+
+def per_observation(function, inputs, count):
+    """ Returns the microseconds per observation of calling function on every input
+    """
+    started = perf_counter()
+    for value in inputs:
+        function(value)
+    return (perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help="Net saved by cross_entropy_agent.py.")
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    from gym_connectors import NumpyPolicy
+
+    policy = NumpyPolicy.load(args.model) if args.model else random_policy(4, 128, 2, args.seed)
+    obs_size = policy.weights[0].shape[0]
+
+    rng = np.random.RandomState(args.seed)
+    observations = rng.randn(args.steps, obs_size).astype(np.float32)
+    batches = [observations[start:start + args.batch_size]
+               for start in range(0, args.steps - args.batch_size + 1, args.batch_size)]
+    batched_count = len(batches) * args.batch_size
+    states = [dict(zip(policy.state_fields, observation.tolist())) for observation in observations]
+
+    results = {}
+    net = torch_net(policy)
+    if net is not None:
+        import torch
+
+        def torch_step(observation):
+            # what the trainer did before, a FloatTensor of a list and a forward pass with autograd
+            return torch.softmax(net(torch.FloatTensor([observation])), dim=1).data.numpy()[0]
+
+        def torch_no_grad_step(observation):
+            with torch.no_grad():
+                return torch.softmax(net(torch.from_numpy(observation[None])), dim=1).numpy()[0]
+
+        def torch_batch(batch):
+            with torch.no_grad():
+                return torch.softmax(net(torch.from_numpy(batch)), dim=1).numpy()
+
+        results["torch per step"] = per_observation(torch_step, observations, args.steps)
+        results["torch no_grad per step"] = per_observation(torch_no_grad_step, observations, args.steps)
+        results["torch batched"] = per_observation(torch_batch, batches, batched_count)
+    else:
+        print("torch is not installed, only the NumPy paths are measured")
+
+    results["numpy per step"] = per_observation(policy.probabilities, observations, args.steps)
+    results["numpy batched"] = per_observation(policy.probabilities, batches, batched_count)
+    results["numpy per step, Bonsai state"] = per_observation(policy, states, args.steps)
+
+    print("{:<32} {:>16}".format('path', 'us/observation'))
+    for name, value in results.items():
+        print("{:<32} {:>16.2f}".format(name, value))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+""" Measures the stepping speed of the bundled envs with a viewer attached
+
+    Reports the episode steps per second and the frames rendered and
+    dropped in --seconds, headless, rendering every frame while stepping (fps 0),
+    rendering at --fps while stepping, and from a render thread at --fps.
+    --delay adds a sleep to every render instead of drawing it, to stand
+    for the display without needing one, e.g.
+
+        python benchmarks/bench_render.py --envs CartPole MountainCar --fps 30 --delay 10
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from time import perf_counter, sleep
+
+import gym
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import load_simulator_class, select_envs  # noqa: E402
+
+MODES = ['headless', 'every frame', 'inline', 'thread']
+
+
+class SlowRender(gym.Wrapper):
+    """ Sleeps instead of rendering the environment
+    """
+
+    def __init__(self, env, delay):
+        super().__init__(env)
+        self.delay = delay
+
+    def render(self, *args, **kwargs):
+        sleep(self.delay)
+
+
+def random_actions(env, steps, rng):
+    """ Returns random Bonsai actions for the env
+    """
+    actions = []
+    for _ in range(steps):
+        action = {}
+        for name, values in env.actions.items():
+            if isinstance(values, tuple):
+                action[name] = float(rng.uniform(values[0], values[1]))
+            else:
+                action[name] = int(rng.choice(values))
+        actions.append(action)
+    return actions
+
+
+def run(simulator_class, mode, fps, delay, actions, seconds, seed):
+    """ Steps the simulator through the actions, again and again, in the
+        given render mode for the given seconds, starting a new episode when
+        one finishes, and returns the steps per second and the frames
+        rendered and dropped
+    """
+    class Simulator(simulator_class):
+        render_fps = 0 if mode == 'every frame' else fps
+        render_attributes = None if mode == 'inline' else simulator_class.render_attributes
+
+        def new_environment(self):
+            return SlowRender(super().new_environment(), delay)
+
+    simulator = Simulator()
+    simulator.seed(seed)
+    if mode != 'headless':
+        simulator._headless = False
+        simulator.start_rendering()
+
+    simulator.episode_start({})
+    steps = 0
+    started = perf_counter()
+    while perf_counter() - started < seconds:
+        simulator.episode_step(actions[steps % len(actions)])
+        steps += 1
+        if simulator.halted():
+            simulator.episode_finish("benchmark")
+            simulator.episode_start({})
+    steps_per_sec = steps / (perf_counter() - started)
+
+    renderer = simulator._renderer
+    simulator.stop_rendering()
+    if renderer is None:
+        return steps_per_sec, 0, 0
+    return steps_per_sec, renderer.rendered, renderer.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=['CartPole', 'MountainCar'])
+    parser.add_argument('--seconds', type=float, default=3.0, help="Seconds stepped in every render mode.")
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--delay', type=float, default=10.0, help="Milliseconds every render takes.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # the connector modules set their own log level when imported
+    import gym_connectors.gym_simulator  # noqa: F401
+
+    logging.basicConfig(level=logging.WARNING)
+    for name in ('GymSimulator', 'Renderer'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    os.environ['BONSAI_HEADLESS'] = 'True'
+
+    results = []
+    print("{:<12} {:<12} {:>12} {:>10} {:>10}".format('env', 'render', 'steps/s', 'rendered', 'dropped'))
+    for env in select_envs(args.envs):
+        try:
+            simulator_class = load_simulator_class(env)
+        except ImportError as err:
+            print("{:<12} skipped: {}".format(env.name, err))
+            continue
+
+        actions = random_actions(env, 1000, np.random.RandomState(args.seed))
+        for mode in MODES:
+            steps_per_sec, rendered, dropped = run(simulator_class, mode, args.fps, args.delay / 1e3,
+                                                   actions, args.seconds, args.seed)
+            result = {"env": env.name, "render": mode, "steps_per_sec": steps_per_sec,
+                      "rendered": rendered, "dropped": dropped}
+            results.append(result)
+            print("{:<12} {:<12} {:>12.0f} {:>10} {:>10}".format(env.name, mode, steps_per_sec, rendered, dropped))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
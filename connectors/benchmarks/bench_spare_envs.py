@@ -0,0 +1,119 @@
+""" Measures episode_start with spare environments reset in the background
+
+    Reports the median and 99th percentile of episode_start and the episodes
+    per second of the bundled envs for a few numbers of spare environments.
+    --reset-delay adds a sleep to every reset, to stand for the envs whose
+    reset costs more than the few microseconds of the classic control ones,
+    --step-delay a sleep to every step, to stand for the advance round trip
+    to the Bonsai service the spare environments are reset during, e.g.
+
+        python benchmarks/bench_spare_envs.py --envs CartPole --spares 0 1 2 --reset-delay 5 --step-delay 0.5
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from time import perf_counter, sleep
+
+import gym
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import load_simulator_class, percentile, select_envs  # noqa: E402
+
+
+class SlowReset(gym.Wrapper):
+    """ Sleeps before every reset of the environment
+    """
+
+    def __init__(self, env, delay):
+        super().__init__(env)
+        self.delay = delay
+
+    def reset(self, **kwargs):
+        sleep(self.delay)
+        return self.env.reset(**kwargs)
+
+
+def run(simulator_class, spares, episodes, steps, delay, step_delay, seed):
+    """ Runs the episodes and returns the episode_start latencies and the episodes per second
+    """
+    class Simulator(simulator_class):
+        def new_environment(self):
+            return SlowReset(super().new_environment(), delay)
+
+    simulator = Simulator()
+    if spares:
+        simulator.enable_spare_envs(spares)
+    simulator.seed(seed)
+
+    action_space = simulator._env.action_space
+    action_space.seed(seed)
+    actions = [action_space.sample() for _ in range(steps)]
+
+    latencies = []
+    started = perf_counter()
+    try:
+        for _ in range(episodes):
+            episode_started = perf_counter()
+            simulator.episode_start({})
+            latencies.append(perf_counter() - episode_started)
+
+            for action in actions:
+                if simulator.halted():
+                    break
+                simulator.gym_simulate(action)
+                if step_delay:
+                    sleep(step_delay)
+            simulator.episode_finish("benchmark")
+    finally:
+        simulator.disable_spare_envs()
+
+    return latencies, episodes / (perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=['CartPole', 'MountainCar'])
+    parser.add_argument('--spares', nargs='*', type=int, default=[0, 1, 2])
+    parser.add_argument('--episodes', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=20, help="Steps per episode at most.")
+    parser.add_argument('--reset-delay', type=float, default=5.0, help="Milliseconds added to every reset.")
+    parser.add_argument('--step-delay', type=float, default=0.5, help="Milliseconds added to every step.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # the connector modules set their own log level when imported
+    import gym_connectors.gym_simulator  # noqa: F401
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('GymSimulator').setLevel(logging.WARNING)
+    os.environ['BONSAI_HEADLESS'] = 'True'
+
+    results = []
+    print("{:<12} {:>8} {:>14} {:>14} {:>12}".format('env', 'spares', 'start p50 us', 'start p99 us', 'episodes/s'))
+    for env in select_envs(args.envs):
+        try:
+            simulator_class = load_simulator_class(env)
+        except ImportError as err:
+            print("{:<12} skipped: {}".format(env.name, err))
+            continue
+
+        for spares in args.spares:
+            latencies, episodes_per_sec = run(simulator_class, spares, args.episodes, args.steps,
+                                              args.reset_delay / 1e3, args.step_delay / 1e3, args.seed)
+            result = {"env": env.name, "spares": spares, "start_p50": percentile(latencies, 0.50),
+                      "start_p99": percentile(latencies, 0.99), "episodes_per_sec": episodes_per_sec}
+            results.append(result)
+            print("{:<12} {:>8} {:>14.1f} {:>14.1f} {:>12.1f}".format(
+                env.name, spares, result["start_p50"] * 1e6, result["start_p99"] * 1e6, episodes_per_sec))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
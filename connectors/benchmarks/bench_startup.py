@@ -0,0 +1,141 @@
+""" Measures the start-up time of the bundled envs against a tracked budget
+
+    Every start-up runs in a new process, like a new worker would, and
+    reports the seconds to import gym_connectors, to import the simulator
+    module, to create the simulator (with GYM_CONNECTORS_LAZY_ENV, until it
+    could register), to build its environment and to start the first
+    episode, and the wall time of the whole process. The medians are
+    compared with startup_budget.json, the script exits with 1 if any of
+    them is over budget. --update-budget writes the medians times
+    --headroom as the new budget of the envs measured, e.g.
+
+        python benchmarks/bench_startup.py --envs CartPole MountainCar --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import percentile, select_envs  # noqa: E402
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+STAGES = ['package', 'module', 'create', 'build', 'episode', 'total']
+# the budget of the stages that only take a few milliseconds, below that it is timer noise
+MIN_BUDGET = 0.05
+
+
+def child(name):
+    """ Runs in the new process, starts the simulator and prints the time of every stage as JSON
+    """
+    started = perf_counter()
+    os.environ['BONSAI_HEADLESS'] = 'True'
+    os.environ['GYM_CONNECTORS_LAZY_ENV'] = '1'
+
+    import logging
+    import gym_connectors  # noqa: F401
+    package = perf_counter()
+
+    from bundled_envs import load_simulator_class
+    simulator_class = load_simulator_class(select_envs([name])[0])
+    logging.getLogger('GymSimulator').setLevel(logging.WARNING)
+    module = perf_counter()
+
+    simulator = simulator_class()
+    created = perf_counter()
+
+    simulator.build_environment()
+    built = perf_counter()
+
+    simulator.episode_start({})
+    episode = perf_counter()
+
+    print(json.dumps({"package": package - started, "module": module - package, "create": created - module,
+                      "build": built - created, "episode": episode - built}))
+
+
+def start(name):
+    """ Starts a new process for the env and returns the time of its stages and its total wall time
+    """
+    started = perf_counter()
+    output = subprocess.run([sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--child', name],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+    total = perf_counter() - started
+    timings = json.loads(output.decode().strip().splitlines()[-1])
+    timings["total"] = total
+    return timings
+
+
+def over_budget(result, budget):
+    """ Returns the stages of the result that took longer than their budget
+    """
+    return [stage for stage, limit in budget.get(result["env"], {}).items()
+            if stage in result and result[stage] > limit]
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=[])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', default=BUDGET_FILE, help="Budget file, seconds per env and stage.")
+    parser.add_argument('--update-budget', action='store_true',
+                        help="Write the medians times --headroom to the budget file instead of checking them.")
+    parser.add_argument('--headroom', type=float, default=2.0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    budget = {}
+    if os.path.exists(args.budget):
+        with open(args.budget) as file:
+            budget = json.load(file)
+
+    results = []
+    failed = False
+    print(("{:<12}" + " {:>9}" * len(STAGES) + "  {}").format('env', *(stage + ' s' for stage in STAGES), 'budget'))
+    for env in select_envs(args.envs):
+        try:
+            runs = [start(env.name) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as err:
+            # the pybullet envs need pybullet-gym
+            print("{:<12} skipped: {}".format(env.name, err.stderr.decode().strip().splitlines()[-1]))
+            continue
+
+        result = {"env": env.name}
+        for stage in STAGES:
+            result[stage] = percentile([run[stage] for run in runs], 0.50)
+        result["over_budget"] = over_budget(result, budget)
+        failed = failed or bool(result["over_budget"])
+        results.append(result)
+
+        status = 'over: ' + ', '.join(result["over_budget"]) if result["over_budget"] else 'ok'
+        if env.name not in budget:
+            status = 'none'
+        print(("{:<12}" + " {:>9.3f}" * len(STAGES) + "  {}").format(
+            env.name, *(result[stage] for stage in STAGES), status))
+
+    if args.update_budget:
+        for result in results:
+            budget[result["env"]] = {stage: max(round(result[stage] * args.headroom, 3), MIN_BUDGET)
+                                     for stage in STAGES}
+        with open(args.budget, 'w') as file:
+            json.dump(budget, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print("Updated {}".format(args.budget))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if failed and not args.update_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+""" Measures the cost of recording the steps of a GymSimulator with TrajectoryRecorder
+
+    Reports the time per episode step of the bundled envs without and with a
+    recorder attached, and how fast the recording is streamed back by
+    TrajectoryReader, e.g.
+
+        python benchmarks/bench_trajectory.py --envs CartPole Hopper --steps 50000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bundled_envs import load_simulator_class, select_envs  # noqa: E402
+
+
+def random_actions(env, steps, rng):
+    """ Returns random Bonsai actions for the env
+    """
+    actions = []
+    for _ in range(steps):
+        action = {}
+        for name, values in env.actions.items():
+            if isinstance(values, tuple):
+                action[name] = float(rng.uniform(values[0], values[1]))
+            else:
+                action[name] = int(rng.choice(values))
+        actions.append(action)
+    return actions
+
+
+def run(simulator, actions, seed):
+    """ Steps the simulator through the actions, starting a new episode when one
+        finishes, and returns the seconds per step
+    """
+    simulator.seed(seed)
+    simulator.episode_start({})
+    started = perf_counter()
+    for action in actions:
+        simulator.episode_step(action)
+        if simulator.halted():
+            simulator.episode_finish("benchmark")
+            simulator.episode_start({})
+    return (perf_counter() - started) / len(actions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', nargs='*', default=['CartPole'])
+    parser.add_argument('--steps', type=int, default=50000)
+    parser.add_argument('--chunk-size', type=int, default=16384)
+    parser.add_argument('--repeat', type=int, default=5, help="The best of the repeats is reported.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # the connector modules set their own log level when imported
+    import gym_connectors.gym_simulator  # noqa: F401
+    from gym_connectors import TrajectoryReader, TrajectoryRecorder
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('GymSimulator').setLevel(logging.WARNING)
+    logging.getLogger('Trajectory').setLevel(logging.WARNING)
+    os.environ['BONSAI_HEADLESS'] = 'True'
+
+    results = []
+    print("{:<12} {:>14} {:>14} {:>10} {:>16}".format('env', 'us/step', 'recorded', 'overhead', 'read steps/s'))
+    for env in select_envs(args.envs):
+        try:
+            simulator = load_simulator_class(env)()
+        except ImportError as err:
+            print("{:<12} skipped: {}".format(env.name, err))
+            continue
+
+        actions = random_actions(env, args.steps, np.random.RandomState(args.seed))
+        folder = tempfile.mkdtemp(prefix='bench_trajectory_')
+        try:
+            plain = []
+            recorded = []
+            for _ in range(args.repeat):
+                simulator.attach_recorder(None)
+                plain.append(run(simulator, actions, args.seed))
+
+                path = os.path.join(folder, str(len(recorded)))
+                recorder = TrajectoryRecorder(path, args.chunk_size)
+                simulator.attach_recorder(recorder)
+                recorded.append(run(simulator, actions, args.seed))
+                recorder.close()
+            simulator.attach_recorder(None)
+
+            started = perf_counter()
+            steps = sum(len(episode.rewards) for episode in TrajectoryReader(path).episodes())
+            read = steps / (perf_counter() - started)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+        result = {"env": env.name, "step_seconds": min(plain), "recorded_step_seconds": min(recorded),
+                  "read_steps_per_sec": read}
+        result["overhead"] = result["recorded_step_seconds"] / result["step_seconds"] - 1
+        results.append(result)
+        print("{:<12} {:>14.2f} {:>14.2f} {:>9.1f}% {:>16.0f}".format(
+            env.name, result["step_seconds"] * 1e6, result["recorded_step_seconds"] * 1e6,
+            result["overhead"] * 100, read))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
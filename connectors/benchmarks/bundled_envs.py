@@ -0,0 +1,64 @@
+""" The environments bundled in envs/, shared by the benchmarks
+"""
+import importlib
+import os
+import sys
+from collections import namedtuple
+
+ENVS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'envs'))
+
+BundledEnv = namedtuple('BundledEnv', field_names=['name', 'folder', 'module', 'simulator', 'actions'])
+
+# actions map each action field to a list of discrete values or a (low, high) range
+BUNDLED_ENVS = [
+    BundledEnv('CartPole', 'classic_controls/CartPole', 'cartpole', 'CartPole',
+               {'command': [0, 1]}),
+    BundledEnv('Pendulum', 'classic_controls/Pendulum', 'pendulum', 'Pendulum',
+               {'command': (-2.0, 2.0)}),
+    BundledEnv('MountainCar', 'classic_controls/Mountain_Car', 'mountain_car', 'MountainCar',
+               {'command': [0, 1, 2]}),
+    BundledEnv('Hopper', 'pybullet/Hopper', 'hopper', 'Hopper',
+               {'j1': (-1.0, 1.0), 'j2': (-1.0, 1.0), 'j3': (-1.0, 1.0)}),
+    BundledEnv('HalfCheetah', 'pybullet/Half_Cheetah', 'half_cheetah', 'HalfCheetah',
+               {'j1': (-1.0, 1.0), 'j2': (-1.0, 1.0), 'j3': (-1.0, 1.0),
+                'j4': (-1.0, 1.0), 'j5': (-1.0, 1.0), 'j6': (-1.0, 1.0)}),
+    BundledEnv('Reacher', 'pybullet/reacher', 'reacher', 'Reacher',
+               {'central_joint_torque': (-1.0, 1.0), 'elbow_joint_torque': (-1.0, 1.0)}),
+]
+
+
+def select_envs(names):
+    """ Returns the bundled envs with the given names, all of them if names is empty
+    """
+    if not names:
+        return BUNDLED_ENVS
+    return [env for env in BUNDLED_ENVS if env.name in names]
+
+
+def env_folder(env: BundledEnv) -> str:
+    """ Returns the absolute path of the folder of the env
+    """
+    return os.path.join(ENVS_ROOT, env.folder)
+
+
+def load_simulator_class(env: BundledEnv):
+    """ Imports the simulator class of the env and makes its folder the working
+        directory, so that its simulator_interface.json can be found
+    """
+    folder = env_folder(env)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    os.chdir(folder)
+
+    module = importlib.import_module(env.module)
+    return getattr(module, env.simulator)
+
+
+def percentile(values, fraction: float) -> float:
+    """ Returns the given percentile (0.0 - 1.0) of the values, nearest rank
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
@@ -3,10 +3,76 @@
 """
 Simulator Interface Library.
 
+The names below are imported from their modules on first use, so that
+importing the package does not import aiohttp, the Bonsai client or gym
+before a connector or a simulator needs them.
 """
+import importlib as _importlib
+import sys as _sys
 
-# pyright: reportUnusedImport=false
-from .bonsai_connector import BonsaiConnector
-from .gym_simulator import GymSimulator
-#from .gym_pybullet_simulator import PyBulletSimulator
 from .version import __version__
+
+# name -> module of gym_connectors it is defined in
+_EXPORTS = {
+    'AsyncBonsaiConnector': 'async_bonsai_connector',
+    'BatchingProxy': 'batching_proxy',
+    'PredictionBatcher': 'batching_proxy',
+    'BonsaiConnector': 'bonsai_connector',
+    'BonsaiConnectorPool': 'bonsai_connector_pool',
+    'BonsaiSession': 'bonsai_session',
+    'evaluate': 'evaluation',
+    'EventRecorder': 'event_replay',
+    'ReplayDriver': 'event_replay',
+    'BatchedBackend': 'classic_control',
+    'BatchedCartPole': 'classic_control',
+    'BatchedMountainCar': 'classic_control',
+    'BatchedPendulum': 'classic_control',
+    'GymSimulator': 'gym_simulator',
+    'IdleScheduler': 'idle_scheduler',
+    'PyBulletSimulator': 'gym_pybullet_simulator',
+    'SimulatorLauncher': 'launcher',
+    'REGISTRY': 'metrics',
+    'MetricsRegistry': 'metrics',
+    'start_metrics_server': 'metrics',
+    'MetricsSink': 'metrics_sink',
+    'open_sink': 'metrics_sink',
+    'NumpyPolicy': 'numpy_policy',
+    'save_policy': 'numpy_policy',
+    'AsyncPredictionClient': 'prediction_client',
+    'PredictionClient': 'prediction_client',
+    'TRACE_BUFFER': 'tracing',
+    'disable_tracing': 'tracing',
+    'dump_traces': 'tracing',
+    'enable_tracing': 'tracing',
+    'get_tracer': 'tracing',
+    'TrajectoryReader': 'trajectory',
+    'TrajectoryRecorder': 'trajectory',
+    'VectorGymSimulator': 'vector_simulator',
+}
+
+# pybullet and pybullet-gym are optional, PyBulletSimulator is only imported by name
+_OPTIONAL = {'PyBulletSimulator'}
+
+__all__ = sorted(name for name in _EXPORTS if name not in _OPTIONAL) + ['__version__']
+
+
+def __getattr__(name):
+    """ Imports the module of name on first use (PEP 562)
+    """
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(_importlib.import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+if _sys.version_info < (3, 7):
+    # module __getattr__ needs python 3.7, python 3.6 imports the names with the package
+    for _name in __all__[:-1]:
+        __getattr__(_name)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import aiohttp
+from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
+
+from .bonsai_session import (_advance_seconds, _dispatch_seconds, _event_counter, _recoveries,
+                             _registrations, _state_seconds, _unregistrations)
+from .event_replay import open_event_recorder
+from .recovery import RetryPolicy, is_session_lost, is_transient_error
+from .tracing import dump_traces, get_tracer
+
+log = logging.getLogger("AsyncBonsaiConnector")
+log.setLevel(level='INFO')
+
+trace = get_tracer("AsyncBonsaiConnector")
+
+
+@contextmanager
+def _transport_errors():
+    """ Raises the aiohttp connection errors as ConnectionError,
+        so that they are retried like those of the Bonsai client
+    """
+    try:
+        yield
+    except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+        raise ConnectionError("{}".format(err)) from err
+
+
+class AsyncBonsaiSession:
+    """ A single registration of a simulator with the Bonsai service,
+        driven from an asyncio event loop
+
+        The blocking simulator methods run in an executor, so the network
+        wait of one session overlaps with the simulation step of another.
+        Errors are handled as in BonsaiSession, transient errors are retried
+        with backoff and a lost session is registered again in place, the
+        session waits for the retries on the event loop.
+    """
+
+    def __init__(self, simulator, http_session: aiohttp.ClientSession,
+                 config_client: BonsaiClientConfig, executor, name: str = '',
+                 retry_policy: RetryPolicy = None, max_recoveries: int = 10, recorder=None):
+        """ Initializes the session for the simulator, sharing the http session
+            (and its connection pool) with the other sessions. max_recoveries
+            limits the number of re-registrations without a successful advance
+            in between. The events received are written to the recorder if
+            given (see EventRecorder)
+        """
+        self.simulator = simulator
+        self.http_session = http_session
+        self.config_client = config_client
+        self.executor = executor
+        self.name = name
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.max_recoveries = max_recoveries
+        self.recorder = recorder
+
+        self.session_id = None
+        self.sequence_id = 1
+        self.registered = False
+        self.recoveries = 0
+        self.retries = 0
+        self.last_error = None
+
+    def sessions_url(self) -> str:
+        """ Returns the url of the simulator sessions of the workspace
+        """
+        return "{}/v2/workspaces/{}/simulatorSessions".format(
+            self.config_client.server.rstrip('/'), self.config_client.workspace)
+
+    async def call_simulator(self, method, *args):
+        """ Runs a blocking simulator method in the executor
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, method, *args)
+
+    async def register(self, retry: bool = True) -> None:
+        """ Registers the simulator with the Bonsai platform,
+            retrying transient errors with the retry policy if retry is set
+        """
+        interface = self.simulator.get_interface()
+
+        body = {
+            "name": interface['name'],
+            "timeout": interface['timeout'],
+            "simulatorContext": self.config_client.simulator_context,
+        }
+        attempt = 0
+        while True:
+            try:
+                with _transport_errors():
+                    async with self.http_session.post(self.sessions_url(), json=body) as response:
+                        response.raise_for_status()
+                        session = await response.json()
+                break
+            except Exception as err:
+                delay = self.retry_policy.retry_delay(err, attempt) if retry else None
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        self.session_id = session['sessionId']
+        self.sequence_id = 1
+        self.registered = True
+        _registrations.inc()
+
+        log.info("Registered simulator {}.".format(self.name))
+
+    async def advance(self) -> Dict[str, Any]:
+        """ Sends the current state of the simulator and returns the next event,
+            registering the session again first if it was lost (see recover()).
+            Tried once, see retry_delay()
+        """
+        if not self.registered:
+            await self.register(retry=False)
+            self.last_error = None
+            _recoveries.inc()
+
+        started = time.perf_counter()
+        body = {
+            "sequenceId": self.sequence_id,
+            "state": self.simulator.get_state(),
+            "halted": self.simulator.halted(),
+        }
+        url = "{}/{}/advance".format(self.sessions_url(), self.session_id)
+        sent = time.perf_counter()
+        with _transport_errors():
+            async with self.http_session.post(url, json=body) as response:
+                response.raise_for_status()
+                event = await response.json()
+
+        self.sequence_id = event['sequenceId']
+        self.recoveries = 0
+        self.retries = 0
+
+        received = time.perf_counter()
+        _state_seconds.observe(sent - started)
+        _advance_seconds.observe(received - sent)
+        _event_counter(event['type']).inc()
+
+        if self.recorder is not None:
+            self.recorder.record(event, self.name, received - sent)
+
+        if trace.enabled:
+            trace.trace("%s Last Event: %s sequence %s", self.name, event['type'], self.sequence_id)
+
+        return event
+
+    async def dispatch(self, event: Dict[str, Any]) -> bool:
+        """ Passes the event to the simulator.
+            Returns False once the session has been unregistered
+        """
+        event_type = event['type']
+        started = time.perf_counter()
+
+        if event_type == 'Idle':
+            # only this session waits, the others keep stepping
+            await asyncio.sleep(event['idle']['callbackTime'])
+        elif event_type == 'EpisodeStart':
+            await self.call_simulator(self.simulator.episode_start, event['episodeStart'].get('config'))
+        elif event_type == 'EpisodeStep':
+            await self.call_simulator(self.simulator.episode_step, event['episodeStep']['action'])
+        elif event_type == 'EpisodeFinish':
+            await self.call_simulator(self.simulator.episode_finish, "")
+        elif event_type == 'Unregister':
+            # asked by the platform, the session is never recovered from here
+            try:
+                await self.unregister()
+            except Exception as err:
+                log.warning("Could not unregister simulator {}: {}".format(self.name, err))
+            return False
+
+        if event_type != 'Idle':
+            _dispatch_seconds.observe(time.perf_counter() - started)
+        return True
+
+    def retry_delay(self, err: Exception) -> float:
+        """ Returns the number of seconds after which the advance that raised
+            the transient error is tried again, or None once the retry policy
+            gives up or if the error is not transient
+        """
+        delay = self.retry_policy.retry_delay(err, self.retries)
+        if delay is not None:
+            self.retries += 1
+        return delay
+
+    async def recover(self, err: Exception) -> bool:
+        """ Unregisters the session after the error, keeping the simulator, the
+            next advance registers it again. Returns False if the error is
+            not recoverable
+        """
+        self.last_error = err
+
+        if not (is_transient_error(err) or is_session_lost(err)):
+            return False
+        if self.recoveries >= self.max_recoveries:
+            log.error("Session {} gave up after {} recoveries.".format(self.name, self.recoveries))
+            return False
+
+        self.recoveries += 1
+        self.retries = 0
+        log.warning("Recovering session {} after error: {}".format(self.name, err))
+
+        # the old session may still be known by the service
+        try:
+            await self.unregister("{}".format(err))
+        except Exception as delete_err:
+            log.debug("Could not unregister lost session {}: {}".format(self.name, delete_err))
+        return True
+
+    def lost_connection(self) -> bool:
+        """ Returns True if the session stopped because the service could not be
+            reached, in which case it is worth registering the simulator again later
+        """
+        err = self.last_error
+        return err is not None and (is_transient_error(err) or is_session_lost(err))
+
+    async def step(self) -> bool:
+        """ Advances the session by one event and passes it to the simulator,
+            retrying or recovering the session after an error.
+            Returns False once the session has stopped
+        """
+        try:
+            return await self.dispatch(await self.advance())
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            delay = self.retry_delay(err)
+            if delay is not None:
+                # only this session waits, the others keep stepping
+                await asyncio.sleep(delay)
+                return True
+            if await self.recover(err):
+                return True
+
+            # Gracefully unregister for any other exceptions, the other sessions keep running
+            log.error("Session {} stopped: {}".format(self.name, err))
+            # the steps that led to the error, if tracing is enabled
+            dump_traces()
+            try:
+                await self.unregister("{}".format(err))
+            except Exception as delete_err:
+                log.warning("Could not unregister simulator {}: {}".format(self.name, delete_err))
+            return False
+
+    async def run(self) -> None:
+        """ Registers the simulator and processes the events until it is unregistered
+        """
+        try:
+            try:
+                await self.register()
+            except Exception as err:
+                log.error("Session {} could not register: {}".format(self.name, err))
+                self.last_error = err
+                return
+            while await self.step():
+                continue
+        except asyncio.CancelledError:
+            # Gracefully unregister when the connector is interrupted
+            await self.unregister()
+            raise
+
+    async def unregister(self, reason: str = '') -> None:
+        """ Unregisters the simulator from the Bonsai platform,
+            does nothing if the session is not registered
+        """
+        if not self.registered:
+            return
+
+        self.registered = False
+        _unregistrations.inc()
+        url = "{}/{}".format(self.sessions_url(), self.session_id)
+        with _transport_errors():
+            async with self.http_session.delete(url) as response:
+                response.raise_for_status()
+
+        if reason:
+            log.info("Unregistered simulator {} because: {}".format(self.name, reason))
+        else:
+            log.info("Unregistered simulator {}.".format(self.name))
+
+
+class AsyncBonsaiConnector:
+    """ Multiplexes the Bonsai sessions of several simulators on one asyncio event loop
+
+        All the sessions share one http connection pool with keep-alive,
+        and the simulators are stepped in a thread pool executor, so existing
+        GymSimulator subclasses can be used unchanged.
+    """
+
+    def __init__(self, simulators: List[Any], connection_limit: int = 100,
+                 keepalive_timeout: float = 60.0, executor=None,
+                 config_client: BonsaiClientConfig = None, record_events: str = None):
+        """ Initializes the connector with the simulators to register.
+            By default the simulators are stepped in a thread pool with
+            one thread per simulator, and the client configuration is read
+            from the environment variables and the command line. The events
+            of all the sessions are recorded to the record_events file, or
+            BONSAI_RECORD_EVENTS if set, see gym_connectors.event_replay
+        """
+        self.simulators = simulators
+        self.connection_limit = connection_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.executor = executor
+        self.config_client = config_client
+        self.record_events = record_events
+
+        self.sessions: List[AsyncBonsaiSession] = []
+
+    async def run_async(self) -> None:
+        """ Registers a session for each simulator and drives them until all of them
+            are unregistered
+        """
+        config_client = self.config_client or BonsaiClientConfig()
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": config_client.access_key,
+        }
+        executor = self.executor or ThreadPoolExecutor(max_workers=len(self.simulators))
+        recorder = open_event_recorder(self.record_events)
+
+        connector = aiohttp.TCPConnector(limit=self.connection_limit,
+                                         keepalive_timeout=self.keepalive_timeout)
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as http_session:
+            self.sessions = [AsyncBonsaiSession(simulator, http_session, config_client, executor,
+                                                name='#{}'.format(index), recorder=recorder)
+                             for index, simulator in enumerate(self.simulators)]
+
+            try:
+                await asyncio.gather(*[session.run() for session in self.sessions])
+            finally:
+                if executor is not self.executor:
+                    executor.shutdown(wait=False)
+                if recorder is not None:
+                    recorder.close()
+
+    def run(self) -> None:
+        """ Runs the sessions on a new event loop until all of them are unregistered
+            or the process is interrupted
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        task = loop.create_task(self.run_async())
+        try:
+            loop.run_until_complete(task)
+        except KeyboardInterrupt:
+            # cancelling the sessions unregisters them
+            task.cancel()
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+        finally:
+            loop.close()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import perf_counter
+from typing import Any, Dict, List
+
+import requests
+
+from .metrics import REGISTRY, start_metrics_server
+from .prediction_client import PredictionClient
+
+log = logging.getLogger("BatchingProxy")
+log.setLevel(level='INFO')
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _PendingPrediction:
+    """ A state waiting in the queue of the batcher, and the future of its action
+    """
+
+    __slots__ = ('state', 'queued', 'future')
+
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        self.queued = perf_counter()
+        self.future = Future()
+
+
+class PredictionBatcher:
+    """ Gathers the prediction requests of many callers and forwards them in batches
+
+        The first request of a batch waits at most max_delay seconds for
+        others to join it, a full batch is forwarded at once. While
+        max_in_flight batches are waiting for the brain, the next batch
+        keeps gathering requests until one of them is answered. With a
+        batch_url the batch is posted to the brain as one list of states,
+        otherwise its states are forwarded concurrently over the pooled
+        connections of the client. The answers are handed back to the
+        callers through their futures.
+    """
+
+    def __init__(self, client: PredictionClient = None, batch_url: str = None, max_batch_size: int = 32,
+                 max_delay: float = 0.002, max_in_flight: int = 4, name: str = 'proxy'):
+        """ Initializes the batcher and starts its dispatch thread, max_in_flight
+            is the number of batches forwarded at the same time
+        """
+        self.client = client or PredictionClient(pool_size=max_batch_size * max_in_flight, name=name)
+        self.batch_url = batch_url
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        # forwarded one state per task, or one batch per task with a batch_url
+        workers = max_in_flight if batch_url else max_batch_size * max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._queue: queue.Queue = queue.Queue()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._closed = False
+
+        labels = {"proxy": name}
+        self.requests = REGISTRY.counter('bonsai_proxy_requests_total', 'Prediction requests received by the proxy',
+                                         labels=labels)
+        self.errors = REGISTRY.counter('bonsai_proxy_errors_total', 'Prediction requests the proxy failed to answer',
+                                       labels=labels)
+        self.batch_size = REGISTRY.histogram('bonsai_proxy_batch_size', 'Number of states forwarded together',
+                                             labels=labels, buckets=BATCH_SIZE_BUCKETS)
+        self.queue_delay = REGISTRY.histogram('bonsai_proxy_queue_seconds',
+                                              'Time the requests waited for their batch to be forwarded',
+                                              labels=labels)
+        self.forward_latency = REGISTRY.histogram('bonsai_proxy_forward_seconds',
+                                                  'Round trip of the batches to the brain', labels=labels)
+
+        self._thread = threading.Thread(target=self._dispatch, name='PredictionBatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, state: Dict[str, Any]) -> Future:
+        """ Queues the state and returns the future of its action
+        """
+        if self._closed:
+            raise RuntimeError("The batcher is closed")
+
+        pending = _PendingPrediction(state)
+        self.requests.inc()
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, state: Dict[str, Any], timeout: float = None) -> Dict[str, Any]:
+        """ Returns the action of the brain for the state, waiting for its batch
+        """
+        return self.submit(state).result(timeout)
+
+    def _next_batch(self) -> List[_PendingPrediction]:
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = first.queued + self.max_delay
+        slot = False
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - perf_counter()
+            try:
+                pending = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                # past the deadline, keep gathering while the brain is busy with the other batches
+                slot = self._in_flight.acquire(timeout=self.max_delay)
+                if slot:
+                    break
+                continue
+            if pending is None:
+                # close() was called, forward what was gathered and stop after it
+                self._queue.put(None)
+                break
+            batch.append(pending)
+
+        if not slot:
+            self._in_flight.acquire()
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+
+            started = perf_counter()
+            self.batch_size.observe(len(batch))
+            for pending in batch:
+                self.queue_delay.observe(started - pending.queued)
+
+            if self.batch_url:
+                self._executor.submit(self._forward_batch, batch, started)
+            else:
+                remaining = [len(batch)]
+                lock = threading.Lock()
+                for pending in batch:
+                    self._executor.submit(self._forward, pending, started, remaining, lock)
+
+    def _forward(self, pending: _PendingPrediction, started: float, remaining: List[int],
+                 lock: threading.Lock) -> None:
+        try:
+            pending.future.set_result(self.client.predict(pending.state))
+        except Exception as err:
+            self.errors.inc()
+            pending.future.set_exception(err)
+        finally:
+            # the last answer of the batch frees its slot
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                self.forward_latency.observe(perf_counter() - started)
+                self._in_flight.release()
+
+    def _post_batch(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = self.client.session.post(self.batch_url, json=states, timeout=self.client.timeout)
+        response.raise_for_status()
+        actions = response.json()
+        if not isinstance(actions, list) or len(actions) != len(states):
+            raise ValueError("Expected {} actions from {}".format(len(states), self.batch_url))
+        return actions
+
+    def _forward_batch(self, batch: List[_PendingPrediction], started: float) -> None:
+        try:
+            actions = self.client.retry_policy.call(self._post_batch, [pending.state for pending in batch])
+        except Exception as err:
+            self.errors.inc(len(batch))
+            for pending in batch:
+                pending.future.set_exception(err)
+        else:
+            for pending, action in zip(batch, actions):
+                pending.future.set_result(action)
+        finally:
+            self.forward_latency.observe(perf_counter() - started)
+            self._in_flight.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """ Returns the request counts and the batch size and queue delay statistics
+        """
+        return {
+            "requests": self.requests.value,
+            "errors": self.errors.value,
+            "batches": self.batch_size.count,
+            "batch_size": self.batch_size.as_dict(),
+            "queue_seconds": self.queue_delay.as_dict(),
+            "forward_seconds": self.forward_latency.as_dict(),
+        }
+
+    def close(self) -> None:
+        """ Forwards the queued requests and stops the dispatch thread
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _BatchingProxyHandler(BaseHTTPRequestHandler):
+    """ Answers the prediction requests of the agents through the batcher
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def _reply(self, status: int, body: Any) -> None:
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _predict(self):
+        proxy = self.server.proxy
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = self.path.rstrip('/')
+
+        if path == proxy.stats_path:
+            self._reply(200, proxy.batcher.stats())
+            return
+        if path != proxy.path:
+            self._reply(404, {"title": "Not Found"})
+            return
+
+        try:
+            state = json.loads(body.decode('utf-8')) if body else {}
+            action = proxy.batcher.predict(state, timeout=proxy.timeout)
+        except ValueError as err:
+            self._reply(400, {"title": "Bad Request", "detail": str(err)})
+        except requests.exceptions.HTTPError as err:
+            status = err.response.status_code if err.response is not None else 502
+            self._reply(status, {"title": "Brain error", "detail": str(err)})
+        except Exception as err:
+            self._reply(502, {"title": "Bad Gateway", "detail": str(err)})
+        else:
+            self._reply(200, action)
+
+    do_GET = _predict
+    do_POST = _predict
+
+
+class BatchingProxy:
+    """ Serves the prediction endpoint of a brain to many local agents and
+        forwards their requests to the brain in batches
+
+        The agents are pointed at the proxy through BONSAI_PREDICTION_URL,
+        the batch statistics are served as JSON on stats_path.
+    """
+
+    def __init__(self, batcher: PredictionBatcher, host: str = '127.0.0.1', port: int = 5001,
+                 path: str = '/v1/prediction', stats_path: str = '/v1/proxy/stats', timeout: float = 30.0):
+        """ Initializes the proxy, port 0 picks a free port when started.
+            timeout is the number of seconds a request waits for its action
+        """
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.path = path
+        self.stats_path = stats_path
+        self.timeout = timeout
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        """ Returns the url of the prediction endpoint of the proxy
+        """
+        return "http://{}:{}{}".format(self.host, self.port, self.path)
+
+    def start(self) -> 'BatchingProxy':
+        """ Starts serving in a background thread
+        """
+        self._server = _ThreadingHTTPServer((self.host, self.port), _BatchingProxyHandler)
+        self._server.proxy = self
+        self.port = self._server.server_address[1]
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        log.info("Batching proxy listening on {}, forwarding to {}".format(
+            self.url, self.batcher.batch_url or self.batcher.client.url))
+        return self
+
+    def stop(self) -> None:
+        """ Stops serving and closes the batcher
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.batcher.close()
+        log.info("Batching proxy stopped: {}".format(json.dumps(self.batcher.stats())))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def parse_arguments(argv: List[str] = None):
+    """ Parses command line arguments of the proxy
+    """
+    parser = argparse.ArgumentParser(
+        description="Forwards the prediction requests of many agents to an exported brain in batches.")
+    parser.add_argument('--brain-url', default=None,
+                        help="Prediction endpoint of the brain, BONSAI_PREDICTION_URL or localhost:5000 by default.")
+    parser.add_argument('--batch-url', default=None,
+                        help="Endpoint taking a list of states, the states are forwarded one by one without it.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0,
+                        help="Time the first request of a batch waits for others to join it.")
+    parser.add_argument('--max-in-flight', type=int, default=4,
+                        help="Number of batches forwarded at the same time.")
+    parser.add_argument('--metrics-port', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point, e.g.
+
+        python -m gym_connectors.batching_proxy --port 5001 --max-batch-size 64
+    """
+    logging.basicConfig()
+    args = parse_arguments(argv)
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+
+    client = PredictionClient(args.brain_url, pool_size=args.max_batch_size * args.max_in_flight, name='proxy')
+    batcher = PredictionBatcher(client, args.batch_url, args.max_batch_size,
+                                args.max_delay_ms / 1000.0, args.max_in_flight)
+    proxy = BatchingProxy(batcher, args.host, args.port).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+
+
+if __name__ == "__main__":
+    main()
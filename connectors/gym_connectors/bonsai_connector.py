@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 import logging
-import time
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict
 
-from microsoft_bonsai_api.simulator.client import BonsaiClient, BonsaiClientConfig
-from microsoft_bonsai_api.simulator.generated.models import (SimulatorInterface,
-                                                   SimulatorState)
+from .event_replay import open_event_recorder
+from .idle_scheduler import IdleScheduler
+from .metrics import serve_metrics
+from .tracing import install_dump_signal
+
+if TYPE_CHECKING:
+    from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
 
 log = logging.getLogger("BonsaiConnector")
 log.setLevel(level='INFO')
@@ -29,10 +32,19 @@ class BonsaiConnector:
         episode_finish(self, reason: str) -> None:
     """
 
-    def __init__(self, simulator):
-        """ Initialize the BonsaiConnector and accepts the simulator
+    def __init__(self, simulator, config_client: 'BonsaiClientConfig' = None, metrics_port: int = None,
+                 record_events: str = None):
+        """ Initialize the BonsaiConnector and accepts the simulator.
+            By default the client configuration is read from the environment
+            variables and the command line. The metrics are served on
+            metrics_port, or BONSAI_METRICS_PORT if set in the environment.
+            The events received are recorded to the record_events file, or
+            BONSAI_RECORD_EVENTS if set, see gym_connectors.event_replay
         """
         self.simulator = simulator
+        self.config_client = config_client
+        self.metrics_port = metrics_port
+        self.record_events = record_events
 
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the simulator
@@ -66,77 +78,38 @@ class BonsaiConnector:
         """
         self.simulator.episode_finish(reason)
 
-    def run(self):
+    def run(self) -> bool:
         """ Connects to the Bonsai service processes the command and passes them to the simulator
+
+            Returns True if the session was lost because the service could not be reached,
+            so that running the connector again registers the same, already built,
+            simulator: while connector.run(): continue
         """
-        config_client = BonsaiClientConfig()
-        client = BonsaiClient(config_client)
+        # the Bonsai client is imported when connecting, not with the package
+        from microsoft_bonsai_api.simulator.client import BonsaiClient, BonsaiClientConfig
+        from .bonsai_session import BonsaiSession
 
-        # Load json file as simulator integration config type file
-        interface = self.get_interface()
+        serve_metrics(self.metrics_port)
+        install_dump_signal()
 
-        simulator_interface = SimulatorInterface(
-            name = interface['name'],
-            timeout = interface['timeout'],
-            simulator_context = config_client.simulator_context,
-        )
+        config_client = self.config_client or BonsaiClientConfig()
+        client = BonsaiClient(config_client)
 
         # Registers a simulator with Bonsai platform
-        session = client.session.create(
-            workspace_name = config_client.workspace,
-            body = simulator_interface
-        )
-
-        log.info("Registered simulator.")
-        sequence_id = 1
-
+        recorder = open_event_recorder(self.record_events)
+        session = BonsaiSession(self, client, config_client, recorder=recorder)
         try:
-            while True:
-                # Advance by the new state depending on the event type
-
-                simulator_state = SimulatorState(
-                    sequence_id =sequence_id, 
-                    state = self.get_state(),
-                    halted = self.halted()
-                )
-                event = client.session.advance(
-                    workspace_name = config_client.workspace,
-                    session_id = session.session_id, 
-                    body = simulator_state
-                )
-                sequence_id = event.sequence_id
-                
-                log.debug("[{}] Last Event: {}".format(time.strftime('%H:%M:%S'), event.type))
-
-                # Event loop
-                if event.type == 'Idle':
-                    time.sleep(event.idle.callback_time)
-                    log.info('Idling...')
-                elif event.type == 'EpisodeStart':
-                    self.episode_start(event.episode_start.config)
-                elif event.type == 'EpisodeStep':
-                    self.episode_step(event.episode_step.action)
-                elif event.type == 'EpisodeFinish':
-                    self.episode_finish("")
-                elif event.type == 'Unregister':
-                    client.session.delete(
-                        workspace_name = config_client.workspace,
-                        session_id = session.session_id
-                    )
-                    log.info("Unregistered simulator.")
-                else:
-                    pass
-        except KeyboardInterrupt:
-            # Gracefully unregister with keyboard interrupt
-            client.session.delete(
-                workspace_name =config_client.workspace,
-                session_id = session.session_id
-            )
-            log.info("Unregistered simulator.")
-        except Exception as err:
-            # Gracefully unregister for any other exceptions
-            client.session.delete(
-                workspace_name = config_client.workspace,
-                session_id = session.session_id
-            )
-            log.info("Unregistered simulator because: {}".format(err))
+            session.register()
+
+            # the scheduler unregisters the session on errors and when it is interrupted
+            scheduler = IdleScheduler()
+            scheduler.add(session)
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                return False
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+        return session.lost_connection()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
+
+from .bonsai_connector import BonsaiConnector
+from .event_replay import open_event_recorder
+from .idle_scheduler import IdleScheduler
+from .metrics import serve_metrics
+from .tracing import install_dump_signal
+
+if TYPE_CHECKING:
+    from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
+
+    from .bonsai_session import BonsaiSession
+
+log = logging.getLogger("BonsaiConnectorPool")
+log.setLevel(level='INFO')
+
+
+class BonsaiConnectorPool:
+    """ Registers several simulator instances with the Bonsai service
+        from a single process and drives them concurrently
+
+        Every simulator is built by calling the simulator factory (usually
+        the simulator class itself) and gets its own Bonsai session, with its
+        own sequence id, halted flag, seed and unregister path.
+    """
+
+    def __init__(self, simulator_factory: Callable[[], Any], size: int, base_seed: int = 0,
+                 threads: int = None, config_client: 'BonsaiClientConfig' = None,
+                 metrics_port: int = None, record_events: str = None):
+        """ Initializes the pool, size is the number of simulator instances
+            and sessions. The simulator at index i is seeded with base_seed + i,
+            with base_seed None the simulators keep the seed they were built with.
+
+            The sessions are spread over the given number of threads (one per
+            session by default), each thread parks its idle sessions and keeps
+            stepping the active ones. By default the client configuration is read
+            from the environment variables and the command line. The metrics are
+            served on metrics_port, or BONSAI_METRICS_PORT if set in the environment.
+            The events of all the sessions are recorded to the record_events
+            file, or BONSAI_RECORD_EVENTS if set, see gym_connectors.event_replay
+        """
+        self.simulator_factory = simulator_factory
+        self.size = size
+        self.base_seed = base_seed
+        self.threads = min(threads or size, size)
+        self.config_client = config_client
+        self.metrics_port = metrics_port
+        self.record_events = record_events
+
+        self.simulators: List[Any] = []
+        self.sessions: List['BonsaiSession'] = []
+        self.schedulers: List[IdleScheduler] = []
+
+    def make_simulators(self) -> None:
+        """ Builds the simulator instances, one after another,
+            since gym environments are not guaranteed to be thread safe while created
+        """
+        while len(self.simulators) < self.size:
+            index = len(self.simulators)
+            simulator = self.simulator_factory()
+
+            if self.base_seed is not None:
+                simulator.seed(self.base_seed + index)
+            # the lazy environments are built here too, not by the session threads
+            build_environment = getattr(simulator, 'build_environment', None)
+            if build_environment is not None:
+                build_environment()
+
+            self.simulators.append(simulator)
+
+    def run(self) -> bool:
+        """ Registers a session for each simulator and drives them until all of them
+            are unregistered or the process is interrupted
+
+            Returns True if any session was lost because the service could not be
+            reached, running the pool again registers the same simulators again
+        """
+        # the Bonsai client is imported when connecting, not with the package
+        from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
+
+        serve_metrics(self.metrics_port)
+        install_dump_signal()
+        self.make_simulators()
+
+        config_client = self.config_client or BonsaiClientConfig()
+        recorder = open_event_recorder(self.record_events)
+        try:
+            return self._run_sessions(config_client, recorder)
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+    def _run_sessions(self, config_client: 'BonsaiClientConfig', recorder) -> bool:
+        """ Registers a session for each simulator and drives them from the worker threads
+        """
+        from microsoft_bonsai_api.simulator.client import BonsaiClient
+        from .bonsai_session import BonsaiSession
+
+        self.sessions = []
+        for index, simulator in enumerate(self.simulators):
+            # each session gets its own client, the clients are not shared between threads
+            client = BonsaiClient(config_client)
+            session = BonsaiSession(BonsaiConnector(simulator), client, config_client,
+                                    name='#{}'.format(index), recorder=recorder)
+            self.sessions.append(session)
+
+        self.schedulers = [IdleScheduler(name='#{}'.format(index)) for index in range(self.threads)]
+        threads = [threading.Thread(target=self._drive, args=(index,), daemon=True)
+                   for index in range(self.threads)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                # join with a timeout so that KeyboardInterrupt is delivered to the main thread
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            # Gracefully unregister all the sessions with keyboard interrupt
+            self.stop()
+            for thread in threads:
+                thread.join()
+            return False
+
+        return any(session.lost_connection() for session in self.sessions)
+
+    def stop(self) -> None:
+        """ Asks all the sessions to unregister after their current event
+        """
+        for scheduler in self.schedulers:
+            scheduler.stop()
+
+    def utilization(self) -> List[Dict[str, Any]]:
+        """ Returns how the wall time of each worker thread was spent
+        """
+        return [scheduler.utilization.report() for scheduler in self.schedulers]
+
+    def _drive(self, index: int) -> None:
+        """ Registers the sessions assigned to the worker thread and runs its scheduler
+        """
+        scheduler = self.schedulers[index]
+
+        for session in self.sessions[index::self.threads]:
+            try:
+                session.register()
+                scheduler.add(session)
+            except Exception as err:
+                log.error("Session {} could not register: {}".format(session.name, err))
+                session.last_error = err
+
+        scheduler.run()
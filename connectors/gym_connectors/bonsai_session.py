@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+import functools
+import logging
+import time
+
+from microsoft_bonsai_api.simulator.generated.models import (SimulatorInterface,
+                                                   SimulatorState)
+
+from .metrics import REGISTRY
+from .recovery import RetryPolicy, is_session_lost, is_transient_error
+from .tracing import get_tracer
+
+log = logging.getLogger("BonsaiSession")
+log.setLevel(level='INFO')
+
+trace = get_tracer("BonsaiSession")
+
+_state_seconds = REGISTRY.histogram(
+    'bonsai_state_seconds', 'Time to collect the simulator state sent with advance')
+_advance_seconds = REGISTRY.histogram(
+    'bonsai_advance_seconds', 'Round trip of the advance call, including serialization')
+_dispatch_seconds = REGISTRY.histogram(
+    'bonsai_dispatch_seconds', 'Time the simulator spent handling an event')
+_registrations = REGISTRY.counter(
+    'bonsai_registrations_total', 'Sessions registered with the Bonsai service')
+_unregistrations = REGISTRY.counter(
+    'bonsai_unregistrations_total', 'Sessions unregistered from the Bonsai service')
+_recoveries = REGISTRY.counter(
+    'bonsai_recoveries_total', 'Sessions re-registered in place after an error')
+
+
+_event_counters = {}
+
+
+def _event_counter(event_type: str):
+    """ Returns the counter of the events of the given type
+    """
+    counter = _event_counters.get(event_type)
+    if counter is None:
+        counter = REGISTRY.counter('bonsai_events_total', 'Events received from the Bonsai service',
+                                   {'type': event_type})
+        _event_counters[event_type] = counter
+    return counter
+
+
+class BonsaiSession:
+    """ A single registration of a simulator with the Bonsai service
+
+        The session keeps its own session id, sequence id and unregister path,
+        so several sessions can be driven from the same process without
+        sharing any state. The simulator has to implement the same methods
+        as the one passed to the BonsaiConnector.
+
+        Transient transport errors are retried with backoff, and when the
+        session is lost it is registered again in place, keeping the simulator
+        and its environment warm. The advance and the registration in place
+        are tried once per call, the IdleScheduler driving the session waits
+        for the retries on its timer heap, so that the other sessions of the
+        thread keep stepping meanwhile.
+    """
+
+    def __init__(self, simulator, client, config_client, name: str = '',
+                 retry_policy: RetryPolicy = None, max_recoveries: int = 10, recorder=None):
+        """ Initializes the session for the simulator, using the given
+            Bonsai client and client configuration. max_recoveries limits
+            the number of re-registrations without a successful advance in between.
+            The events received are written to the recorder if given (see EventRecorder)
+        """
+        self.simulator = simulator
+        self.client = client
+        self.config_client = config_client
+        self.name = name
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.max_recoveries = max_recoveries
+        self.recorder = recorder
+
+        self.session_id = None
+        self.sequence_id = 1
+        self.registered = False
+        self.recoveries = 0
+        self.retries = 0
+        self.last_error = None
+
+    def register(self, retry: bool = True) -> None:
+        """ Registers the simulator with the Bonsai platform,
+            retrying transient errors with the retry policy if retry is set
+        """
+        # Load json file as simulator integration config type file
+        interface = self.simulator.get_interface()
+
+        simulator_interface = SimulatorInterface(
+            name = interface['name'],
+            timeout = interface['timeout'],
+            simulator_context = self.config_client.simulator_context,
+        )
+
+        create = self.client.session.create
+        if retry:
+            create = functools.partial(self.retry_policy.call, create)
+        session = create(
+            workspace_name = self.config_client.workspace,
+            body = simulator_interface
+        )
+
+        self.session_id = session.session_id
+        self.sequence_id = 1
+        self.registered = True
+        _registrations.inc()
+
+        log.info("Registered simulator {}.".format(self.name))
+
+    def advance(self):
+        """ Sends the current state of the simulator and returns the next event,
+            registering the session again first if it was lost (see recover()).
+            Tried once, see retry_delay()
+        """
+        if not self.registered:
+            self.register(retry=False)
+            self.last_error = None
+            _recoveries.inc()
+
+        started = time.perf_counter()
+        simulator_state = SimulatorState(
+            sequence_id = self.sequence_id,
+            state = self.simulator.get_state(),
+            halted = self.simulator.halted()
+        )
+        sent = time.perf_counter()
+        event = self.client.session.advance(
+            workspace_name = self.config_client.workspace,
+            session_id = self.session_id,
+            body = simulator_state
+        )
+        self.sequence_id = event.sequence_id
+        self.recoveries = 0
+        self.retries = 0
+
+        received = time.perf_counter()
+        _state_seconds.observe(sent - started)
+        _advance_seconds.observe(received - sent)
+        _event_counter(event.type).inc()
+
+        if self.recorder is not None:
+            self.recorder.record(event, self.name, received - sent)
+
+        if trace.enabled:
+            trace.trace("%s Last Event: %s sequence %s", self.name, event.type, self.sequence_id)
+
+        return event
+
+    def dispatch(self, event) -> bool:
+        """ Passes the event to the simulator.
+            Returns False once the session has been unregistered
+
+            Idle events are not waited on here, the caller parks the session
+            for event.idle.callback_time (see IdleScheduler)
+        """
+        started = time.perf_counter()
+
+        if event.type == 'Idle':
+            log.debug('Idling...')
+        elif event.type == 'EpisodeStart':
+            self.simulator.episode_start(event.episode_start.config)
+        elif event.type == 'EpisodeStep':
+            self.simulator.episode_step(event.episode_step.action)
+        elif event.type == 'EpisodeFinish':
+            self.simulator.episode_finish("")
+        elif event.type == 'Unregister':
+            # asked by the platform, the session is never recovered from here
+            try:
+                self.unregister()
+            except Exception as err:
+                log.warning("Could not unregister simulator {}: {}".format(self.name, err))
+            return False
+
+        _dispatch_seconds.observe(time.perf_counter() - started)
+        return True
+
+    def retry_delay(self, err: Exception) -> float:
+        """ Returns the number of seconds after which the advance that raised
+            the transient error is tried again, or None once the retry policy
+            gives up or if the error is not transient. Retrying the advance
+            is safe, the service ignores a sequence id it has already seen
+        """
+        delay = self.retry_policy.retry_delay(err, self.retries)
+        if delay is not None:
+            self.retries += 1
+        return delay
+
+    def recover(self, err: Exception) -> bool:
+        """ Unregisters the session after the error, keeping the simulator, the
+            next advance registers it again. Returns False if the error is
+            not recoverable
+        """
+        self.last_error = err
+
+        if not (is_transient_error(err) or is_session_lost(err)):
+            return False
+        if self.recoveries >= self.max_recoveries:
+            log.error("Session {} gave up after {} recoveries.".format(self.name, self.recoveries))
+            return False
+
+        self.recoveries += 1
+        self.retries = 0
+        log.warning("Recovering session {} after error: {}".format(self.name, err))
+
+        # the old session may still be known by the service
+        try:
+            self.unregister("{}".format(err))
+        except Exception as delete_err:
+            log.debug("Could not unregister lost session {}: {}".format(self.name, delete_err))
+        return True
+
+    def lost_connection(self) -> bool:
+        """ Returns True if the session stopped because the service could not be
+            reached, in which case it is worth registering the simulator again later
+        """
+        err = self.last_error
+        return err is not None and (is_transient_error(err) or is_session_lost(err))
+
+    def unregister(self, reason: str = '') -> None:
+        """ Unregisters the simulator from the Bonsai platform,
+            does nothing if the session is not registered
+        """
+        if not self.registered:
+            return
+
+        self.registered = False
+        _unregistrations.inc()
+        self.client.session.delete(
+            workspace_name = self.config_client.workspace,
+            session_id = self.session_id
+        )
+
+        if reason:
+            log.info("Unregistered simulator {} because: {}".format(self.name, reason))
+        else:
+            log.info("Unregistered simulator {}.".format(self.name))
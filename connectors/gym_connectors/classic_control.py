@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+import logging
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .metrics import REGISTRY
+from .vector_simulator import BACKENDS, StepResult
+
+log = logging.getLogger("ClassicControl")
+log.setLevel(level='INFO')
+
+_steps = REGISTRY.counter('gym_simulator_steps_total', 'Episode steps processed by the simulators')
+_frames = REGISTRY.counter('gym_simulator_frames_total', 'Gym environment steps, including skipped frames')
+_frames_skipped = REGISTRY.counter(
+    'gym_simulator_frames_skipped_total', 'Gym environment steps whose state was not reported')
+_episodes = REGISTRY.counter('gym_simulator_episodes_total', 'Episodes finished by the simulators')
+
+
+class BatchedKernel:
+    """ Base class of the batched implementations of the classic control envs
+
+        The state of all the instances is held in a single (N, state size)
+        array and stepped with one array operation per step. Each instance
+        draws its initial state from its own generator, seeded like the gym
+        env, so that it starts where gym would with the same seed.
+    """
+
+    state_size = 0
+    # the episode length enforced by the TimeLimit wrapper of gym.make
+    max_episode_steps = 200
+
+    def __init__(self, seeds: Sequence[int]):
+        self.num_envs = len(seeds)
+        # imported here, so that importing the package does not import gym
+        from gym.utils import seeding
+
+        self.np_randoms = [seeding.np_random(seed)[0] for seed in seeds]
+        self.state = np.zeros((self.num_envs, self.state_size), dtype=np.float64)
+
+    def initial_state(self, np_random, config: Dict[str, Any]) -> np.ndarray:
+        """ Draws the initial state of one instance, overridden by the config
+        """
+        raise NotImplementedError()
+
+    def reset(self, indices: Sequence[int], configs: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """ Resets the given instances and returns their observations
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        for index, config in zip(indices, configs):
+            self.state[index] = self.initial_state(self.np_randoms[index], config or {})
+        return self.observe(indices)
+
+    def step(self, actions: np.ndarray, active: np.ndarray = None):
+        """ Steps the instances (only the active ones if a mask is given)
+            and returns their rewards and done flags
+        """
+        raise NotImplementedError()
+
+    def observe(self, indices=slice(None)) -> np.ndarray:
+        """ Returns the observations of the given instances, all by default
+        """
+        return self.state[indices].astype(np.float32)
+
+    def _commit(self, state: np.ndarray, active: np.ndarray) -> None:
+        if active is None:
+            self.state = state
+        else:
+            self.state[active] = state[active]
+
+
+class BatchedCartPole(BatchedKernel):
+    """ Batched CartPole-v1, config can set initial_cart_position and initial_pole_angle
+    """
+
+    state_size = 4
+    max_episode_steps = 500
+
+    gravity = 9.8
+    masscart = 1.0
+    masspole = 0.1
+    total_mass = masspole + masscart
+    length = 0.5  # actually half the pole's length
+    polemass_length = masspole * length
+    force_mag = 10.0
+    tau = 0.02  # seconds between state updates
+
+    theta_threshold_radians = 12 * 2 * np.pi / 360
+    x_threshold = 2.4
+
+    def initial_state(self, np_random, config: Dict[str, Any]) -> np.ndarray:
+        state = np_random.uniform(low=-0.05, high=0.05, size=(4,))
+        state[0] = config.get("initial_cart_position", state[0])
+        state[2] = config.get("initial_pole_angle", state[2])
+        return state
+
+    def step(self, actions: np.ndarray, active: np.ndarray = None):
+        x, x_dot, theta, theta_dot = self.state.T
+        force = np.where(np.reshape(actions, -1) == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        temp = (force + self.polemass_length * theta_dot ** 2 * sintheta) / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * costheta ** 2 / self.total_mass))
+        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
+
+        # euler integration, as in gym
+        state = np.stack([x + self.tau * x_dot,
+                          x_dot + self.tau * xacc,
+                          theta + self.tau * theta_dot,
+                          theta_dot + self.tau * thetaacc], axis=1)
+        self._commit(state, active)
+
+        dones = ((np.abs(state[:, 0]) > self.x_threshold) |
+                 (np.abs(state[:, 2]) > self.theta_threshold_radians))
+        return np.ones(self.num_envs), dones
+
+
+class BatchedPendulum(BatchedKernel):
+    """ Batched Pendulum-v0, config can set initial_theta and initial_angular_velocity
+        like the Pendulum simulator does
+
+        The state is (theta, angular velocity), the observation is
+        (cos theta, sin theta, angular velocity).
+    """
+
+    state_size = 2
+
+    max_speed = 8.0
+    max_torque = 2.0
+    dt = 0.05
+    g = 10.0
+    m = 1.0
+    l = 1.0
+
+    def initial_state(self, np_random, config: Dict[str, Any]) -> np.ndarray:
+        high = np.array([np.pi, 1.0])
+        state = np_random.uniform(low=-high, high=high)
+        state[0] = config.get("initial_theta", state[0])
+        state[1] = config.get("initial_angular_velocity", state[1])
+        return state
+
+    def step(self, actions: np.ndarray, active: np.ndarray = None):
+        th, thdot = self.state.T
+        u = np.clip(np.reshape(actions, (self.num_envs, -1))[:, 0], -self.max_torque, self.max_torque)
+
+        costs = _angle_normalize(th) ** 2 + .1 * thdot ** 2 + .001 * (u ** 2)
+
+        newthdot = thdot + (-3 * self.g / (2 * self.l) * np.sin(th + np.pi) +
+                            3. / (self.m * self.l ** 2) * u) * self.dt
+        newth = th + newthdot * self.dt
+        newthdot = np.clip(newthdot, -self.max_speed, self.max_speed)
+
+        self._commit(np.stack([newth, newthdot], axis=1), active)
+        return -costs, np.zeros(self.num_envs, dtype=bool)
+
+    def observe(self, indices=slice(None)) -> np.ndarray:
+        theta = self.state[indices, 0]
+        return np.stack([np.cos(theta), np.sin(theta), self.state[indices, 1]], axis=-1).astype(np.float32)
+
+
+def _angle_normalize(x):
+    return ((x + np.pi) % (2 * np.pi)) - np.pi
+
+
+class BatchedMountainCar(BatchedKernel):
+    """ Batched MountainCar-v0, config can set initial_position and initial_speed
+    """
+
+    state_size = 2
+
+    min_position = -1.2
+    max_position = 0.6
+    max_speed = 0.07
+    goal_position = 0.5
+    goal_velocity = 0.0
+    force = 0.001
+    gravity = 0.0025
+
+    def initial_state(self, np_random, config: Dict[str, Any]) -> np.ndarray:
+        state = np.array([np_random.uniform(low=-0.6, high=-0.4), 0.0])
+        state[0] = config.get("initial_position", state[0])
+        state[1] = config.get("initial_speed", state[1])
+        return state
+
+    def step(self, actions: np.ndarray, active: np.ndarray = None):
+        position, velocity = self.state.T
+
+        velocity = velocity + (np.reshape(actions, -1) - 1) * self.force + np.cos(3 * position) * (-self.gravity)
+        velocity = np.clip(velocity, -self.max_speed, self.max_speed)
+        position = np.clip(position + velocity, self.min_position, self.max_position)
+        velocity[(position == self.min_position) & (velocity < 0)] = 0.0
+
+        self._commit(np.stack([position, velocity], axis=1), active)
+
+        dones = (position >= self.goal_position) & (velocity >= self.goal_velocity)
+        return np.full(self.num_envs, -1.0), dones
+
+
+class BatchedBackend:
+    """ VectorGymSimulator backend stepping all the envs with the batched kernel
+        of the simulator class (its batched_kernel attribute), without gym
+
+        The episode_iteration_limit and skip_frame semantics follow SyncBackend,
+        the time limit of gym.make is applied as well.
+    """
+
+    def __init__(self, simulator_factory, seeds: Sequence[int], iteration_limit: int = 200, skip_frame: int = 1):
+        """ Builds the kernel of the simulator class, iteration_limit and skip_frame
+            are the defaults of the simulator constructor
+        """
+        kernel_class = getattr(simulator_factory, 'batched_kernel', None)
+        if kernel_class is None:
+            raise ValueError("{} has no batched_kernel".format(getattr(simulator_factory, '__name__', simulator_factory)))
+
+        self.kernel = kernel_class(seeds)
+        count = self.kernel.num_envs
+
+        self.iteration_limits = np.full(count, iteration_limit, dtype=np.int64)
+        self.skip_frames = np.full(count, skip_frame, dtype=np.int64)
+        self.iteration_counts = np.zeros(count, dtype=np.int64)
+        self.elapsed_frames = np.zeros(count, dtype=np.int64)
+        self.configs: List[Dict[str, Any]] = [None] * count
+
+    def episode_start(self, indices: Sequence[int], configs: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """ Starts a new episode in the given envs and returns their initial observations
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        for index, config in zip(indices, configs):
+            if config is not None:
+                self.iteration_limits[index] = config.get("episode_iteration_limit", self.iteration_limits[index])
+                self.skip_frames[index] = config.get("skip_frame", self.skip_frames[index])
+            self.configs[index] = config
+
+        self.iteration_counts[indices] = 0
+        self.elapsed_frames[indices] = 0
+        return self.kernel.reset(indices, configs)
+
+    def episode_step(self, actions: np.ndarray, auto_reset: bool) -> StepResult:
+        """ Steps every env with its action, frame by frame for skip_frame > 1
+        """
+        count = self.kernel.num_envs
+        self.iteration_counts += 1
+        limit_reached = (self.iteration_limits > 0) & (self.iteration_counts >= self.iteration_limits)
+
+        reward_sums = np.zeros(count, dtype=np.float64)
+        frames = np.zeros(count, dtype=np.int64)
+        dones = np.zeros(count, dtype=bool)
+        stopped = np.zeros(count, dtype=bool)
+
+        for frame in range(int(self.skip_frames.max())):
+            active = ~stopped & (frame < self.skip_frames)
+            if not active.any():
+                break
+
+            rewards, frame_dones = self.kernel.step(actions, None if active.all() else active)
+            reward_sums += np.where(active, rewards, 0.0)
+            frames += active
+            self.elapsed_frames += active
+
+            frame_dones = active & (frame_dones | (self.elapsed_frames >= self.kernel.max_episode_steps))
+            dones |= frame_dones
+            stopped |= frame_dones | (active & limit_reached)
+
+        finished = dones | limit_reached
+        observations = self.kernel.observe()
+
+        final_observations = {}
+        if auto_reset and finished.any():
+            indices = np.flatnonzero(finished)
+            for index in indices:
+                final_observations[int(index)] = observations[index].copy()
+            observations[indices] = self.episode_start(indices, [self.configs[index] for index in indices])
+
+        total_frames = int(frames.sum())
+        _steps.inc(count)
+        _frames.inc(total_frames)
+        _frames_skipped.inc(total_frames - count)
+        _episodes.inc(int(finished.sum()))
+        return StepResult(observations, reward_sums / np.maximum(frames, 1), reward_sums,
+                          dones, finished, final_observations)
+
+    def close(self) -> None:
+        pass
+
+
+BACKENDS['batched'] = BatchedBackend
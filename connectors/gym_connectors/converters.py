@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import logging
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+log = logging.getLogger("Converters")
+log.setLevel(level='INFO')
+
+
+def interface_fields(interface: Dict[str, Any], kind: str) -> List[str]:
+    """ Returns the names of the state, action or config fields
+        declared in the content of simulator_interface.json
+    """
+    description = interface.get('description', {})
+    fields = description.get(kind, {}).get('fields', [])
+    return [field['name'] for field in fields]
+
+
+def _ordered_fields(fields: List[str], mapping: Dict[str, Any], kind: str, warn: bool = True) -> List[str]:
+    """ Returns the mapped fields in the order of the interface,
+        followed by the mapped fields the interface doesn't declare
+    """
+    unknown = [name for name in mapping if name not in fields]
+    if unknown and warn:
+        log.warning("The {} fields {} are not declared in the simulator interface".format(kind, unknown))
+    return [name for name in fields if name in mapping] + unknown
+
+
+def _compile(source: str, name: str, namespace: Dict[str, Any]) -> Callable:
+    """ Compiles the generated function and keeps its source for debugging
+    """
+    code = compile(source, '<{} converter>'.format(name), 'exec')
+    exec(code, namespace)
+    function = namespace[name]
+    function.source = source
+    log.debug("Compiled converter:\n{}".format(source))
+    return function
+
+
+def compile_state_converter(fields: List[str], mapping: Dict[str, Any]) -> Callable[[Any], Dict[str, Any]]:
+    """ Compiles a function that converts a gym observation into a Bonsai state
+
+        fields are the state fields of the simulator interface, mapping maps
+        each field to its place in the observation, either an index, a slice,
+        or ... (Ellipsis) for the whole observation as a list. Fields that are not
+        mapped are left for the caller to fill.
+
+        The observation is converted to Python floats with a single tolist()
+        call and the state is built with a single dict literal.
+    """
+    entries = []
+    whole_used = False
+    for name in _ordered_fields(fields, mapping, 'state'):
+        place = mapping[name]
+        if place is Ellipsis:
+            # the fields must not share the same list
+            entries.append('{!r}: values[:]'.format(name) if whole_used else '{!r}: values'.format(name))
+            whole_used = True
+        elif isinstance(place, slice):
+            entries.append('{!r}: values[{!r}:{!r}:{!r}]'.format(name, place.start, place.stop, place.step))
+        elif isinstance(place, int):
+            entries.append('{!r}: values[{}]'.format(name, place))
+        else:
+            raise ValueError("Unsupported mapping {!r} for state field {}".format(place, name))
+
+    source = (
+        "def gym_to_state(observation):\n"
+        "    try:\n"
+        "        values = observation.tolist()\n"
+        "    except AttributeError:\n"
+        "        values = list(observation)\n"
+        "    return {{{}}}\n").format(', '.join(entries))
+    return _compile(source, 'gym_to_state', {})
+
+
+def compile_observation_converter(fields: List[str], mapping: Dict[str, Any]) -> Callable[[Dict[str, Any]], List[Any]]:
+    """ Compiles the inverse of the state converter, returning the observation
+        as a list. Only possible when every mapped field is a single index
+        and the indexes cover the observation
+    """
+    ordered = _ordered_fields(fields, mapping, 'state', warn=False)
+    if not all(isinstance(mapping[name], int) for name in ordered):
+        raise ValueError("The state mapping can only be inverted when every field maps to an index")
+    by_index = sorted(ordered, key=lambda name: mapping[name])
+    if [mapping[name] for name in by_index] != list(range(len(by_index))):
+        raise ValueError("The state mapping doesn't cover the observation")
+
+    source = (
+        "def state_to_gym(state):\n"
+        "    return [{}]\n").format(', '.join('state[{!r}]'.format(name) for name in by_index))
+    return _compile(source, 'state_to_gym', {})
+
+
+def compile_action_converter(fields: List[str], mapping: Dict[str, Any], dtype=None) -> Callable[[Dict[str, Any]], Any]:
+    """ Compiles a function that converts a Bonsai action into a gym action
+
+        mapping maps each action field to its index in the gym action array.
+        A single field mapped to None is passed to the environment as is,
+        e.g. a discrete command.
+
+        A new gym action array is returned for every action, environments
+        and recorders may keep it.
+    """
+    ordered = _ordered_fields(fields, mapping, 'action')
+    if len(ordered) == 1 and mapping[ordered[0]] is None:
+        source = (
+            "def action_to_gym(action):\n"
+            "    return action[{!r}]\n").format(ordered[0])
+        return _compile(source, 'action_to_gym', {})
+
+    for name in ordered:
+        if not isinstance(mapping[name], int):
+            raise ValueError("Unsupported mapping {!r} for action field {}".format(mapping[name], name))
+
+    size = max(mapping[name] for name in ordered) + 1
+    lines = ''.join("    buffer[{}] = action[{!r}]\n".format(mapping[name], name) for name in ordered)
+    source = (
+        "def action_to_gym(action):\n"
+        "    buffer = zeros({}, dtype)\n"
+        "{}"
+        "    return buffer\n").format(size, lines)
+    return _compile(source, 'action_to_gym', {'zeros': np.zeros, 'dtype': dtype if dtype is not None else np.float32})
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+from collections import namedtuple
+from time import perf_counter, time
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import numpy as np
+
+from .launcher import import_factory
+
+log = logging.getLogger("Evaluation")
+log.setLevel(level='INFO')
+
+# one finished episode, halted is False when max_steps stopped it first
+EpisodeResult = namedtuple('EpisodeResult', field_names=['episode', 'seed', 'reward', 'length', 'halted',
+                                                         'seconds'])
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class BrainPolicy:
+    """ Gets the actions from the prediction endpoint of an exported brain,
+        the client is created in the process that uses the policy
+    """
+
+    def __init__(self, url: str = None):
+        self.url = url
+        self.client = None
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if self.client is None:
+            from .prediction_client import PredictionClient
+            self.client = PredictionClient(self.url, name='evaluation')
+        return self.client.predict(state)
+
+    def __getstate__(self):
+        return {"url": self.url, "client": None}
+
+
+class RandomPolicy:
+    """ Samples the actions from the action space of the simulator
+    """
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        gym_action = self.simulator._env.action_space.sample()
+        if hasattr(self.simulator, 'gym_to_action'):
+            return self.simulator.gym_to_action(gym_action)
+
+        mapping = self.simulator.action_mapping
+        if mapping is None:
+            return {"command": gym_action}
+        return {name: gym_action if index is None else gym_action[index] for name, index in mapping.items()}
+
+
+def resolve_policy(policy: Union[str, Callable[..., Any], None]) -> Union[str, Callable[..., Any]]:
+    """ Returns the policy to send to the workers. None and 'brain' use the
+        prediction endpoint, 'random' samples the action space, other strings
+        are urls, .npz nets loaded with NumpyPolicy or 'module:attribute'
+        policies imported by the workers
+    """
+    if policy is None or policy == 'brain':
+        return BrainPolicy()
+    if isinstance(policy, str) and policy.startswith(('http://', 'https://')):
+        return BrainPolicy(policy)
+    # a PredictionClient holds open connections, the workers make their own
+    url = getattr(policy, 'url', None)
+    if url is not None and hasattr(policy, 'predict'):
+        return BrainPolicy(url)
+    return policy
+
+
+def _build_policy(policy: Union[str, Callable[..., Any]], simulator) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    if policy == 'random':
+        return RandomPolicy(simulator)
+    if isinstance(policy, str) and policy.endswith('.npz'):
+        from .numpy_policy import NumpyPolicy
+        return NumpyPolicy.load(policy)
+    if isinstance(policy, str):
+        policy = import_factory(policy)
+    # agent classes, e.g. agent:BonsaiAgent, are created with their defaults
+    if isinstance(policy, type):
+        policy = policy()
+    act = getattr(policy, 'act', None)
+    return act if callable(act) else policy
+
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(simulator_factory: Union[str, Callable[[], Any]], policy: Union[str, Callable[..., Any]],
+                 config: Dict[str, Any], max_steps: int, record: str = None) -> None:
+    """ Builds the simulator and the policy of the worker process, once
+    """
+    # the per-episode logging of the simulators would dominate short episodes
+    logging.getLogger('GymSimulator').setLevel(logging.WARNING)
+    os.environ.setdefault('BONSAI_HEADLESS', 'True')
+
+    if isinstance(simulator_factory, str):
+        simulator_factory = import_factory(simulator_factory)
+
+    from gym import spaces
+
+    simulator = simulator_factory()
+    _worker.update(simulator=simulator,
+                   policy=_build_policy(policy, simulator),
+                   discrete=isinstance(simulator._env.action_space, spaces.Discrete),
+                   config=config,
+                   max_steps=max_steps)
+
+    if record:
+        from .trajectory import TrajectoryRecorder
+
+        # one recording per worker, saved when the worker exits
+        recorder = TrajectoryRecorder(os.path.join(record, "worker-{}".format(os.getpid())))
+        simulator.attach_recorder(recorder)
+        multiprocessing.util.Finalize(recorder, recorder.close, exitpriority=10)
+        _worker.update(recorder=recorder)
+
+
+def _discrete(action: Dict[str, Any]) -> Dict[str, Any]:
+    # the brains answer numbers as floats, the discrete spaces of gym take ints
+    return {name: int(value) if isinstance(value, float) else value for name, value in action.items()}
+
+
+def run_episode(episode: int, seed: int) -> EpisodeResult:
+    """ Runs one episode with the simulator and policy of the worker
+    """
+    simulator = _worker['simulator']
+    policy = _worker['policy']
+    discrete = _worker['discrete']
+    max_steps = _worker['max_steps']
+
+    started = perf_counter()
+    if seed is not None:
+        simulator.seed(seed)
+        # the random policy samples the action space
+        simulator._env.action_space.seed(seed)
+    simulator.episode_start(_worker['config'])
+
+    length = 0
+    while not simulator.halted() and (not max_steps or length < max_steps):
+        action = policy(simulator.get_state())
+        simulator.episode_step(_discrete(action) if discrete else action)
+        length += 1
+
+    # the episode reward sums the skipped frames as well, unlike the last reward
+    reward = float(simulator.get_episode_reward())
+    halted = simulator.halted()
+    simulator.episode_finish("evaluation")
+    return EpisodeResult(episode, seed, reward, length, halted, perf_counter() - started)
+
+
+def _run_indexed(task):
+    return run_episode(*task)
+
+
+def distribution(values: Sequence[float], bins: int = 10) -> Dict[str, Any]:
+    """ Returns the mean, spread, percentiles and histogram of the values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+
+    counts, edges = np.histogram(values, bins=bins)
+    summary = {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary["p{}".format(percentile)] = float(value)
+    return summary
+
+
+def summarize(results: List[EpisodeResult], elapsed: float, workers: int, name: str = '') -> Dict[str, Any]:
+    """ Returns the summary of the evaluation, the distributions of the episode
+        rewards and lengths and the results of every episode
+    """
+    results = sorted(results, key=lambda result: result.episode)
+    return {
+        "simulator": name,
+        "finished_at": time(),
+        "episodes": len(results),
+        "workers": workers,
+        "seconds": elapsed,
+        "episodes_per_sec": len(results) / elapsed if elapsed > 0 else 0.0,
+        "steps_per_sec": sum(result.length for result in results) / elapsed if elapsed > 0 else 0.0,
+        "halted": sum(1 for result in results if result.halted),
+        "reward": distribution([result.reward for result in results]),
+        "length": distribution([result.length for result in results]),
+        "results": [result._asdict() for result in results],
+    }
+
+
+def evaluate(simulator_factory: Union[str, Callable[[], Any]], episodes: int,
+             policy: Union[str, Callable[..., Any]] = None, workers: int = None, base_seed: int = 0,
+             config: Dict[str, Any] = None, max_steps: int = None, summary_path: str = None,
+             record: str = None) -> Dict[str, Any]:
+    """ Runs the episodes across a pool of worker processes and returns their summary
+
+        simulator_factory is a picklable callable (usually the simulator class)
+        or a 'module:attribute' string, every worker builds one simulator and
+        runs its share of the episodes with it. policy receives the Bonsai
+        state and returns the Bonsai action, see resolve_policy for the other
+        values it can take. Episode i is seeded with base_seed + i, config is
+        the episode config of every episode. By default one worker is started
+        per CPU core, with workers=1 the episodes run in this process. The
+        summary is written as JSON to summary_path if given. With record, every
+        worker records the steps of its episodes with a TrajectoryRecorder in
+        its own folder of record
+    """
+    workers = min(workers or multiprocessing.cpu_count(), episodes)
+    policy = resolve_policy(policy)
+    tasks = [(episode, base_seed + episode if base_seed is not None else None) for episode in range(episodes)]
+    name = simulator_factory if isinstance(simulator_factory, str) else getattr(simulator_factory, '__name__', '')
+
+    log.info("Evaluating {} episodes of {} with {} worker(s)".format(episodes, name, workers))
+    started = perf_counter()
+    results = []
+    if workers <= 1:
+        _init_worker(simulator_factory, policy, config, max_steps, record)
+        results = [run_episode(*task) for task in tasks]
+        if record:
+            _worker['recorder'].close()
+    else:
+        # a few episodes per task keeps the workers busy without a round trip per episode
+        chunksize = max(1, episodes // (workers * 8))
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(simulator_factory, policy, config, max_steps, record)) as pool:
+            for result in pool.imap_unordered(_run_indexed, tasks, chunksize):
+                results.append(result)
+                if len(results) % max(1, episodes // 10) == 0:
+                    log.info("{}/{} episodes".format(len(results), episodes))
+            # workers that exit on their own save their recordings, terminated ones would not
+            pool.close()
+            pool.join()
+
+    summary = summarize(results, perf_counter() - started, workers, name)
+    log.info("{} episodes in {:.1f}s, reward {:.2f} +- {:.2f}, length {:.1f}".format(
+        episodes, summary["seconds"], summary["reward"]["mean"], summary["reward"]["std"],
+        summary["length"]["mean"]))
+
+    if summary_path:
+        with open(summary_path, 'w') as file:
+            json.dump(summary, file, indent=2)
+        log.info("Summary written to {}".format(summary_path))
+    return summary
+
+
+def parse_arguments(argv: List[str] = None):
+    """ Parses command line arguments of the evaluation
+    """
+    parser = argparse.ArgumentParser(
+        description="Evaluates a policy or an exported brain on many episodes in a pool of worker processes.")
+    parser.add_argument('simulator',
+                        help="Simulator factory as 'module:attribute', e.g. 'hopper:Hopper'.")
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--policy', default='brain',
+                        help="'brain' (prediction endpoint), 'random', a url, an .npz net or 'module:attribute'.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes, one per CPU core by default.")
+    parser.add_argument('--seed', type=int, default=0, help="Episode i is seeded with seed + i.")
+    parser.add_argument('--config', type=json.loads, default=None,
+                        help="Episode config as JSON, e.g. '{\"episode_iteration_limit\": 1000}'.")
+    parser.add_argument('--max-steps', type=int, default=None)
+    parser.add_argument('--output', default='evaluation.json', help="File the summary is written to.")
+    parser.add_argument('--record', default=None,
+                        help="Folder the trajectories of the episodes are recorded to, one per worker.")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point, run it from the folder of the simulator, e.g.
+
+        python -m gym_connectors.evaluation hopper:Hopper --episodes 1000 --policy random
+    """
+    logging.basicConfig()
+    args = parse_arguments(argv)
+
+    # the simulator modules live next to the simulator_interface.json file
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    evaluate(args.simulator, args.episodes, args.policy, args.workers, args.seed, args.config,
+             args.max_steps, args.output, args.record)
+
+
+if __name__ == "__main__":
+    main()
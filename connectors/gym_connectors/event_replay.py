@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict
+from time import perf_counter, sleep, time
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+from .launcher import import_factory
+
+log = logging.getLogger("EventReplay")
+log.setLevel(level='INFO')
+
+EVENT_TYPES = ('EpisodeStart', 'EpisodeStep', 'EpisodeFinish', 'Idle', 'Unregister')
+
+
+def event_to_dict(event) -> Dict[str, Any]:
+    """ Returns the event as it was sent on the wire, e.g. {"type": "EpisodeStep",
+        "episodeStep": {"action": {...}}}, for the models of the Bonsai client
+        and the dictionaries of AsyncBonsaiConnector alike
+    """
+    if isinstance(event, dict):
+        return event
+    return event.serialize()
+
+
+class EventRecorder:
+    """ Appends the events received by the Bonsai sessions to a JSON lines file
+
+        Every line holds the wall time the event was received at, the name
+        of the session, the round trip of the advance call that returned it
+        and the event itself in its wire format. The sessions of a pool can
+        share a recorder. Lines are written to the file buffer as the events
+        arrive and flushed every flush_interval seconds and on close.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        """ Opens the file, a {pid} in the path is replaced with the process id,
+            so that the workers of the launcher write their own files
+        """
+        path = path.replace('{pid}', str(os.getpid()))
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self.events = 0
+
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+        self._last_flush = time()
+
+    def record(self, event, session: str = '', advance_seconds: float = None) -> None:
+        """ Appends the event received by the session
+        """
+        now = time()
+        line = json.dumps({"time": now, "session": session, "advance_seconds": advance_seconds,
+                           "event": event_to_dict(event)})
+
+        with self._lock:
+            self._file.write(line + '\n')
+            self.events += 1
+            if now - self._last_flush > self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self) -> None:
+        """ Flushes and closes the file
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        log.info("Recorded {} events to {}".format(self.events, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_event_recorder(path: str = None) -> Union[EventRecorder, None]:
+    """ Returns a recorder writing to path, or to BONSAI_RECORD_EVENTS if set in
+        the environment, None if neither is given
+    """
+    path = path or os.environ.get('BONSAI_RECORD_EVENTS')
+    return EventRecorder(path) if path else None
+
+
+def read_events(path: str, session: str = None) -> Iterator[Dict[str, Any]]:
+    """ Yields the recorded lines of the file, only those of the given session if set
+    """
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if session is None or record["session"] == session:
+                yield record
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    # nearest rank
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ReplayDriver:
+    """ Feeds a recorded event stream to a simulator in-process and measures
+        how long the simulator took to handle every event
+
+        The simulator is driven like BonsaiSession drives it, its state is
+        collected before every event as advance does, then the event is
+        dispatched. With timing 'fast' the events follow each other without
+        waiting, with 'original' every event is dispatched at the time it was
+        received, divided by speed, Idle events included.
+    """
+
+    def __init__(self, simulator, records: List[Dict[str, Any]], timing: str = 'fast', speed: float = 1.0,
+                 slow_events: int = 10):
+        """ Initializes the driver with the records of one session, see read_events().
+            The slowest slow_events events are kept for the report
+        """
+        if timing not in ('fast', 'original'):
+            raise ValueError("Unknown timing '{}', expected 'fast' or 'original'".format(timing))
+
+        self.simulator = simulator
+        self.records = records
+        self.timing = timing
+        self.speed = speed
+        self.slow_events = slow_events
+
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.state_latencies: List[float] = []
+        self.lag: List[float] = []
+        self.slowest: List[Dict[str, Any]] = []
+
+    def dispatch(self, event: Dict[str, Any]) -> bool:
+        """ Passes the event to the simulator, returns False on Unregister
+        """
+        event_type = event['type']
+        if event_type == 'EpisodeStart':
+            self.simulator.episode_start((event.get('episodeStart') or {}).get('config'))
+        elif event_type == 'EpisodeStep':
+            self.simulator.episode_step(event['episodeStep']['action'])
+        elif event_type == 'EpisodeFinish':
+            self.simulator.episode_finish("")
+        elif event_type == 'Unregister':
+            return False
+        return True
+
+    def run(self) -> Dict[str, Any]:
+        """ Replays the events and returns the latency report
+        """
+        first = self.records[0]["time"] if self.records else 0.0
+        started = perf_counter()
+        for index, record in enumerate(self.records):
+            if self.timing == 'original':
+                due = started + (record["time"] - first) / self.speed
+                delay = due - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    self.lag.append(-delay)
+
+            state_started = perf_counter()
+            self.simulator.get_state()
+            self.simulator.halted()
+            dispatched = perf_counter()
+
+            event = record["event"]
+            running = self.dispatch(event)
+            seconds = perf_counter() - dispatched
+
+            self.state_latencies.append(dispatched - state_started)
+            self.latencies[event['type']].append(seconds)
+            self._keep_if_slow(index, record, seconds)
+            if not running:
+                break
+
+        return self.report(perf_counter() - started)
+
+    def _keep_if_slow(self, index: int, record: Dict[str, Any], seconds: float) -> None:
+        if len(self.slowest) >= self.slow_events and seconds <= self.slowest[-1]["seconds"]:
+            return
+        self.slowest.append({"index": index, "type": record["event"]["type"], "received": record["time"],
+                             "seconds": seconds})
+        self.slowest.sort(key=lambda event: event["seconds"], reverse=True)
+        del self.slowest[self.slow_events:]
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """ Returns the count, mean, percentiles and maximum of the latency of every event type
+        """
+        events = {}
+        for event_type, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            events[event_type] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": _percentile(ordered, 0.50),
+                "p99": _percentile(ordered, 0.99),
+                "max": ordered[-1],
+            }
+
+        count = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "timing": self.timing,
+            "speed": self.speed,
+            "events": count,
+            "seconds": elapsed,
+            "events_per_sec": count / elapsed if elapsed > 0 else 0.0,
+            "latency": events,
+            "state_mean": sum(self.state_latencies) / len(self.state_latencies) if self.state_latencies else 0.0,
+            # events dispatched after their original time, because the simulator fell behind
+            "late_events": len(self.lag),
+            "max_lag": max(self.lag) if self.lag else 0.0,
+            "slowest": self.slowest,
+        }
+
+
+def replay(simulator_factory: Union[str, Callable[[], Any]], path: str, session: str = None,
+           timing: str = 'fast', speed: float = 1.0, report_path: str = None) -> Dict[str, Any]:
+    """ Builds the simulator and replays the events of one session of the
+        recording, the first session recorded if not given
+    """
+    records = list(read_events(path, session))
+    if session is None and records:
+        session = records[0]["session"]
+        records = [record for record in records if record["session"] == session]
+
+    if isinstance(simulator_factory, str):
+        simulator_factory = import_factory(simulator_factory)
+    simulator = simulator_factory()
+
+    log.info("Replaying {} events of session '{}' from {}, {} timing".format(len(records), session, path, timing))
+    report = ReplayDriver(simulator, records, timing, speed).run()
+    report.update(recording=path, session=session)
+
+    for event_type in EVENT_TYPES:
+        latency = report["latency"].get(event_type)
+        if latency:
+            log.info("{:<14} {:>8} events, mean {:.3f}ms p50 {:.3f}ms p99 {:.3f}ms max {:.3f}ms".format(
+                event_type, latency["count"], latency["mean"] * 1e3, latency["p50"] * 1e3,
+                latency["p99"] * 1e3, latency["max"] * 1e3))
+    if report["late_events"]:
+        log.info("{} events were dispatched late, by up to {:.3f}ms".format(
+            report["late_events"], report["max_lag"] * 1e3))
+
+    if report_path:
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=2)
+        log.info("Report written to {}".format(report_path))
+    return report
+
+
+def parse_arguments(argv: List[str] = None):
+    """ Parses command line arguments of the replay
+    """
+    parser = argparse.ArgumentParser(
+        description="Replays a recorded Bonsai event stream against a simulator and reports its latency per event.")
+    parser.add_argument('recording', help="Events recorded with BONSAI_RECORD_EVENTS.")
+    parser.add_argument('simulator',
+                        help="Simulator factory as 'module:attribute', e.g. 'cartpole:CartPole'.")
+    parser.add_argument('--session', default=None, help="Session to replay, the first one recorded by default.")
+    parser.add_argument('--timing', choices=['fast', 'original'], default='fast')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="With original timing, replays the events this many times faster.")
+    parser.add_argument('--output', default=None, help="File the report is written to.")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point, run it from the folder of the simulator, e.g.
+
+        python -m gym_connectors.event_replay events.jsonl cartpole:CartPole --timing original
+    """
+    logging.basicConfig()
+    args = parse_arguments(argv)
+
+    # the simulator modules live next to the simulator_interface.json file
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    replay(args.simulator, args.recording, args.session, args.timing, args.speed, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,5 @@
-import argparse
-import json
 import logging
-import os
-from time import sleep, time
-from typing import Any, Dict
 
-import gym
-import pybulletgym
 from .gym_simulator import GymSimulator
 
 log = logging.getLogger("PyBulletSimulator")
@@ -24,6 +17,10 @@ class PyBulletSimulator(GymSimulator):
 
     environment_name = ''  # name of the OpenAI Gym environment specified in derived class
 
+    # the PyBullet GUI draws the physics client itself, there is no second
+    # instance of the environment to render from a render thread
+    render_attributes = None
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the PyBulletSimulator object
         """
@@ -31,7 +28,23 @@ class PyBulletSimulator(GymSimulator):
 
     def make_environment(self, headless):
         log.debug("Making PyBullet environment {}...".format(self.environment_name))
-        self._env = gym.make(self.environment_name)
+        self._env = self.new_environment()
         if not headless:
             self._env.render()
             self._env.reset()
+
+    def new_environment(self):
+        """ Creates a gym environment of the simulator
+        """
+        # imported here, gym and pybullet take longer to import than the rest of the
+        # simulator, and pybulletgym registers and loads all of its environments
+        import gym
+        import pybulletgym  # noqa: F401
+
+        return gym.make(self.environment_name)
+
+    def enable_spare_envs(self, count: int = 1) -> None:
+        """ Not used, the PyBullet environments reset in less than a millisecond
+        """
+        log.info("{} resets its environment instead of using spare environments".format(
+            self.environment_name))
@@ -2,13 +2,82 @@ import argparse
 import json
 import logging
 import os
-from time import sleep, time
+from time import perf_counter
 from typing import Any, Dict
-import gym
+
+from .converters import (compile_action_converter, compile_observation_converter,
+                         compile_state_converter, interface_fields)
+from .metrics import REGISTRY
+from .renderer import render_modes, start_renderer
+from .spare_envs import SpareEnvPool
+from .tracing import get_tracer
 
 log = logging.getLogger("GymSimulator")
 log.setLevel(level='INFO')
 
+trace = get_tracer("GymSimulator")
+
+_steps = REGISTRY.counter('gym_simulator_steps_total', 'Episode steps processed by the simulators')
+_frames = REGISTRY.counter('gym_simulator_frames_total', 'Gym environment steps, including skipped frames')
+_frames_skipped = REGISTRY.counter(
+    'gym_simulator_frames_skipped_total', 'Gym environment steps whose state was not reported')
+_episodes = REGISTRY.counter('gym_simulator_episodes_total', 'Episodes finished by the simulators')
+_reset_seconds = REGISTRY.histogram('gym_simulator_reset_seconds', 'Time to reset the environment')
+_simulate_seconds = REGISTRY.histogram(
+    'gym_simulator_simulate_seconds', 'Time spent stepping the gym environment for one episode step')
+_state_seconds = REGISTRY.histogram(
+    'gym_simulator_state_seconds', 'Time to convert the gym observation into the Bonsai state')
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+
+def _environment_flag(name: str, default: bool) -> bool:
+    """ Reads a flag set in the environment, 1/true/yes/on or 0/false/no/off
+        in any case, the default if it is not set or not understood
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return bool(default)
+    value = value.strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    log.warning("{}={!r} is not a flag, using {}".format(name, value, bool(default)))
+    return bool(default)
+
+
+def _environment_count(name: str, default: int) -> int:
+    """ Reads a count set in the environment, a flag counts as 1 or 0,
+        the default if it is not set or not understood
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        pass
+    if value.strip().lower() in _TRUE + _FALSE:
+        return int(_environment_flag(name, False))
+    log.warning("{}={!r} is not a count, using {}".format(name, value, default))
+    return default
+
+
+def _frames_per_second(value, default: float) -> float:
+    """ Reads the render rate given as --render-fps or BONSAI_RENDER_FPS,
+        the default if it is not a number of frames per second
+    """
+    try:
+        fps = float(value)
+    except (TypeError, ValueError):
+        fps = None
+    if fps is None or not fps >= 0:
+        log.warning("Render fps {!r} is not a number of frames per second, using {}".format(value, default))
+        return default
+    return fps
+
 
 class GymSimulator:
     """ GymSimulator class
@@ -21,12 +90,42 @@ class GymSimulator:
 
     environment_name = ''  # name of the OpenAI Gym environment specified in derived class
 
+    # optional mappings of the simulator_interface.json state and action fields
+    # to the gym observation and action, see compile_converters()
+    state_mapping: Dict[str, Any] = None
+    action_mapping: Dict[str, Any] = None
+
+    _state_converter = None
+    _observation_converter = None
+    _action_converter = None
+
+    # TrajectoryRecorder the steps are written to, see attach_recorder()
+    _recorder = None
+    _observation = None
+
+    # number of environments kept reset in the background, so that
+    # episode_start swaps one in instead of resetting, see enable_spare_envs().
+    # GYM_CONNECTORS_SPARE_ENVS overrides it
+    spare_envs = 0
+    _spares = None
+
+    # make the gym environment on its first use instead of in the constructor,
+    # see build_environment(). GYM_CONNECTORS_LAZY_ENV overrides it
+    lazy_environment = False
+    _environment = None
+
+    # frames per second shown when not headless, 0 renders every frame while
+    # stepping. Otherwise the frames are rendered from a RenderThread if the
+    # unwrapped environment holds all the render_attributes the frames are
+    # drawn from, or else while stepping, and the frames stepped in between
+    # are dropped. --render-fps or BONSAI_RENDER_FPS overrides it
+    render_fps = 0
+    render_attributes = ('state',)
+    _renderer = None
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the GymSimulator object
         """
-        # create the gym environment
-        log.info("Creating {} environment".format(self.environment_name))
-
         self.finished = False
         self.episode_count = 0
         self.episode_reward = 0
@@ -34,11 +133,12 @@ class GymSimulator:
         self.iteration_count = 0
 
         # parse optional command line arguments
+        self._headless = bool(os.environ.get('BONSAI_HEADLESS', False))
         cli_args = self.parse_arguments()
         if cli_args is not None:
             self._headless = cli_args.headless
-
-        self.make_environment(self._headless)
+            if cli_args.render_fps is not None:
+                self.render_fps = _frames_per_second(cli_args.render_fps, self.render_fps)
 
         # optional parameters for controlling the simulation
         self._iteration_limit = iteration_limit
@@ -47,31 +147,188 @@ class GymSimulator:
         self._skip_frame = skip_frame
 
         # random seed
-        self._env.seed(20)
-        self._env.reset()
+        self.seed(20)
+
+        if not _environment_flag('GYM_CONNECTORS_LAZY_ENV', self.lazy_environment):
+            self.build_environment()
 
-        # book keeping for rate status
-        self._log_interval = 10.0  # seconds
-        self._last_status = time()
+    @property
+    def _env(self):
+        """ The gym environment, built on first use if it was not yet
+        """
+        if self._environment is None:
+            self.build_environment()
+        return self._environment
+
+    @_env.setter
+    def _env(self, env) -> None:
+        self._environment = env
+
+    def build_environment(self) -> None:
+        """ Makes the gym environment, compiles the converters, seeds and
+            resets the environment and starts the spare environments.
+            Called by the constructor, or with lazy_environment when the
+            environment is first used, e.g. by the first episode_start(), so
+            that a simulator can be created and registered before gym and
+            the environment are loaded
+        """
+        if self._environment is not None:
+            return
+
+        log.info("Creating {} environment".format(self.environment_name))
+        started = perf_counter()
+        self.make_environment(self._headless)
+        self.compile_converters()
+
+        self._environment.seed(self._seed)
+        self._environment.reset()
+        log.debug("Created {} environment in {:.3f}s".format(self.environment_name, perf_counter() - started))
+
+        spare_envs = _environment_count('GYM_CONNECTORS_SPARE_ENVS', self.spare_envs)
+        if spare_envs > 0 and self._spares is None:
+            self.enable_spare_envs(spare_envs)
+
+        if not self._headless:
+            self.start_rendering()
 
     def make_environment(self, headless):
 
-        self._env = gym.make(self.environment_name)
+        self._env = self.new_environment()
+
+    def new_environment(self):
+        """ Creates a gym environment of the simulator
+        """
+        # imported here, importing gym takes longer than the rest of the simulator
+        import gym
+
+        return gym.make(self.environment_name)
 
-    def gym_to_state(self, observation) -> None:
+    def seed(self, seed: int) -> None:
+        """ Seeds the random number generator of the gym environment,
+            the seed is applied on the next reset, or when the environment is built
+        """
+        self._seed = seed
+        if self._environment is not None:
+            self._environment.seed(seed)
+        if self._spares is not None:
+            # the environment in use is swapped out at the next episode start
+            self._spares.seed(seed)
+
+    def enable_spare_envs(self, count: int = 1) -> None:
+        """ Keeps count more environments reset by a background thread.
+            gym_episode_start then swaps one in instead of resetting the
+            environment, and the environment of the previous episode is reset
+            in the background. Episode configs are applied by the
+            gym_episode_start overrides to the environment swapped in, as
+            before. Spare environments are only used headless, every one
+            would open its own window
+        """
+        if not self._headless:
+            log.warning("Spare environments are only used headless")
+            return
+
+        self.disable_spare_envs()
+        # gym.make is not guaranteed to be thread safe, the environments are created here
+        environments = [self.new_environment() for _ in range(count)]
+        self._spares = SpareEnvPool(environments, self._seed)
+        log.info("Keeping {} spare {} environment(s) reset in the background".format(count, self.environment_name))
+
+    def disable_spare_envs(self) -> None:
+        """ Stops resetting spare environments and closes them
+        """
+        if self._spares is not None:
+            self._spares.close()
+            self._spares = None
+
+    def start_rendering(self) -> None:
+        """ Shows the environment while it is stepped at render_fps frames
+            per second, if it has a human render mode, see gym_connectors.renderer
+        """
+        self.stop_rendering()
+        if 'human' not in render_modes(self._env):
+            log.info("{} has no human render mode".format(self.environment_name))
+            return
+        self._renderer = start_renderer(self._env, self.new_environment, self.render_fps, self.render_attributes)
+
+    def stop_rendering(self) -> None:
+        """ Stops showing the environment
+        """
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+
+    def attach_recorder(self, recorder) -> None:
+        """ Records the observation, gym action, reward and done flag of every
+            step, and the config of every episode, to the recorder (usually a
+            TrajectoryRecorder) from the next episode on. None detaches it
+        """
+        self._recorder = recorder
+        self._observation = None
+
+    def compile_converters(self) -> None:
+        """ Compiles gym_to_state, state_to_gym and action_to_gym once from the
+            fields of the simulator interface and the state_mapping and
+            action_mapping of the class. Without a simulator_interface.json
+            the fields keep the order of the mappings
+
+        Example:
+            state_mapping = {'position': 0, 'velocity': 1, 'angle': 2}
+            action_mapping = {'command': None}
+        """
+        if self.state_mapping is None and self.action_mapping is None:
+            return
+
+        try:
+            interface = self.get_interface()
+        except FileNotFoundError as err:
+            log.debug("Compiling the converters in the order of the mappings: {}".format(err))
+            interface = {'description': {
+                kind: {'fields': [{'name': name} for name in mapping or {}]}
+                for kind, mapping in (('state', self.state_mapping), ('action', self.action_mapping))}}
+
+        if self.state_mapping is not None:
+            fields = interface_fields(interface, 'state')
+            self._state_converter = compile_state_converter(fields, self.state_mapping)
+            try:
+                self._observation_converter = compile_observation_converter(fields, self.state_mapping)
+            except ValueError:
+                self._observation_converter = None
+
+        if self.action_mapping is not None:
+            dtype = getattr(self._env.action_space, 'dtype', None)
+            self._action_converter = compile_action_converter(
+                interface_fields(interface, 'action'), self.action_mapping, dtype)
+
+    def gym_to_state(self, observation) -> Dict[str, Any]:
         """Convert an openai environment observation into an Bonsai state
 
+        Uses the converter compiled from state_mapping if set, otherwise
+        derived classes override it
+
         Example:
             state = {'position': observation[0],
                      'velocity': observation[1],
                      'angle':    observation[2]}
             return state
         """
-        return None
+        if self._state_converter is None:
+            return None
+
+        self.bonsai_state = self._state_converter(observation)
+        return self.bonsai_state
+
+    def state_to_gym(self, state: Dict[str, Any]):
+        """Converts a Bonsai state back into an openai environment observation
+        """
+        if self._observation_converter is None:
+            raise NotImplementedError("state_to_gym needs a state_mapping of single indexes")
+        return self._observation_converter(state)
 
     def action_to_gym(self, action):
         """Converts an Bonsai action into a openai environemnt action type and returns it
         """
+        if self._action_converter is not None:
+            return self._action_converter(action)
         return action['command']
 
     def gym_episode_start(self, config: Dict[str, Any]):
@@ -79,6 +336,12 @@ class GymSimulator:
         after reseting the gym environment. clients can override this
         to provide additional initialization.
         """
+        if self._spares is not None:
+            env, observation = self._spares.take()
+            self._spares.recycle(self._env)
+            self._env = env
+            return observation
+
         observation = self._env.reset()
 
         return observation
@@ -108,7 +371,14 @@ class GymSimulator:
         self.last_reward = 0
 
         # reset the environment and set the initial observation
+        started = perf_counter()
         observation = self.gym_episode_start(config)
+        _reset_seconds.observe(perf_counter() - started)
+
+        if self._recorder is not None:
+            self._recorder.start_episode(config)
+            self._observation = observation
+
         self.gym_to_state(observation)
 
     def gym_simulate(self, gym_action):
@@ -124,7 +394,8 @@ class GymSimulator:
         # convert the Bonsai actions to openai environemnt action type
         gym_action = self.action_to_gym(action)
 
-        log.debug('simulating - gym action {}'.format(gym_action))
+        if trace.enabled:
+            trace.trace('simulating - gym action %s', gym_action)
 
         reward = 0
         rwd_accum = 0
@@ -132,12 +403,14 @@ class GymSimulator:
         i = 0
         observation = None
 
+        started = perf_counter()
         for i in range(self._skip_frame):
             observation, reward, done, info = self.gym_simulate(gym_action)
             self.finished = done
 
-            log.debug('gym_simulate returned observation{} reward {} done {}  info {}'.format(
-                observation, reward, done, info))
+            if trace.enabled:
+                trace.trace('gym_simulate returned observation %s reward %s done %s info %s',
+                            observation, reward, done, info)
 
             self.episode_reward += reward
             rwd_accum += reward
@@ -150,35 +423,41 @@ class GymSimulator:
                         self.iteration_count, self._iteration_limit))
                     break
 
-        # render if not headless
-            if not self._headless:
-                if 'human' in self._env.metadata['render.modes']:
-                    self._env.render()
+            # render if not headless
+            if self._renderer is not None:
+                self._renderer.offer(self._env)
 
-        # log a periodic status of iterations and episodes
-        self.periodic_status_update()
+        simulated = perf_counter()
+        _simulate_seconds.observe(simulated - started)
+        _frames.inc(i + 1)
+        _frames_skipped.inc(i)
 
         reward = rwd_accum / (i + 1)
 
+        if self._recorder is not None and self._observation is not None:
+            # the summed reward, so that the rewards of an episode add up to its episode reward
+            self._recorder.record(self._observation, gym_action, rwd_accum, self.finished)
+            self._observation = observation
+
         # convert state and return to the server
         state_after_simulation = self.gym_to_state(observation)
+        _state_seconds.observe(perf_counter() - simulated)
 
-        log.debug("simulation returning state {}".format(
-            state_after_simulation))
+        if trace.enabled:
+            trace.trace("simulation returning state %s", state_after_simulation)
 
         self.last_reward = reward
 
     def episode_step(self, action: Dict[str, Any]) -> None:
         """Increases the iteration count and run a simulation for given actions
         """
-        log.debug(
-            "-- EPISODE STEP {}-- - action {}".format(self.iteration_count, action))
+        if trace.enabled:
+            trace.trace("-- EPISODE STEP %s-- - action %s", self.iteration_count, action)
 
         self.iteration_count += 1
+        _steps.inc()
         self.simulate(action)
 
-        log.debug("-------------------------------------")
-
     def episode_finish(self, reason: str) -> None:
         """ Called when the episode has finished
         """
@@ -187,20 +466,9 @@ class GymSimulator:
         log.info("-- iteration {} episode {} reward {} reason {}".format(
             self.iteration_count, self.episode_count, self.episode_reward, reason))
 
-        self._last_status = time()
         self.episode_count += 1
         self.finished = True
-
-
-    def periodic_status_update(self) -> None:
-        """ Logs a periodic status update showing current reward
-            Useful when logging level is set to info and 
-            we don't want to see the logs for each step
-        """
-        if time() - self._last_status > self._log_interval:
-            log.info("Episode {} is still running, reward so far is {}".format(
-                     self.episode_count, self.episode_reward))
-            self._last_status = time()
+        _episodes.inc()
 
     def get_last_reward(self):
         """ Returns the value of the last reward in the current episode
@@ -242,6 +510,10 @@ class GymSimulator:
                             help=headless_help,
                             action='store_true',
                             default=os.environ.get('BONSAI_HEADLESS', False))
+        parser.add_argument('--render-fps',
+                            help="Frames per second shown when not headless, 0 (the default) renders every "
+                                 "frame. This may be set as BONSAI_RENDER_FPS in the environment.",
+                            default=os.environ.get('BONSAI_RENDER_FPS'))
         try:
             args, unknown = parser.parse_known_args()
         except SystemExit:
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import heapq
+import itertools
+import logging
+import threading
+from collections import deque
+from time import time
+from typing import Any, Dict, List
+
+from .metrics import REGISTRY
+from .tracing import dump_traces
+
+log = logging.getLogger("IdleScheduler")
+log.setLevel(level='INFO')
+
+
+class WorkerUtilization:
+    """ Bookkeeping of how the wall time of a worker is spent,
+        stepping active sessions or waiting for idle sessions to wake up
+    """
+
+    def __init__(self, name: str = ''):
+        """ Initializes the counters, the wall time starts now
+        """
+        labels = {'worker': name}
+        self._step_seconds = REGISTRY.counter(
+            'bonsai_worker_step_seconds_total', 'Wall time a worker spent stepping sessions', labels)
+        self._idle_seconds = REGISTRY.counter(
+            'bonsai_worker_idle_seconds_total', 'Wall time a worker spent waiting for idle sessions', labels)
+
+        self.started = time()
+        self.step_time = 0.0
+        self.idle_time = 0.0
+        self.steps = 0
+        self.idles = 0
+
+    def add_step(self, seconds: float) -> None:
+        """ Accounts for the time spent stepping a session
+        """
+        self.step_time += seconds
+        self.steps += 1
+        self._step_seconds.inc(seconds)
+
+    def add_idle(self, seconds: float) -> None:
+        """ Accounts for the time spent waiting while every session was parked
+        """
+        self.idle_time += seconds
+        self._idle_seconds.inc(seconds)
+
+    def report(self) -> Dict[str, Any]:
+        """ Returns the utilization of the worker as a dictionary
+        """
+        wall_time = time() - self.started
+        return {
+            "wall_time": wall_time,
+            "step_time": self.step_time,
+            "idle_time": self.idle_time,
+            "steps": self.steps,
+            "idles": self.idles,
+            "step_fraction": self.step_time / wall_time if wall_time > 0 else 0.0,
+            "idle_fraction": self.idle_time / wall_time if wall_time > 0 else 0.0,
+        }
+
+
+class IdleScheduler:
+    """ Drives several Bonsai sessions from one thread
+
+        Sessions that receive an Idle event are parked on a timer heap until
+        their callback time has passed, while the active sessions keep
+        stepping. The worker only waits when every session is parked.
+    """
+
+    def __init__(self, name: str = '', report_interval: float = 60.0):
+        """ Initializes an empty scheduler, a utilization report is logged
+            every report_interval seconds
+        """
+        self.name = name
+        self.report_interval = report_interval
+        self.utilization = WorkerUtilization(name)
+
+        self._active = deque()
+        self._parked = []
+        self._current = None
+        self._order = itertools.count()
+        self._stop = threading.Event()
+        self._last_report = time()
+
+    def add(self, session) -> None:
+        """ Adds a registered session to the active sessions
+        """
+        self._active.append(session)
+
+    def park(self, session, delay: float) -> None:
+        """ Parks the session until delay seconds from now
+        """
+        heapq.heappush(self._parked, (time() + delay, next(self._order), session))
+        self.utilization.idles += 1
+
+    def retry(self, session, delay: float) -> None:
+        """ Steps the session again delay seconds from now, after a transient error
+        """
+        heapq.heappush(self._parked, (time() + delay, next(self._order), session))
+
+    def sessions(self) -> List[Any]:
+        """ Returns all the sessions, active, parked and the one being stepped
+        """
+        sessions = list(self._active) + [entry[2] for entry in self._parked]
+        if self._current is not None:
+            sessions.append(self._current)
+        return sessions
+
+    def stop(self) -> None:
+        """ Asks the scheduler to unregister its sessions and return
+        """
+        self._stop.set()
+
+    def wake_up(self) -> None:
+        """ Moves the sessions whose callback time has passed to the active sessions
+        """
+        now = time()
+        while self._parked and self._parked[0][0] <= now:
+            _, _, session = heapq.heappop(self._parked)
+            self._active.append(session)
+
+    def step(self, session) -> None:
+        """ Advances the session by one event, and parks it, keeps it active
+            or drops it depending on the event
+        """
+        started = time()
+        try:
+            event = session.advance()
+            if event.type == 'Idle':
+                self.park(session, event.idle.callback_time)
+            elif session.dispatch(event):
+                self._active.append(session)
+        except Exception as err:
+            delay = session.retry_delay(err)
+            if delay is not None:
+                # waits on the heap, not in this thread, the other sessions keep stepping
+                self.retry(session, delay)
+            elif session.recover(err):
+                self._active.append(session)
+            else:
+                # Gracefully unregister for any other exceptions, the other sessions keep running
+                log.error("Session {} stopped: {}".format(session.name, err))
+                # the steps that led to the error, if tracing is enabled
+                dump_traces()
+                session.unregister("{}".format(err))
+        finally:
+            self.utilization.add_step(time() - started)
+
+    def run(self) -> None:
+        """ Steps the sessions until all of them are unregistered or the scheduler is stopped.
+            The remaining sessions are unregistered before returning
+        """
+        try:
+            while (self._active or self._parked) and not self._stop.is_set():
+                self.wake_up()
+
+                if self._active:
+                    self._current = self._active.popleft()
+                    self.step(self._current)
+                    self._current = None
+                else:
+                    # every session is idle, wait for the first one to wake up
+                    started = time()
+                    self._stop.wait(max(0.0, self._parked[0][0] - started))
+                    self.utilization.add_idle(time() - started)
+
+                if time() - self._last_report > self.report_interval:
+                    self.log_utilization()
+        finally:
+            for session in self.sessions():
+                session.unregister()
+            self._active.clear()
+            self._parked = []
+            self._current = None
+            self.log_utilization()
+
+    def log_utilization(self) -> None:
+        """ Logs how much of the wall time went to stepping and to idling
+        """
+        report = self.utilization.report()
+        log.info("Worker {} stepping {:.1%} idle {:.1%} of {:.1f}s, {} steps, {} idles".format(
+            self.name, report['step_fraction'], report['idle_fraction'], report['wall_time'],
+            report['steps'], report['idles']))
+        self._last_report = time()
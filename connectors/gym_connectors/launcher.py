@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from time import time
+from typing import Any, Callable, List, Union
+
+log = logging.getLogger("SimulatorLauncher")
+log.setLevel(level='INFO')
+
+
+def import_factory(target: str) -> Callable[[], Any]:
+    """ Imports a simulator factory given as 'module:attribute',
+        e.g. 'cartpole:CartPole'
+    """
+    module_name, _, attribute = target.partition(':')
+    if not module_name or not attribute:
+        raise ValueError("Expected 'module:attribute', got '{}'".format(target))
+
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute)
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def _worker_main(simulator_factory: Union[str, Callable[[], Any]], sessions: int, base_seed: int,
+                 metrics_port: int = None) -> None:
+    """ Entry point of a worker process, builds its own simulators
+        and drives their sessions until they are unregistered
+    """
+    # SIGTERM from the launcher unregisters the sessions the same way as Ctrl+C
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    from .bonsai_connector_pool import BonsaiConnectorPool
+
+    if isinstance(simulator_factory, str):
+        simulator_factory = import_factory(simulator_factory)
+
+    pool = BonsaiConnectorPool(simulator_factory, sessions, base_seed, metrics_port=metrics_port)
+    try:
+        # sessions lost to network errors are registered again with the same simulators
+        while pool.run():
+            continue
+    except KeyboardInterrupt:
+        # interrupted while still building the simulators
+        pass
+
+
+class SimulatorLauncher:
+    """ Spawns worker processes, each building its own simulators and Bonsai sessions,
+        and supervises them
+
+        Workers that die are restarted, workers that exit cleanly (their
+        sessions were unregistered by the platform) are not. On SIGTERM or
+        Ctrl+C all the workers are asked to unregister their sessions before
+        the launcher exits.
+    """
+
+    def __init__(self, simulator_factory: Union[str, Callable[[], Any]], workers: int = None,
+                 sessions_per_worker: int = 1, base_seed: int = 0,
+                 restart_delay: float = 5.0, shutdown_timeout: float = 30.0,
+                 metrics_port: int = None):
+        """ Initializes the launcher. simulator_factory is either a picklable callable
+            (usually the simulator class) or a 'module:attribute' string.
+            By default one worker is started per CPU core. The worker at index i
+            seeds its sessions from base_seed + i * sessions_per_worker. If
+            metrics_port is given, or BONSAI_METRICS_PORT is set in the environment,
+            the worker at index i serves its metrics on metrics_port + i
+        """
+        self.simulator_factory = simulator_factory
+        self.workers = workers or multiprocessing.cpu_count()
+        self.sessions_per_worker = sessions_per_worker
+        self.base_seed = base_seed
+        self.restart_delay = restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        if metrics_port is None and os.environ.get('BONSAI_METRICS_PORT'):
+            # the workers would all bind the same port
+            try:
+                metrics_port = int(os.environ['BONSAI_METRICS_PORT'])
+            except ValueError:
+                log.error("BONSAI_METRICS_PORT {!r} is not a port number, the workers do not "
+                          "serve their metrics".format(os.environ['BONSAI_METRICS_PORT']))
+        self.metrics_port = metrics_port
+
+        self.processes: List[multiprocessing.Process] = []
+        self.restart_count = 0
+
+        self._stopping = threading.Event()
+
+    def worker_seed(self, index: int) -> int:
+        """ Returns the base seed of the worker at the given index
+        """
+        if self.base_seed is None:
+            return None
+        return self.base_seed + index * self.sessions_per_worker
+
+    def worker_metrics_port(self, index: int) -> int:
+        """ Returns the metrics port of the worker at the given index
+        """
+        if self.metrics_port is None:
+            return None
+        return self.metrics_port + index
+
+    def start_worker(self, index: int) -> multiprocessing.Process:
+        """ Starts the worker process at the given index
+        """
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(self.simulator_factory, self.sessions_per_worker, self.worker_seed(index),
+                  self.worker_metrics_port(index)),
+            name='simulator-worker-{}'.format(index))
+        process.start()
+
+        log.info("Started worker {} (pid {}) with {} session(s).".format(
+            index, process.pid, self.sessions_per_worker))
+        return process
+
+    def run(self) -> None:
+        """ Starts the workers and supervises them until all of them have exited
+            or the launcher is stopped
+        """
+        previous_handler = signal.signal(signal.SIGTERM, self._on_sigterm)
+
+        self._stopping.clear()
+        self.processes = [self.start_worker(index) for index in range(self.workers)]
+        restart_at = [0.0] * self.workers
+
+        try:
+            while not self._stopping.is_set():
+                running = 0
+                for index, process in enumerate(self.processes):
+                    if process.is_alive():
+                        running += 1
+                        continue
+
+                    if process.exitcode == 0:
+                        continue
+
+                    # restart dead workers, but not faster than restart_delay
+                    if restart_at[index] == 0.0:
+                        log.warning("Worker {} (pid {}) died with exit code {}.".format(
+                            index, process.pid, process.exitcode))
+                        restart_at[index] = time() + self.restart_delay
+
+                    running += 1
+                    if time() >= restart_at[index]:
+                        self.processes[index] = self.start_worker(index)
+                        restart_at[index] = 0.0
+                        self.restart_count += 1
+
+                if running == 0:
+                    log.info("All workers have exited.")
+                    break
+
+                self._stopping.wait(1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    def stop(self) -> None:
+        """ Asks the supervision loop to shut the workers down
+        """
+        self._stopping.set()
+
+    def shutdown(self) -> None:
+        """ Sends SIGTERM to the workers so they unregister their sessions,
+            and kills the ones that do not exit within shutdown_timeout
+        """
+        alive = [process for process in self.processes if process.is_alive()]
+        for process in alive:
+            process.terminate()
+
+        deadline = time() + self.shutdown_timeout
+        for process in alive:
+            process.join(max(0.0, deadline - time()))
+            if process.is_alive():
+                log.warning("Worker pid {} did not exit in time, killing it.".format(process.pid))
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
+
+        log.info("Launcher stopped, {} worker restart(s).".format(self.restart_count))
+
+    def _on_sigterm(self, signum, frame):
+        self.stop()
+
+
+def parse_arguments(argv: List[str] = None):
+    """ Parses command line arguments of the launcher, unknown arguments
+        are left for the simulators and the Bonsai client
+    """
+    parser = argparse.ArgumentParser(
+        description="Runs simulators in a pool of worker processes connected to Bonsai.")
+    parser.add_argument('simulator',
+                        help="Simulator factory as 'module:attribute', e.g. 'cartpole:CartPole'.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes, one per CPU core by default.")
+    parser.add_argument('--sessions-per-worker', type=int, default=1,
+                        help="Number of simulator sessions driven by each worker.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Base seed, every session gets a different seed derived from it.")
+    parser.add_argument('--restart-delay', type=float, default=5.0,
+                        help="Seconds to wait before restarting a dead worker.")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve the metrics of worker i on this port + i.")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point, run it from the folder of the simulator, e.g.
+
+        python -m gym_connectors.launcher cartpole:CartPole --workers 8
+    """
+    logging.basicConfig()
+    args = parse_arguments(argv)
+
+    # the simulator modules live next to the simulator_interface.json file
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    # workers can't share the graphical environment
+    os.environ.setdefault('BONSAI_HEADLESS', 'True')
+
+    launcher = SimulatorLauncher(args.simulator, args.workers, args.sessions_per_worker,
+                                 args.seed, args.restart_delay, metrics_port=args.metrics_port)
+    launcher.run()
+
+
+if __name__ == "__main__":
+    main()
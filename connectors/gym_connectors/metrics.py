@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import bisect
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import time
+from typing import Any, Dict, List, Tuple
+
+log = logging.getLogger("Metrics")
+log.setLevel(level='INFO')
+
+# seconds, from 50 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """ A monotonically increasing value, e.g. the number of steps
+
+        Updates are not locked, they rely on the GIL to stay cheap on the hot path.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str = '', labels: Dict[str, str] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, self.labels, self.value)]
+
+    def as_dict(self) -> Any:
+        return self.value
+
+
+class Gauge(Counter):
+    """ A value that can go up and down, e.g. the reward of the current episode
+    """
+
+    kind = 'gauge'
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """ Counts observations in fixed buckets, e.g. the latency of a call
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str = '', labels: Dict[str, str] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """ Returns the upper bound of the bucket holding the given quantile (0.0 - 1.0)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            labels = dict(self.labels, le='+Inf' if bound == float('inf') else repr(bound))
+            samples.append((self.name + '_bucket', labels, cumulative))
+        samples.append((self.name + '_sum', self.labels, self.sum))
+        samples.append((self.name + '_count', self.labels, self.count))
+        return samples
+
+    def as_dict(self) -> Any:
+        # JSON has no infinity, quantiles above the last bucket are reported as None
+        p50 = self.quantile(0.50)
+        p99 = self.quantile(0.99)
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": p50 if p50 != float('inf') else None,
+            "p99": p99 if p99 != float('inf') else None,
+        }
+
+
+class MetricsRegistry:
+    """ Holds the metrics of the process, rendered as Prometheus text or JSON
+    """
+
+    def __init__(self):
+        self.started = time()
+        self._metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name: str, help: str, labels: Dict[str, str], **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = metric_class(name, help, labels, **kwargs)
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, help: str = '', labels: Dict[str, str] = None) -> Counter:
+        """ Returns the counter with the given name and labels, creating it if needed
+        """
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = '', labels: Dict[str, str] = None) -> Gauge:
+        """ Returns the gauge with the given name and labels, creating it if needed
+        """
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = '', labels: Dict[str, str] = None,
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """ Returns the histogram with the given name and labels, creating it if needed
+        """
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def metrics(self) -> List[Any]:
+        """ Returns all the metrics ordered by name
+        """
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: (metric.name, sorted(metric.labels.items())))
+
+    def render_prometheus(self) -> str:
+        """ Returns the metrics in the Prometheus text exposition format
+        """
+        lines = []
+        described = set()
+        for metric in self.metrics():
+            if metric.name not in described:
+                described.add(metric.name)
+                if metric.help:
+                    lines.append("# HELP {} {}".format(metric.name, metric.help))
+                lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ','.join('{}="{}"'.format(key, labels[key]) for key in sorted(labels))
+                    lines.append("{}{{{}}} {}".format(name, label_text, repr(float(value))))
+                else:
+                    lines.append("{} {}".format(name, repr(float(value))))
+        return '\n'.join(lines) + '\n'
+
+    def as_dict(self) -> Dict[str, Any]:
+        """ Returns the metrics as a dictionary, labelled metrics are nested by their labels
+        """
+        result: Dict[str, Any] = {"uptime_seconds": time() - self.started}
+        for metric in self.metrics():
+            if metric.labels:
+                label_text = ','.join('{}={}'.format(key, metric.labels[key]) for key in sorted(metric.labels))
+                result.setdefault(metric.name, {})[label_text] = metric.as_dict()
+            else:
+                result[metric.name] = metric.as_dict()
+        return result
+
+
+# the registry used by the connectors and simulators of this process
+REGISTRY = MetricsRegistry()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """ Serves /metrics as Prometheus text and /metrics.json as JSON
+    """
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path == '/metrics':
+            payload = registry.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            payload = json.dumps(registry.as_dict()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1', registry: MetricsRegistry = REGISTRY):
+    """ Serves the metrics of the process over http in a background thread,
+        only one server is started per process
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = _ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.registry = registry
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            log.info("Serving metrics on http://{}:{}/metrics".format(host, _server.server_address[1]))
+    return _server
+
+
+def serve_metrics(port: int = None):
+    """ Starts the metrics server on the given port, or on the port set as
+        BONSAI_METRICS_PORT in the environment. Does nothing if neither is set,
+        and only logs the error if the port cannot be bound, the simulator
+        runs on without serving its metrics. The same holds for a port that
+        is not a number
+    """
+    if port is None:
+        port = os.environ.get('BONSAI_METRICS_PORT')
+    if port is None or port == '':
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except (OSError, ValueError) as err:
+        log.error("Could not serve the metrics on port {}: {}".format(port, err))
+        return None
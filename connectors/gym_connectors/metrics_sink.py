@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+import csv
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from time import time
+from typing import Any, List, Sequence, Tuple
+
+log = logging.getLogger("MetricsSink")
+log.setLevel(level='INFO')
+
+# (tag, value, step, wall time)
+Scalar = Tuple[str, float, int, float]
+
+
+class TensorBoardBackend:
+    """ Writes the scalars as TensorBoard events with tensorboardX
+    """
+
+    def __init__(self, logdir: str = None, comment: str = ''):
+        """ Creates the writer, logdir defaults to runs/<date>_<host><comment> like SummaryWriter
+        """
+        from tensorboardX import SummaryWriter
+
+        self.writer = SummaryWriter(logdir=logdir, comment=comment)
+
+    def write(self, scalars: Sequence[Scalar]) -> None:
+        for tag, value, step, wall_time in scalars:
+            self.writer.add_scalar(tag, value, step, walltime=wall_time)
+
+    def flush(self) -> None:
+        self.writer.flush()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _FileBackend:
+    """ Appends the scalars to a text file, creating its folder if needed
+    """
+
+    def __init__(self, path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.file = open(path, 'a', newline='')
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class CSVBackend(_FileBackend):
+    """ Appends the scalars to a CSV file with a wall_time,step,tag,value header
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(['wall_time', 'step', 'tag', 'value'])
+
+    def write(self, scalars: Sequence[Scalar]) -> None:
+        self.writer.writerows((wall_time, step, tag, value) for tag, value, step, wall_time in scalars)
+
+
+class JSONLBackend(_FileBackend):
+    """ Appends the scalars to a file with one JSON object per line
+    """
+
+    def write(self, scalars: Sequence[Scalar]) -> None:
+        self.file.writelines(json.dumps({"wall_time": wall_time, "step": step, "tag": tag, "value": value}) + '\n'
+                             for tag, value, step, wall_time in scalars)
+
+
+class MetricsSink:
+    """ Buffers scalars in memory and writes them to its backends from a background thread
+
+        add_scalar only appends to the buffer, the buffer is written when it
+        holds max_buffer scalars or every flush_interval seconds, and when the
+        sink is flushed or closed. If the backends fall behind, the oldest
+        scalars beyond max_pending are dropped rather than blocking the caller.
+    """
+
+    def __init__(self, backends: Sequence[Any], max_buffer: int = 1000, flush_interval: float = 5.0,
+                 max_pending: int = 100000):
+        """ Initializes the sink and starts its flush thread
+        """
+        self.backends = list(backends)
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.dropped = 0
+        self._buffer: List[Scalar] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._flush_requests = 0
+        self._flush_count = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='MetricsSink', daemon=True)
+        self._thread.start()
+
+    def add_scalar(self, tag: str, value: float, step: int = None, wall_time: float = None) -> None:
+        """ Buffers a scalar, same arguments as SummaryWriter.add_scalar
+        """
+        scalar = (tag, float(value), step, wall_time if wall_time is not None else time())
+        with self._lock:
+            self._buffer.append(scalar)
+            size = len(self._buffer)
+            if size > self.max_pending:
+                del self._buffer[:size - self.max_pending]
+                self.dropped += size - self.max_pending
+
+        if size >= self.max_buffer:
+            self._wake.set()
+
+    def add_scalars(self, values: dict, step: int = None) -> None:
+        """ Buffers several scalars with the same step and wall time
+        """
+        wall_time = time()
+        for tag, value in values.items():
+            self.add_scalar(tag, value, step, wall_time)
+
+    def flush(self, timeout: float = None) -> None:
+        """ Writes the buffered scalars and waits until the backends have flushed them
+        """
+        with self._lock:
+            self._flush_requests += 1
+            request = self._flush_requests
+            self._wake.set()
+            self._flushed.wait_for(lambda: self._flush_count >= request or not self._thread.is_alive(), timeout)
+
+    def _write(self, scalars: List[Scalar]) -> None:
+        for backend in self.backends:
+            try:
+                if scalars:
+                    backend.write(scalars)
+                backend.flush()
+            except Exception as err:
+                log.warning("{} failed to write {} scalars: {}".format(type(backend).__name__, len(scalars), err))
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            with self._lock:
+                scalars, self._buffer = self._buffer, []
+                request = self._flush_requests
+                closed = self._closed
+
+            self._write(scalars)
+
+            with self._lock:
+                self._flush_count = request
+                self._flushed.notify_all()
+            if closed:
+                break
+
+    def close(self) -> None:
+        """ Writes the buffered scalars, stops the flush thread and closes the backends
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+        for backend in self.backends:
+            try:
+                backend.close()
+            except Exception as err:
+                log.warning("Failed to close {}: {}".format(type(backend).__name__, err))
+        if self.dropped:
+            log.warning("{} scalars were dropped, the backends could not keep up".format(self.dropped))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _default_path(comment: str, extension: str) -> str:
+    # the folder SummaryWriter would use
+    return os.path.join('runs', datetime.now().strftime('%b%d_%H-%M-%S') + comment + extension)
+
+
+def create_backend(spec: str, comment: str = ''):
+    """ Creates a backend from 'tensorboard', 'csv' or 'jsonl', optionally followed
+        by ':' and the log folder (tensorboard) or file (csv, jsonl)
+    """
+    kind, _, path = spec.partition(':')
+    kind = kind.strip().lower()
+    if kind == 'tensorboard':
+        return TensorBoardBackend(path or None, comment)
+    if kind == 'csv':
+        return CSVBackend(path or _default_path(comment, '.csv'))
+    if kind == 'jsonl':
+        return JSONLBackend(path or _default_path(comment, '.jsonl'))
+    raise ValueError("Unknown metrics backend '{}'".format(spec))
+
+
+def open_sink(spec: str = None, comment: str = '', **options) -> MetricsSink:
+    """ Returns a sink writing to the backends of the comma separated spec, e.g.
+        'tensorboard,csv:results/reward.csv'. The spec defaults to
+        GYM_CONNECTORS_METRICS_SINK or 'tensorboard', which falls back to
+        jsonl if tensorboardX is not installed
+    """
+    spec = spec or os.environ.get('GYM_CONNECTORS_METRICS_SINK') or 'tensorboard'
+
+    backends = []
+    fallback = False
+    for part in spec.split(','):
+        try:
+            backends.append(create_backend(part, comment))
+        except ImportError as err:
+            log.warning("{}, writing the metrics as jsonl instead".format(err))
+            fallback = True
+
+    if fallback and not any(isinstance(backend, JSONLBackend) for backend in backends):
+        backends.append(create_backend('jsonl', comment))
+    return MetricsSink(backends, **options)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+from time import perf_counter
+from typing import Any, Dict, Tuple, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import REGISTRY
+from .recovery import RetryPolicy, is_transient_error
+
+log = logging.getLogger("PredictionClient")
+log.setLevel(level='INFO')
+
+# the endpoint of an exported brain running locally in its docker container
+DEFAULT_PREDICTION_URL = "http://localhost:5000/v1/prediction"
+
+_prediction_errors = REGISTRY.counter(
+    'bonsai_prediction_errors_total', 'Prediction requests that failed after their retries')
+
+
+def prediction_url(url: str = None) -> str:
+    """ Returns the given url, or BONSAI_PREDICTION_URL if set in the environment,
+        or the url of a brain running locally
+    """
+    return url or os.environ.get('BONSAI_PREDICTION_URL') or DEFAULT_PREDICTION_URL
+
+
+class PredictionClient:
+    """ Gets the actions of an exported brain over a pooled keep-alive connection
+
+        One client can be shared by the agents of a process, the connection
+        pool holds up to pool_size connections to the brain.
+    """
+
+    def __init__(self, url: str = None, timeout: Union[float, Tuple[float, float]] = (2.0, 10.0),
+                 retry_policy: RetryPolicy = None, pool_size: int = 10, name: str = 'default'):
+        """ Initializes the client, timeout is in seconds, either one value or a
+            (connect, read) tuple. Transient errors (connection errors, timeouts
+            and 408/429/5xx answers) are retried with the retry policy, by default
+            3 retries starting at 0.1 seconds
+        """
+        self.url = prediction_url(url)
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=3, backoff=0.1, max_backoff=2.0)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.latency = REGISTRY.histogram('bonsai_prediction_seconds', 'Round trip of the prediction requests',
+                                          labels={"client": name})
+
+    def _request(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.get(self.url, json=state, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def predict(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the action of the brain for the state
+        """
+        started = perf_counter()
+        try:
+            return self.retry_policy.call(self._request, state)
+        except Exception:
+            _prediction_errors.inc()
+            raise
+        finally:
+            self.latency.observe(perf_counter() - started)
+
+    def close(self) -> None:
+        """ Closes the pooled connections
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _is_transient_aiohttp_error(err: Exception) -> bool:
+    if isinstance(err, aiohttp.ClientResponseError):
+        # code in aiohttp 2, status in aiohttp 3
+        status = getattr(err, 'status', None) or getattr(err, 'code', 0)
+        return status in (408, 429) or status >= 500
+    return isinstance(err, (aiohttp.ClientConnectionError, asyncio.TimeoutError)) or is_transient_error(err)
+
+
+class AsyncPredictionClient:
+    """ Gets the actions of an exported brain from an asyncio event loop,
+        the requests of all the callers share one keep-alive connection pool
+    """
+
+    def __init__(self, url: str = None, timeout: float = 10.0, retry_policy: RetryPolicy = None,
+                 connection_limit: int = 100, keepalive_timeout: float = 60.0, name: str = 'default'):
+        """ Initializes the client, see PredictionClient, timeout is the total time
+            in seconds of a request. The connection pool is created by the first
+            request, on the running event loop
+        """
+        self.url = prediction_url(url)
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=3, backoff=0.1, max_backoff=2.0)
+        self.connection_limit = connection_limit
+        self.keepalive_timeout = keepalive_timeout
+
+        self.http_session: aiohttp.ClientSession = None
+        self.latency = REGISTRY.histogram('bonsai_prediction_seconds', 'Round trip of the prediction requests',
+                                          labels={"client": name})
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.http_session is None or self.http_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=self.keepalive_timeout)
+            self.http_session = aiohttp.ClientSession(connector=connector)
+        return self.http_session
+
+    async def _request(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._session().get(self.url, json=state) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def predict(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the action of the brain for the state
+        """
+        started = perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return await asyncio.wait_for(self._request(state), self.timeout)
+                except Exception as err:
+                    if attempt >= self.retry_policy.max_retries or not _is_transient_aiohttp_error(err):
+                        _prediction_errors.inc()
+                        raise
+
+                    delay = self.retry_policy.delay(attempt)
+                    log.warning("Retrying prediction in {:.2f}s after transient error: {}".format(delay, err))
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        finally:
+            self.latency.observe(perf_counter() - started)
+
+    async def close(self) -> None:
+        """ Closes the pooled connections
+        """
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
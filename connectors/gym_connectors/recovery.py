@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import logging
+import random
+import time
+from typing import Any, Callable
+
+import requests
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+from .metrics import REGISTRY
+
+log = logging.getLogger("BonsaiRecovery")
+log.setLevel(level='INFO')
+
+_retries = REGISTRY.counter('bonsai_retries_total', 'Calls to the Bonsai service retried after a transient error')
+
+# errors raised when the service can't be reached or the connection drops
+_TRANSPORT_ERRORS = (ConnectionError, TimeoutError,
+                     requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                     ServiceRequestError, ServiceResponseError)
+
+
+def status_code(err: Exception) -> int:
+    """ Returns the HTTP status code of the error, or None if it doesn't have one
+    """
+    code = getattr(err, 'status_code', None)
+    if code is None:
+        response = getattr(err, 'response', None)
+        code = getattr(response, 'status_code', None)
+    if code is None:
+        # aiohttp.ClientResponseError
+        status = getattr(err, 'status', None)
+        code = status if isinstance(status, int) else None
+    return code
+
+
+def is_transient_error(err: Exception) -> bool:
+    """ Returns True if the call that raised the error is worth retrying as is
+    """
+    code = status_code(err)
+    if code is not None:
+        return code in (408, 429) or code >= 500
+    return isinstance(err, _TRANSPORT_ERRORS)
+
+
+def is_session_lost(err: Exception) -> bool:
+    """ Returns True if the service no longer knows the session,
+        e.g. it timed out while the simulator couldn't reach the service
+    """
+    return status_code(err) in (404, 410)
+
+
+class RetryPolicy:
+    """ Retries transient errors with exponential backoff and jitter
+    """
+
+    def __init__(self, max_retries: int = 5, backoff: float = 0.5, max_backoff: float = 30.0):
+        """ Initializes the policy, the n-th retry waits about backoff * 2^n seconds,
+            and at most max_backoff seconds
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt: int) -> float:
+        """ Returns the number of seconds to wait before the given retry (starting at 0)
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def retry_delay(self, err: Exception, attempt: int) -> float:
+        """ Returns the number of seconds to wait before retrying the call that
+            raised the error for the given retry (starting at 0), or None if
+            it is not retried
+        """
+        if attempt >= self.max_retries or not is_transient_error(err):
+            return None
+
+        delay = self.delay(attempt)
+        log.warning("Retrying in {:.2f}s after transient error: {}".format(delay, err))
+        _retries.inc()
+        return delay
+
+    def call(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """ Calls the function, retrying it while it raises transient errors.
+            Sleeps between the retries, the sessions driven by an
+            IdleScheduler are retried from its timer heap instead
+        """
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except Exception as err:
+                delay = self.retry_delay(err, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
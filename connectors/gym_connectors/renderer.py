@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import copy
+import logging
+import threading
+from time import perf_counter
+from typing import Any, Callable, List, Sequence
+
+from .metrics import REGISTRY
+
+log = logging.getLogger("Renderer")
+log.setLevel(level='INFO')
+
+_rendered = REGISTRY.counter('gym_simulator_render_frames_total', 'Frames rendered to the display')
+_dropped = REGISTRY.counter(
+    'gym_simulator_render_dropped_frames_total', 'Frames stepped but not rendered, because a newer one was shown')
+_render_seconds = REGISTRY.histogram('gym_simulator_render_seconds', 'Time to render a frame')
+
+
+def render_modes(env) -> List[str]:
+    """ Returns the render modes of the gym environment, from the metadata
+        key of the newer gym versions or of the older ones
+    """
+    metadata = getattr(env, 'metadata', None) or {}
+    return list(metadata.get('render_modes', metadata.get('render.modes', [])))
+
+
+class InlineRenderer:
+    """ Renders the environment in the thread that steps it, at most fps
+        times per second, the frames stepped in between are dropped.
+        fps 0 renders every frame
+    """
+
+    def __init__(self, fps: float = 0):
+        self.fps = fps
+        self.rendered = 0
+        self.dropped = 0
+
+        self._period = 1.0 / fps if fps > 0 else 0.0
+        self._next_frame = 0.0
+
+    def offer(self, env) -> None:
+        """ Called after every frame stepped
+        """
+        now = perf_counter()
+        if now < self._next_frame:
+            self.dropped += 1
+            _dropped.inc()
+            return
+
+        self._next_frame = now + self._period
+        env.render()
+        self.rendered += 1
+        _rendered.inc()
+        _render_seconds.observe(perf_counter() - now)
+
+    def close(self) -> None:
+        pass
+
+
+class RenderThread:
+    """ Renders the latest frame of a gym environment at a fixed rate from its own thread
+
+        The thread renders a second instance of the environment, the viewer,
+        so that rendering never reads the environment while it is stepped.
+        When the thread is ready for a frame, the next offer() from the
+        stepping thread copies the attributes of the unwrapped environment
+        the frame is drawn from (e.g. state) and the thread sets them on the
+        viewer before rendering it. The frames stepped while the thread
+        renders or waits are dropped, offer() costs an attribute check
+        for them, so stepping runs at the same speed with or without a
+        viewer.
+    """
+
+    def __init__(self, viewer, fps: float, attributes: Sequence[str]):
+        """ Starts rendering the viewer, a reset instance of the environment,
+            fps times per second
+        """
+        self.viewer = viewer
+        self.fps = fps
+        self.attributes = tuple(attributes)
+        self.frames = 0
+        self.rendered = 0
+        self.dropped = 0
+
+        self.wanted = True
+        self._latest = None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='RenderThread', daemon=True)
+        self._thread.start()
+
+    def offer(self, env) -> None:
+        """ Called by the stepping thread after every frame, copies the frame
+            of env if the thread waits for one
+        """
+        self.frames += 1
+        if self.wanted:
+            self.wanted = False
+            unwrapped = env.unwrapped
+            self._latest = (self.frames, [(name, copy.copy(getattr(unwrapped, name))) for name in self.attributes])
+
+    def _run(self) -> None:
+        period = 1.0 / self.fps
+        next_frame = perf_counter()
+        shown = 0
+        while not self._closed.wait(max(0.0, next_frame - perf_counter())):
+            # a frame that took longer than the period is not made up for
+            next_frame = max(next_frame + period, perf_counter())
+
+            latest = self._latest
+            if latest is None:
+                continue
+            self._latest = None
+            self.wanted = True
+
+            frame, values = latest
+            unwrapped = self.viewer.unwrapped
+            for name, value in values:
+                setattr(unwrapped, name, value)
+
+            started = perf_counter()
+            try:
+                self.viewer.render()
+            except Exception as err:
+                log.error("Could not render the environment, rendering stops: {}".format(err))
+                break
+            _render_seconds.observe(perf_counter() - started)
+
+            self.rendered += 1
+            _rendered.inc()
+            if frame - shown > 1:
+                self.dropped += frame - shown - 1
+                _dropped.inc(frame - shown - 1)
+            shown = frame
+
+        try:
+            self.viewer.close()
+        except Exception as err:
+            log.debug("Could not close the viewer: {}".format(err))
+
+    def close(self) -> None:
+        """ Stops rendering and closes the viewer
+        """
+        self._closed.set()
+        self._thread.join()
+
+
+def start_renderer(env, new_environment: Callable[[], Any], fps: float, attributes: Sequence[str] = None):
+    """ Returns the renderer that shows env at fps frames per second, a
+        RenderThread if fps is set and env holds all the attributes, in
+        which case new_environment() makes the viewer, otherwise an
+        InlineRenderer
+    """
+    unwrapped = env.unwrapped
+    if fps > 0 and attributes and all(hasattr(unwrapped, name) for name in attributes):
+        # the viewer is made here, gym.make is not guaranteed to be thread safe
+        viewer = new_environment()
+        viewer.reset()
+        log.info("Rendering {} frames per second from a render thread".format(fps))
+        return RenderThread(viewer, fps, attributes)
+
+    if fps > 0:
+        log.info("Rendering at most {} frames per second while stepping".format(fps))
+    return InlineRenderer(fps)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import logging
+import queue
+import threading
+from time import perf_counter
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from .metrics import REGISTRY
+
+log = logging.getLogger("SpareEnvPool")
+log.setLevel(level='INFO')
+
+_hits = REGISTRY.counter(
+    'gym_simulator_spare_env_hits_total', 'Episode starts that found a spare environment already reset')
+_misses = REGISTRY.counter(
+    'gym_simulator_spare_env_misses_total', 'Episode starts that waited for a spare environment to be reset')
+_wait_seconds = REGISTRY.histogram(
+    'gym_simulator_spare_env_wait_seconds', 'Time an episode start waited for a spare environment')
+
+
+class SpareEnvPool:
+    """ Keeps gym environments reset ahead of time by a background thread
+
+        take() hands out a reset environment with its initial observation,
+        recycle() gives back the environment of the finished episode, which
+        is reset in the background while the next episode runs. The
+        environments are handed out in the order they were reset, so that
+        with seeded environments the sequence of initial states only depends
+        on the seeds. If no environment is ready, take() waits for the
+        next one rather than resetting in the caller.
+    """
+
+    def __init__(self, environments: List[Any], base_seed: int = None):
+        """ Starts resetting the environments. If base_seed is given, environment i
+            is seeded from the pair (base_seed, i), so that the seeds of the spares
+            don't collide with base_seed + 1 of the next simulator of a pool
+        """
+        self.environments = list(environments)
+        self.hits = 0
+        self.misses = 0
+
+        self._indexes = {id(env): index for index, env in enumerate(self.environments)}
+        self._base_seed = base_seed
+        self._generation = 0
+        self._ready = queue.Queue()
+        self._pending = queue.Queue()
+
+        for env in self.environments:
+            self._pending.put((env, self._seed(env), self._generation))
+
+        self._thread = threading.Thread(target=self._run, name='SpareEnvPool', daemon=True)
+        self._thread.start()
+
+    def _seed(self, env) -> int:
+        if self._base_seed is None:
+            return None
+        entropy = [self._base_seed, self._indexes[id(env)]]
+        return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+    def _run(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+
+            env, seed, generation = item
+            try:
+                if seed is not None:
+                    env.seed(seed)
+                observation = env.reset()
+            except Exception as err:
+                log.error("Could not reset a spare environment: {}".format(err))
+                observation = err
+            self._ready.put((env, observation, generation))
+
+    def take(self) -> Tuple[Any, Any]:
+        """ Returns a reset environment and its initial observation
+        """
+        started = perf_counter()
+        waited = False
+        while True:
+            try:
+                env, observation, generation = self._ready.get_nowait()
+            except queue.Empty:
+                waited = True
+                env, observation, generation = self._ready.get()
+
+            # reset before the pool was seeded again
+            if generation != self._generation:
+                self._pending.put((env, self._seed(env), self._generation))
+                continue
+            if isinstance(observation, Exception):
+                self._pending.put((env, None, generation))
+                raise observation
+            break
+
+        if waited:
+            self.misses += 1
+            _misses.inc()
+            _wait_seconds.observe(perf_counter() - started)
+        else:
+            self.hits += 1
+            _hits.inc()
+        return env, observation
+
+    def recycle(self, env) -> None:
+        """ Gives back an environment to be reset in the background
+        """
+        if id(env) not in self._indexes:
+            self._indexes[id(env)] = len(self.environments)
+            self.environments.append(env)
+        self._pending.put((env, None, self._generation))
+
+    def seed(self, base_seed: int) -> None:
+        """ Seeds the environments again, the environments already reset are reset again
+        """
+        self._base_seed = base_seed
+        self._generation += 1
+        while True:
+            try:
+                env, _, _ = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.put((env, self._seed(env), self._generation))
+
+    def close(self) -> None:
+        """ Stops the background thread and closes the environments
+        """
+        self._pending.put(None)
+        self._thread.join()
+        for env in self.environments:
+            try:
+                env.close()
+            except Exception as err:
+                log.debug("Could not close a spare environment: {}".format(err))
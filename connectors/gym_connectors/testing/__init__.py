@@ -0,0 +1,8 @@
+"""
+Local stand-ins for the services the connectors talk to, for tests and benchmarks.
+
+"""
+
+# pyright: reportUnusedImport=false
+from .fake_bonsai import EventScript, FakeBonsaiService, random_actions
+from .fake_brain import FakeBrain
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+import json
+import logging
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep
+from typing import Any, Callable, Dict, Union
+
+log = logging.getLogger("FakeBonsaiService")
+log.setLevel(level='INFO')
+
+_SESSIONS_PATH = re.compile(r'^/v2/workspaces/(?P<workspace>[^/]+)/simulatorSessions'
+                            r'(?:/(?P<session_id>[^/]+)(?P<advance>/advance)?)?/?$')
+
+
+class EventScript:
+    """ Describes the stream of events the fake service sends to every session
+
+        Each session runs the given number of episodes, every episode starts
+        with an EpisodeStart event and is followed by EpisodeStep events until
+        the simulator reports halted or steps_per_episode is reached, then an
+        EpisodeFinish event. Every idle_every episodes an Idle event is sent
+        before the next episode starts. After the last episode the session
+        receives an Unregister event.
+    """
+
+    def __init__(self, episodes: int = 10, steps_per_episode: int = 200,
+                 action: Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 config: Union[Dict[str, Any], Callable[[int], Dict[str, Any]]] = None,
+                 idle_every: int = 0, idle_time: float = 1.0,
+                 latency: Union[float, Callable[[], float]] = 0.0):
+        """ Initializes the script. action is either a fixed action or a callable
+            that receives the state of the simulator, config is either a fixed
+            episode config or a callable that receives the episode index, and
+            latency is the number of seconds (or a callable returning it) added
+            to every advance request
+        """
+        self.episodes = episodes
+        self.steps_per_episode = steps_per_episode
+        self.action = action if action is not None else {"command": 0}
+        self.config = config if config is not None else {}
+        self.idle_every = idle_every
+        self.idle_time = idle_time
+        self.latency = latency
+
+    def next_action(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the action for the given state of the simulator
+        """
+        if callable(self.action):
+            return self.action(state)
+        return self.action
+
+    def episode_config(self, episode: int) -> Dict[str, Any]:
+        """ Returns the config of the given episode
+        """
+        if callable(self.config):
+            return self.config(episode)
+        return self.config
+
+    def delay(self) -> float:
+        """ Returns the latency to inject in the next advance request
+        """
+        if callable(self.latency):
+            return self.latency()
+        return self.latency
+
+
+class _FakeSession:
+    """ The position of a single registered session in the event script
+    """
+
+    def __init__(self, session_id: str, script: EventScript, name: str):
+        self.session_id = session_id
+        self.script = script
+        self.name = name
+
+        self.sequence_id = 0
+        self.episode = 0
+        self.step = 0
+        self.phase = 'start'
+        self.idled = False
+
+    def next_event(self, simulator_state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the next event for the state sent by the simulator
+        """
+        self.sequence_id += 1
+        event = {"sequenceId": self.sequence_id, "sessionId": self.session_id}
+
+        if self.phase == 'start' and self.episode >= self.script.episodes:
+            self.phase = 'unregister'
+
+        if self.phase == 'start':
+            idle_every = self.script.idle_every
+            if idle_every and self.episode > 0 and self.episode % idle_every == 0 and not self.idled:
+                self.idled = True
+                event.update(type='Idle', idle={"callbackTime": self.script.idle_time})
+                return event
+
+            self.idled = False
+            self.step = 0
+            self.phase = 'step'
+            event.update(type='EpisodeStart',
+                         episodeStart={"config": self.script.episode_config(self.episode)})
+        elif self.phase == 'step':
+            if simulator_state.get('halted') or self.step >= self.script.steps_per_episode:
+                self.episode += 1
+                self.phase = 'start'
+                event.update(type='EpisodeFinish', episodeFinish={"reason": "Finished"})
+            else:
+                self.step += 1
+                action = self.script.next_action(simulator_state.get('state') or {})
+                event.update(type='EpisodeStep', episodeStep={"action": action})
+        else:
+            event.update(type='Unregister',
+                         unregister={"reason": "Finished", "details": "Event script finished"})
+
+        return event
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _FakeBonsaiHandler(BaseHTTPRequestHandler):
+    """ Serves the session create, advance and delete endpoints
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _reply(self, status: int, body: Dict[str, Any] = None) -> None:
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        match = _SESSIONS_PATH.match(self.path)
+        body = self._read_body()
+        service = self.server.service
+
+        if match is None:
+            self._reply(404, {"title": "Not Found"})
+        elif match.group('session_id') is None:
+            self._reply(201, service.create_session(match.group('workspace'), body))
+        elif match.group('advance'):
+            event = service.advance(match.group('session_id'), body)
+            if event is None:
+                self._reply(404, {"title": "Session not found"})
+            else:
+                self._reply(200, event)
+        else:
+            self._reply(405, {"title": "Method Not Allowed"})
+
+    def do_DELETE(self):
+        match = _SESSIONS_PATH.match(self.path)
+        if match is None or match.group('session_id') is None or match.group('advance'):
+            self._reply(404, {"title": "Not Found"})
+        elif self.server.service.delete_session(match.group('session_id')):
+            self._reply(204)
+        else:
+            self._reply(404, {"title": "Session not found"})
+
+
+class FakeBonsaiService:
+    """ A local stand-in for the simulator session endpoints of the Bonsai service
+
+        BonsaiClient can be pointed at it through client_config(), every
+        registered session receives the events described by the EventScript.
+        Used to measure the connectors without a live workspace.
+    """
+
+    def __init__(self, script: EventScript = None, host: str = '127.0.0.1', port: int = 0,
+                 workspace: str = 'local', access_key: str = 'local'):
+        """ Initializes the service, port 0 picks a free port when started
+        """
+        self.script = script or EventScript()
+        self.host = host
+        self.port = port
+        self.workspace = workspace
+        self.access_key = access_key
+
+        self.sessions: Dict[str, _FakeSession] = {}
+        self.counts: Dict[str, int] = {}
+
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._next_id = 0
+
+    @property
+    def url(self) -> str:
+        """ Returns the base url of the running service
+        """
+        return "http://{}:{}".format(self.host, self.port)
+
+    def client_config(self):
+        """ Returns a BonsaiClientConfig pointing at this service
+        """
+        from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
+
+        config_client = BonsaiClientConfig()
+        config_client.server = self.url
+        config_client.workspace = self.workspace
+        config_client.access_key = self.access_key
+        return config_client
+
+    def start(self) -> 'FakeBonsaiService':
+        """ Starts serving in a background thread
+        """
+        self._server = _ThreadingHTTPServer((self.host, self.port), _FakeBonsaiHandler)
+        self._server.service = self
+        self.port = self._server.server_address[1]
+
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        log.info("Fake Bonsai service listening on {}".format(self.url))
+        return self
+
+    def stop(self) -> None:
+        """ Stops the service
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def create_session(self, workspace: str, interface: Dict[str, Any]) -> Dict[str, Any]:
+        """ Registers a new session and returns it
+        """
+        with self._lock:
+            self._next_id += 1
+            session_id = 'local-{}'.format(self._next_id)
+            name = interface.get('name', '')
+            self.sessions[session_id] = _FakeSession(session_id, self.script, name)
+            self._count('Register')
+
+        return {"sessionId": session_id}
+
+    def advance(self, session_id: str, simulator_state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the next event of the session, or None if it is not registered
+        """
+        delay = self.script.delay()
+        if delay > 0:
+            sleep(delay)
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+
+        event = session.next_event(simulator_state)
+        with self._lock:
+            self._count(event['type'])
+        return event
+
+    def delete_session(self, session_id: str) -> bool:
+        """ Unregisters the session, returns False if it is not registered
+        """
+        with self._lock:
+            self._count('Delete')
+            return self.sessions.pop(session_id, None) is not None
+
+    def _count(self, name: str) -> None:
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+def random_actions(fields: Dict[str, Any], seed: int = None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """ Returns an action callable for EventScript that samples each action field.
+        fields maps the field name to either a list of discrete values
+        or a (low, high) tuple for continuous values
+    """
+    rng = random.Random(seed)
+
+    def action(state: Dict[str, Any]) -> Dict[str, Any]:
+        sample = {}
+        for name, values in fields.items():
+            if isinstance(values, tuple):
+                sample[name] = rng.uniform(values[0], values[1])
+            else:
+                sample[name] = rng.choice(values)
+        return sample
+
+    return action
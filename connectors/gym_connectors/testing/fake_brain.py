@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep
+from typing import Any, Callable, Dict, List, Union
+
+log = logging.getLogger("FakeBrain")
+log.setLevel(level='INFO')
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _FakeBrainHandler(BaseHTTPRequestHandler):
+    """ Serves the prediction endpoint of an exported brain, and a batch endpoint
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def _read_body(self) -> Any:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _reply(self, status: int, body: Any) -> None:
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _predict(self):
+        brain = self.server.brain
+        body = self._read_body()
+        path = self.path.rstrip('/')
+
+        if path == brain.path:
+            self._reply(200, brain.predict(body))
+        elif path == brain.batch_path:
+            if not isinstance(body, list):
+                self._reply(400, {"title": "Expected a list of states"})
+            else:
+                self._reply(200, brain.predict_batch(body))
+        else:
+            self._reply(404, {"title": "Not Found"})
+
+    # the exported brains accept the state with either method
+    do_GET = _predict
+    do_POST = _predict
+
+
+class FakeBrain:
+    """ A local stand-in for the prediction endpoint of an exported brain
+
+        Answers every state with the action of the policy after the given
+        latency. The batch endpoint takes a list of states and answers
+        them all after a single latency, like a brain evaluating them as
+        one batch would. With concurrency set, at most that many requests
+        are evaluated at the same time, the others wait for their turn.
+    """
+
+    def __init__(self, policy: Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 latency: Union[float, Callable[[], float]] = 0.0, host: str = '127.0.0.1', port: int = 0,
+                 path: str = '/v1/prediction', batch_path: str = '/v1/prediction/batch', concurrency: int = None):
+        """ Initializes the brain, policy is either a fixed action or a callable
+            that receives the state, latency is the number of seconds (or a
+            callable returning it) added to every request. Port 0 picks a free
+            port when started
+        """
+        self.policy = policy if policy is not None else {"command": 0}
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.path = path
+        self.batch_path = batch_path
+
+        # number of requests and of states received by each endpoint
+        self.requests = 0
+        self.batch_requests = 0
+        self.states = 0
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        """ Returns the url of the prediction endpoint
+        """
+        return "http://{}:{}{}".format(self.host, self.port, self.path)
+
+    @property
+    def batch_url(self) -> str:
+        """ Returns the url of the batch endpoint
+        """
+        return "http://{}:{}{}".format(self.host, self.port, self.batch_path)
+
+    def start(self) -> 'FakeBrain':
+        """ Starts serving in a background thread
+        """
+        self._server = _ThreadingHTTPServer((self.host, self.port), _FakeBrainHandler)
+        self._server.brain = self
+        self.port = self._server.server_address[1]
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        log.info("Fake brain listening on {}".format(self.url))
+        return self
+
+    def stop(self) -> None:
+        """ Stops the brain
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _delay(self) -> None:
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay <= 0:
+            return
+        if self._slots is None:
+            sleep(delay)
+        else:
+            with self._slots:
+                sleep(delay)
+
+    def _action(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if callable(self.policy):
+            return self.policy(state)
+        return self.policy
+
+    def predict(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ Returns the action for a single state
+        """
+        with self._lock:
+            self.requests += 1
+            self.states += 1
+        self._delay()
+        return self._action(state)
+
+    def predict_batch(self, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ Returns the actions for a list of states
+        """
+        with self._lock:
+            self.batch_requests += 1
+            self.states += len(states)
+        self._delay()
+        return [self._action(state) for state in states]
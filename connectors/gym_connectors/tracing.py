@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import logging
+import os
+import signal
+import sys
+import threading
+from collections import deque
+from time import strftime, localtime, time
+from typing import Dict
+
+log = logging.getLogger("Tracing")
+log.setLevel(level='INFO')
+
+
+class TraceBuffer:
+    """ Fixed-size in-memory ring buffer of the most recent trace records
+
+        Records are formatted when they are appended, the arguments are
+        often arrays and dictionaries the simulator changes in place on the
+        next step.
+    """
+
+    def __init__(self, capacity: int = 2048):
+        self.records = deque(maxlen=capacity)
+
+    def append(self, component: str, message: str, args: tuple) -> None:
+        try:
+            text = message % args if args else message
+        except Exception as err:
+            text = "{} {} ({})".format(message, args, err)
+        self.records.append((time(), component, text))
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def dump(self, stream=None) -> None:
+        """ Writes the records, oldest first, to the stream (stderr by default)
+        """
+        stream = stream or sys.stderr
+        for timestamp, component, text in list(self.records):
+            stream.write("{}.{:03d} {} {}\n".format(
+                strftime('%H:%M:%S', localtime(timestamp)), int(timestamp * 1000) % 1000, component, text))
+        stream.flush()
+
+
+# the ring buffer shared by all the tracers of this process
+TRACE_BUFFER = TraceBuffer()
+
+
+class Tracer:
+    """ Per-component tracing of the hot path
+
+        Callers check the enabled flag before building a record, so a disabled
+        tracer costs a single attribute lookup per call site:
+
+            if trace.enabled:
+                trace.trace('gym action %s', gym_action)
+
+        Enabled tracers append the record to the ring buffer and, when the
+        logger of the component is at DEBUG level, log it as well.
+    """
+
+    def __init__(self, component: str, buffer: TraceBuffer = TRACE_BUFFER):
+        self.component = component
+        self.enabled = False
+        self.buffer = buffer
+        self._log = logging.getLogger(component)
+
+    def trace(self, message: str, *args) -> None:
+        self.buffer.append(self.component, message, args)
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug(message, *args)
+
+
+_tracers: Dict[str, Tracer] = {}
+_enabled_components = set()
+_lock = threading.Lock()
+
+
+def _components_from_environment():
+    """ Components listed in GYM_CONNECTORS_TRACE, comma separated, 'all' enables every tracer
+    """
+    value = os.environ.get('GYM_CONNECTORS_TRACE', '')
+    return set(name.strip() for name in value.split(',') if name.strip())
+
+
+_enabled_components.update(_components_from_environment())
+
+
+def get_tracer(component: str) -> Tracer:
+    """ Returns the tracer of the component, creating it if needed
+    """
+    with _lock:
+        tracer = _tracers.get(component)
+        if tracer is None:
+            tracer = Tracer(component)
+            tracer.enabled = component in _enabled_components or 'all' in _enabled_components
+            _tracers[component] = tracer
+        return tracer
+
+
+def enable_tracing(*components: str, log_records: bool = False) -> None:
+    """ Enables the tracers of the given components, all of them if none is given.
+        With log_records the records are also logged at DEBUG level
+    """
+    names = components or ('all',)
+    with _lock:
+        _enabled_components.update(names)
+        for tracer in _tracers.values():
+            if 'all' in names or tracer.component in names:
+                tracer.enabled = True
+                if log_records:
+                    tracer._log.setLevel(logging.DEBUG)
+
+
+def disable_tracing(*components: str) -> None:
+    """ Disables the tracers of the given components, all of them if none is given
+    """
+    with _lock:
+        if components:
+            _enabled_components.difference_update(components)
+        else:
+            _enabled_components.clear()
+        for tracer in _tracers.values():
+            if not components or tracer.component in components:
+                tracer.enabled = False
+
+
+def dump_traces(stream=None) -> None:
+    """ Writes the recent trace records to the stream (stderr by default)
+    """
+    if TRACE_BUFFER.records:
+        log.warning("Dumping the last {} trace records".format(len(TRACE_BUFFER.records)))
+        TRACE_BUFFER.dump(stream)
+
+
+def install_dump_signal(signum: int = None) -> bool:
+    """ Dumps the recent trace records when the process receives the signal (SIGUSR1 by default).
+        Returns False where the handler can't be installed, e.g. outside the main thread
+    """
+    if signum is None:
+        signum = getattr(signal, 'SIGUSR1', None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    signal.signal(signum, lambda received, frame: dump_traces())
+    return True
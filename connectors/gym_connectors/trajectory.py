@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+log = logging.getLogger("Trajectory")
+log.setLevel(level='INFO')
+
+INDEX_FILE = 'index.json'
+
+# one recorded episode, the rows of step i are the observation the action was
+# taken in, the gym action, the reward of its frames and whether it ended the episode
+Episode = namedtuple('Episode', field_names=['episode', 'config', 'observations', 'actions', 'rewards', 'dones'])
+
+
+class TrajectoryRecorder:
+    """ Records the steps of GymSimulator episodes in typed column buffers
+
+        Every column is a preallocated NumPy array of chunk_size rows. A step
+        only appends a tuple to a short staging list, which is copied into
+        the columns stage_size steps at a time, as copying the rows one by
+        one would cost more than the step of the classic control envs. The
+        observation and action are copied when they are staged, envs and
+        converters may reuse their arrays.
+
+        A full chunk is saved as one .npy file per column in a folder of its
+        own and listed in index.json, with the episode configs, so the chunks
+        can be memory-mapped by TrajectoryReader while the recording goes on.
+        The shape and dtype of the observation and action columns are taken
+        from the first step.
+
+            recorder = TrajectoryRecorder('trajectories/cartpole')
+            simulator.attach_recorder(recorder)
+            ...
+            recorder.close()
+    """
+
+    def __init__(self, path: str, chunk_size: int = 16384, stage_size: int = 256):
+        """ Initializes the recorder, the folder is created if needed
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.stage_size = min(stage_size, chunk_size)
+
+        self.episode = -1
+        self.steps = 0
+        self.chunks: List[Dict[str, Any]] = []
+        self.configs: Dict[str, Any] = {}
+        self.columns: Dict[str, Dict[str, Any]] = {}
+
+        self._size = 0
+        self._staged: List[tuple] = []
+        self._buffers: Optional[Dict[str, np.ndarray]] = None
+        self._closed = False
+
+    def _allocate(self, observation, action) -> None:
+        observation = np.asarray(observation)
+        action = np.asarray(action)
+        self._buffers = {
+            "episode": np.empty(self.chunk_size, dtype=np.int64),
+            "observation": np.empty((self.chunk_size,) + observation.shape, dtype=observation.dtype),
+            "action": np.empty((self.chunk_size,) + action.shape, dtype=action.dtype),
+            "reward": np.empty(self.chunk_size, dtype=np.float64),
+            "done": np.empty(self.chunk_size, dtype=np.bool_),
+        }
+        self.columns = {name: {"dtype": buffer.dtype.str, "shape": list(buffer.shape[1:])}
+                        for name, buffer in self._buffers.items()}
+
+    def start_episode(self, config: Dict[str, Any] = None) -> int:
+        """ Starts a new episode and returns its number
+        """
+        self.episode += 1
+        self.configs[str(self.episode)] = config or {}
+        return self.episode
+
+    def record(self, observation, action, reward: float, done: bool) -> None:
+        """ Appends one step of the current episode
+        """
+        staged = self._staged
+        staged.append((self.episode, np.array(observation, copy=True), np.array(action, copy=True), reward, done))
+        if len(staged) >= self.stage_size:
+            self._copy_staged()
+
+    def _copy_staged(self) -> None:
+        staged = self._staged
+        if not staged:
+            return
+        if self._buffers is None:
+            self._allocate(staged[0][1], staged[0][2])
+
+        self._staged = []
+        # a chunk may fill up in the middle of the staged steps
+        while staged:
+            count = min(len(staged), self.chunk_size - self._size)
+            rows = slice(self._size, self._size + count)
+            for name, values in zip(('episode', 'observation', 'action', 'reward', 'done'), zip(*staged[:count])):
+                self._buffers[name][rows] = values
+
+            staged = staged[count:]
+            self._size += count
+            if self._size == self.chunk_size:
+                self._save_chunk()
+
+    def _save_chunk(self) -> None:
+        name = "chunk_{:05d}".format(len(self.chunks))
+        folder = os.path.join(self.path, name)
+        os.makedirs(folder, exist_ok=True)
+        for column, buffer in self._buffers.items():
+            np.save(os.path.join(folder, column + '.npy'), buffer[:self._size])
+
+        episodes = self._buffers["episode"]
+        self.chunks.append({"name": name, "steps": self._size,
+                            "first_episode": int(episodes[0]), "last_episode": int(episodes[self._size - 1])})
+        self.steps += self._size
+        self._size = 0
+        self._write_index()
+
+    def flush(self) -> None:
+        """ Saves the recorded steps as a new chunk, even if it is not full, and rewrites the index
+        """
+        self._copy_staged()
+        if self._size:
+            self._save_chunk()
+        else:
+            self._write_index()
+
+    def _write_index(self) -> None:
+        index = {"steps": self.steps, "episodes": self.episode + 1, "columns": self.columns,
+                 "chunks": self.chunks, "configs": self.configs}
+
+        # the readers never see a partly written index
+        temporary = os.path.join(self.path, INDEX_FILE + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(index, file, default=str)
+        os.replace(temporary, os.path.join(self.path, INDEX_FILE))
+
+    def close(self) -> None:
+        """ Saves the recorded steps that are not saved yet
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        log.info("Recorded {} steps of {} episodes to {}".format(self.steps, self.episode + 1, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectoryReader:
+    """ Reads the steps saved by TrajectoryRecorder
+
+        The chunks are memory-mapped one at a time, so the episodes are
+        streamed back without loading the whole recording.
+    """
+
+    def __init__(self, path: str):
+        """ Reads the index of the recording
+        """
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as file:
+            index = json.load(file)
+
+        self.steps: int = index["steps"]
+        self.episode_count: int = index["episodes"]
+        self.columns: Dict[str, Dict[str, Any]] = index["columns"]
+        self.chunks: List[Dict[str, Any]] = index["chunks"]
+        self.configs: Dict[str, Any] = index["configs"]
+
+    def __len__(self) -> int:
+        return self.steps
+
+    def chunk(self, position: int) -> Dict[str, np.ndarray]:
+        """ Returns the columns of a chunk as read-only memory-mapped arrays
+        """
+        folder = os.path.join(self.path, self.chunks[position]["name"])
+        return {column: np.load(os.path.join(folder, column + '.npy'), mmap_mode='r') for column in self.columns}
+
+    def iterate_chunks(self) -> Iterator[Dict[str, np.ndarray]]:
+        """ Yields the columns of every chunk, in the order they were recorded
+        """
+        for position in range(len(self.chunks)):
+            yield self.chunk(position)
+
+    def column(self, name: str) -> np.ndarray:
+        """ Returns one column of the whole recording, loaded in memory
+        """
+        parts = [self.chunk(position)[name] for position in range(len(self.chunks))]
+        if not parts:
+            column = self.columns.get(name, {"dtype": np.float64, "shape": []})
+            return np.empty([0] + column["shape"], dtype=column["dtype"])
+        return np.concatenate(parts)
+
+    def _episode(self, episode: int, parts: List[Dict[str, np.ndarray]]) -> Episode:
+        columns = {name: parts[0][name] if len(parts) == 1 else np.concatenate([part[name] for part in parts])
+                   for name in ('observation', 'action', 'reward', 'done')}
+        return Episode(episode, self.configs.get(str(episode), {}), columns['observation'], columns['action'],
+                       columns['reward'], columns['done'])
+
+    def episodes(self) -> Iterator[Episode]:
+        """ Yields the recorded episodes in order, an episode that spans
+            several chunks is joined, the others are views of the chunk
+        """
+        pending: List[Dict[str, np.ndarray]] = []
+        pending_episode = None
+
+        for columns in self.iterate_chunks():
+            episodes = columns["episode"]
+            # the rows where a new episode starts
+            starts = np.flatnonzero(np.diff(episodes)) + 1
+            bounds = [0] + starts.tolist() + [len(episodes)]
+
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                episode = int(episodes[start])
+                part = {name: column[start:stop] for name, column in columns.items()}
+                if pending and episode != pending_episode:
+                    yield self._episode(pending_episode, pending)
+                    pending = []
+                pending.append(part)
+                pending_episode = episode
+
+        if pending:
+            yield self._episode(pending_episode, pending)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+import logging
+import multiprocessing
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import numpy as np
+
+from .metrics import REGISTRY
+
+log = logging.getLogger("VectorGymSimulator")
+log.setLevel(level='INFO')
+
+# shared with GymSimulator, the registry returns the existing metrics
+_steps = REGISTRY.counter('gym_simulator_steps_total', 'Episode steps processed by the simulators')
+_frames = REGISTRY.counter('gym_simulator_frames_total', 'Gym environment steps, including skipped frames')
+_frames_skipped = REGISTRY.counter(
+    'gym_simulator_frames_skipped_total', 'Gym environment steps whose state was not reported')
+_episodes = REGISTRY.counter('gym_simulator_episodes_total', 'Episodes finished by the simulators')
+
+# rewards are averaged over the skipped frames like GymSimulator.last_reward, reward_sums are not,
+# final_observations holds the last observation of the episodes that were started again
+StepResult = namedtuple('StepResult', field_names=['observations', 'rewards', 'reward_sums', 'dones',
+                                                   'finished', 'final_observations'])
+
+
+@contextmanager
+def _headless():
+    """ Sets BONSAI_HEADLESS while the simulators are built, so that they
+        never start a renderer
+    """
+    previous = os.environ.get('BONSAI_HEADLESS')
+    os.environ['BONSAI_HEADLESS'] = 'True'
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['BONSAI_HEADLESS']
+        else:
+            os.environ['BONSAI_HEADLESS'] = previous
+
+
+class SyncBackend:
+    """ Steps the simulators one after the other in the calling process
+
+        Each simulator is a GymSimulator instance, the backend calls its
+        gym_episode_start and gym_simulate directly, so the Bonsai state and
+        action conversions and the per-step logging are skipped.
+    """
+
+    def __init__(self, simulator_factory: Callable[[], Any], seeds: Sequence[int]):
+        """ Builds a headless simulator for every seed
+        """
+        self.simulators = []
+        for seed in seeds:
+            with _headless():
+                simulator = simulator_factory()
+            if seed is not None:
+                simulator.seed(seed)
+            self.simulators.append(simulator)
+
+        self.iteration_limits = [simulator._iteration_limit for simulator in self.simulators]
+        self.skip_frames = [simulator._skip_frame for simulator in self.simulators]
+        self.iteration_counts = [0] * len(self.simulators)
+        self.configs: List[Dict[str, Any]] = [None] * len(self.simulators)
+
+    def episode_start(self, indices: Sequence[int], configs: Sequence[Dict[str, Any]]) -> List[Any]:
+        """ Starts a new episode in the given simulators and returns their initial observations
+        """
+        observations = []
+        for index, config in zip(indices, configs):
+            if config is not None:
+                self.iteration_limits[index] = config.get("episode_iteration_limit", self.iteration_limits[index])
+                self.skip_frames[index] = config.get("skip_frame", self.skip_frames[index])
+
+            self.configs[index] = config
+            self.iteration_counts[index] = 0
+            observations.append(self.simulators[index].gym_episode_start(config))
+        return observations
+
+    def episode_step(self, actions: Sequence[Any], auto_reset: bool) -> StepResult:
+        """ Steps every simulator with its gym action, following the skip_frame
+            and iteration limit semantics of GymSimulator.simulate
+        """
+        count = len(self.simulators)
+        observations = [None] * count
+        rewards = np.zeros(count, dtype=np.float64)
+        reward_sums = np.zeros(count, dtype=np.float64)
+        dones = np.zeros(count, dtype=bool)
+        finished = np.zeros(count, dtype=bool)
+        final_observations = {}
+
+        frames = 0
+        for index, simulator in enumerate(self.simulators):
+            self.iteration_counts[index] += 1
+            limit = self.iteration_limits[index]
+
+            accumulated = 0.0
+            done = False
+            i = 0
+            observation = None
+            for i in range(self.skip_frames[index]):
+                observation, reward, done, info = simulator.gym_simulate(actions[index])
+                accumulated += reward
+
+                # unlike GymSimulator.simulate, a done env is not stepped any further
+                if done or (limit > 0 and self.iteration_counts[index] >= limit):
+                    break
+
+            frames += i + 1
+            rewards[index] = accumulated / (i + 1)
+            reward_sums[index] = accumulated
+            dones[index] = done
+            finished[index] = done or (limit > 0 and self.iteration_counts[index] >= limit)
+
+            if finished[index] and auto_reset:
+                final_observations[index] = observation
+                observation = self.episode_start([index], [self.configs[index]])[0]
+            observations[index] = observation
+
+        _steps.inc(count)
+        _frames.inc(frames)
+        _frames_skipped.inc(frames - count)
+        _episodes.inc(int(finished.sum()))
+        return StepResult(np.stack(observations), rewards, reward_sums, dones, finished, final_observations)
+
+    def close(self) -> None:
+        for simulator in self.simulators:
+            simulator._env.close()
+
+
+def _subprocess_worker(connection, simulator_factory: Callable[[], Any], seeds: Sequence[int]) -> None:
+    """ Runs a SyncBackend in a worker process, answering the commands of SubprocessBackend
+    """
+    backend = SyncBackend(simulator_factory, seeds)
+    try:
+        while True:
+            command, args = connection.recv()
+            if command == 'episode_start':
+                connection.send(backend.episode_start(*args))
+            elif command == 'episode_step':
+                connection.send(backend.episode_step(*args))
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        backend.close()
+        connection.close()
+
+
+class SubprocessBackend:
+    """ Steps the simulators in worker processes, each worker holds a contiguous
+        share of the simulators and steps it with a SyncBackend
+    """
+
+    def __init__(self, simulator_factory: Callable[[], Any], seeds: Sequence[int], workers: int = None):
+        """ Starts the workers, one per simulator by default. The simulator
+            factory must be picklable, e.g. the simulator class
+        """
+        count = len(seeds)
+        workers = min(workers or count, count)
+        bounds = np.linspace(0, count, workers + 1).astype(int)
+        self.slices = [slice(bounds[i], bounds[i + 1]) for i in range(workers)]
+
+        self.connections = []
+        self.processes = []
+        for share in self.slices:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_subprocess_worker,
+                                              args=(child, simulator_factory, list(seeds[share])),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def episode_start(self, indices: Sequence[int], configs: Sequence[Dict[str, Any]]) -> List[Any]:
+        """ Starts a new episode in the given simulators and returns their initial observations
+        """
+        requests = []
+        for connection, share in zip(self.connections, self.slices):
+            local = [(index - share.start, config) for index, config in zip(indices, configs)
+                     if share.start <= index < share.stop]
+            if local:
+                connection.send(('episode_start', ([index for index, _ in local], [config for _, config in local])))
+                requests.append((connection, share, local))
+
+        observations = {}
+        for connection, share, local in requests:
+            for (index, _), observation in zip(local, connection.recv()):
+                observations[share.start + index] = observation
+        return [observations[index] for index in indices]
+
+    def episode_step(self, actions: Sequence[Any], auto_reset: bool) -> StepResult:
+        """ Steps the workers concurrently and gathers their results
+        """
+        for connection, share in zip(self.connections, self.slices):
+            connection.send(('episode_step', (actions[share], auto_reset)))
+
+        results = [connection.recv() for connection in self.connections]
+
+        final_observations = {}
+        for share, result in zip(self.slices, results):
+            for index, observation in result.final_observations.items():
+                final_observations[share.start + index] = observation
+
+        return StepResult(np.concatenate([result.observations for result in results]),
+                          np.concatenate([result.rewards for result in results]),
+                          np.concatenate([result.reward_sums for result in results]),
+                          np.concatenate([result.dones for result in results]),
+                          np.concatenate([result.finished for result in results]),
+                          final_observations)
+
+    def close(self) -> None:
+        for connection in self.connections:
+            try:
+                connection.send(('close', ()))
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+        for process in self.processes:
+            process.join(5.0)
+        for connection in self.connections:
+            connection.close()
+
+
+# backends selectable by name, any class with the same constructor and methods can be passed instead
+BACKENDS = {
+    'sync': SyncBackend,
+    'subprocess': SubprocessBackend,
+}
+
+
+class VectorGymSimulator:
+    """ Holds N copies of the same GymSimulator and steps them together
+
+        Meant for local training and evaluation, the batched methods take
+        and return NumPy arrays with one row per env instead of Bonsai
+        dictionaries. Finished episodes are started again automatically
+        with their last config, their last observation is kept in
+        final_observations for the step that finished them. The copies are
+        always built headless, a simulator of its own can be shown instead.
+    """
+
+    def __init__(self, simulator_factory: Callable[[], Any], num_envs: int,
+                 backend: Union[str, Callable[..., Any]] = 'sync', base_seed: int = 0,
+                 auto_reset: bool = True, **backend_options):
+        """ Builds the simulators with the given backend, 'sync' steps them in this
+            process and 'subprocess' in worker processes (see SubprocessBackend for
+            its workers option). The simulator at index i is seeded with base_seed + i
+        """
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+
+        seeds = [base_seed + index if base_seed is not None else None for index in range(num_envs)]
+        backend_class = BACKENDS[backend] if isinstance(backend, str) else backend
+        self.backend = backend_class(simulator_factory, seeds, **backend_options)
+
+        self.observations: np.ndarray = None
+        self.rewards = np.zeros(num_envs, dtype=np.float64)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.finished = np.zeros(num_envs, dtype=bool)
+        self.final_observations: Dict[int, np.ndarray] = {}
+
+        self.iteration_counts = np.zeros(num_envs, dtype=np.int64)
+        self.episode_rewards = np.zeros(num_envs, dtype=np.float64)
+        self.episode_counts = np.zeros(num_envs, dtype=np.int64)
+        # reward of the last finished episode of each env, nan until one finishes
+        self.last_episode_rewards = np.full(num_envs, np.nan)
+
+    def episode_start(self, config: Union[Dict[str, Any], Sequence[Dict[str, Any]]] = None) -> None:
+        """ Starts a new episode in every env, config is either shared by
+            all the envs or a sequence with one config per env
+        """
+        if config is None or isinstance(config, dict):
+            configs = [config] * self.num_envs
+        else:
+            configs = list(config)
+
+        self.observations = np.stack(self.backend.episode_start(range(self.num_envs), configs))
+        self.rewards[:] = 0.0
+        self.dones[:] = False
+        self.finished[:] = False
+        self.final_observations = {}
+        self.iteration_counts[:] = 0
+        self.episode_rewards[:] = 0.0
+
+    def episode_step(self, actions) -> None:
+        """ Steps every env with its row of the gym actions
+        """
+        result = self.backend.episode_step(np.asarray(actions), self.auto_reset)
+        self.observations = result.observations
+        self.rewards = result.rewards
+        self.dones = result.dones
+        self.finished = result.finished
+        self.final_observations = result.final_observations
+
+        self.iteration_counts += 1
+        self.episode_rewards += result.reward_sums
+        if self.finished.any():
+            self.episode_counts += self.finished
+            self.last_episode_rewards[self.finished] = self.episode_rewards[self.finished]
+            if self.auto_reset:
+                self.iteration_counts[self.finished] = 0
+                self.episode_rewards[self.finished] = 0.0
+
+    def get_state(self) -> np.ndarray:
+        """ Returns the observations of the envs, one row per env
+        """
+        return self.observations
+
+    def halted(self) -> np.ndarray:
+        """ Returns for each env whether the last step finished its episode
+        """
+        return self.finished
+
+    def close(self) -> None:
+        """ Closes the envs and stops the workers of the backend
+        """
+        self.backend.close()
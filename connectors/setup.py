@@ -35,4 +35,11 @@ setup(
     ],
     python_requires='>=3.6',
     packages=find_packages(),
+    entry_points={
+        'console_scripts': [
+            'gym-connectors-launch=gym_connectors.launcher:main',
+            'gym-connectors-evaluate=gym_connectors.evaluation:main',
+            'gym-connectors-replay=gym_connectors.event_replay:main',
+        ],
+    },
 )
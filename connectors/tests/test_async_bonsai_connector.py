@@ -0,0 +1,111 @@
+import asyncio
+
+import aiohttp
+from microsoft_bonsai_api.simulator.client import BonsaiClientConfig
+from multidict import CIMultiDict
+from yarl import URL
+
+from gym_connectors.async_bonsai_connector import AsyncBonsaiSession
+from gym_connectors.recovery import RetryPolicy
+
+
+class Simulator:
+    def __init__(self):
+        self.steps = 0
+
+    def get_interface(self):
+        return {'name': 'Simulator', 'timeout': 60}
+
+    def get_state(self):
+        return {'value': self.steps}
+
+    def halted(self):
+        return False
+
+    def episode_step(self, action):
+        self.steps += 1
+
+
+class Response:
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def __aenter__(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self.payload
+
+
+class HttpSession:
+    """ Answers the requests with the given payloads, in order
+    """
+
+    def __init__(self, payloads):
+        self.payloads = list(payloads)
+        self.deleted = 0
+
+    def post(self, url, json=None):
+        return Response(self.payloads.pop(0))
+
+    def delete(self, url):
+        self.deleted += 1
+        return Response(None)
+
+
+def response_error(status):
+    request_info = aiohttp.RequestInfo(URL('http://bonsai/advance'), 'POST', CIMultiDict())
+    return aiohttp.ClientResponseError(request_info, (), status=status)
+
+
+def step_event(sequence_id):
+    return {'type': 'EpisodeStep', 'sequenceId': sequence_id, 'episodeStep': {'action': {}}}
+
+
+def run_session(payloads):
+    simulator = Simulator()
+    http_session = HttpSession(payloads)
+    config_client = BonsaiClientConfig(workspace='workspace', access_key='key')
+    session = AsyncBonsaiSession(simulator, http_session, config_client, None, name='#0',
+                                 retry_policy=RetryPolicy(backoff=0.0))
+    asyncio.run(session.run())
+    return session, simulator, http_session
+
+
+def test_retries_a_dropped_connection():
+    dropped = aiohttp.ServerDisconnectedError()
+    session, simulator, http_session = run_session([
+        {'sessionId': 'a'}, step_event(2), dropped, step_event(3),
+        {'type': 'Unregister', 'sequenceId': 4}])
+
+    assert simulator.steps == 2
+    assert session.recoveries == 0
+    assert http_session.deleted == 1
+
+
+def test_registers_a_lost_session_again():
+    lost = response_error(404)
+    session, simulator, http_session = run_session([
+        {'sessionId': 'a'}, step_event(2), lost, {'sessionId': 'b'}, step_event(2),
+        {'type': 'Unregister', 'sequenceId': 3}])
+
+    assert simulator.steps == 2
+    assert session.session_id == 'b'
+    assert http_session.deleted == 2
+
+
+def test_stops_on_an_error_that_is_not_recoverable():
+    rejected = response_error(400)
+    session, simulator, http_session = run_session([{'sessionId': 'a'}, rejected])
+
+    assert not session.registered
+    assert not session.lost_connection()
+    assert http_session.deleted == 1
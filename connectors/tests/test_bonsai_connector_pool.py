@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from gym_connectors import GymSimulator
+from gym_connectors.bonsai_connector_pool import BonsaiConnectorPool
+from gym_connectors.launcher import SimulatorLauncher
+
+
+class CartPole(GymSimulator):
+    environment_name = 'CartPole-v1'
+
+
+@pytest.fixture(autouse=True)
+def headless(monkeypatch, tmp_path):
+    monkeypatch.setenv('BONSAI_HEADLESS', 'True')
+    monkeypatch.chdir(tmp_path)
+
+
+def test_pooled_simulators_start_from_different_states():
+    pool = BonsaiConnectorPool(CartPole, 2)
+    pool.make_simulators()
+
+    first, second = [simulator.gym_episode_start(None) for simulator in pool.simulators]
+
+    assert not np.allclose(first, second)
+
+
+def test_launcher_workers_get_different_seed_ranges():
+    launcher = SimulatorLauncher('module:Simulator', workers=3, sessions_per_worker=2)
+
+    assert [launcher.worker_seed(index) for index in range(3)] == [0, 2, 4]
@@ -0,0 +1,23 @@
+import pytest
+
+from gym_connectors import GymSimulator
+
+
+class CartPole(GymSimulator):
+    environment_name = 'CartPole-v1'
+
+
+@pytest.fixture(autouse=True)
+def headless(monkeypatch, tmp_path):
+    monkeypatch.setenv('BONSAI_HEADLESS', 'True')
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize('value, fps', [('abc', 0), ('-3', 0), ('15', 15.0)])
+def test_reads_the_render_fps_leniently(monkeypatch, value, fps):
+    monkeypatch.setenv('BONSAI_RENDER_FPS', value)
+    simulator = CartPole()
+
+    assert simulator._headless
+    assert simulator.render_fps == fps
+    assert simulator._environment is not None
@@ -0,0 +1,18 @@
+from gym_connectors import metrics
+from gym_connectors.launcher import SimulatorLauncher
+
+
+def test_serve_metrics_ignores_a_port_that_is_not_a_number(monkeypatch):
+    monkeypatch.setenv('BONSAI_METRICS_PORT', 'nine-thousand')
+
+    assert metrics.serve_metrics() is None
+    assert metrics._server is None
+
+
+def test_launcher_ignores_a_port_that_is_not_a_number(monkeypatch):
+    monkeypatch.setenv('BONSAI_METRICS_PORT', 'nine-thousand')
+
+    launcher = SimulatorLauncher('module:Simulator', workers=2)
+
+    assert launcher.metrics_port is None
+    assert launcher.worker_metrics_port(1) is None
@@ -0,0 +1,37 @@
+from gym_connectors.spare_envs import SpareEnvPool
+
+
+class SeededEnv:
+    def __init__(self):
+        self.seeds = []
+
+    def seed(self, seed):
+        self.seeds.append(seed)
+
+    def reset(self):
+        return self.seeds[-1]
+
+    def close(self):
+        pass
+
+
+def spare_seeds(base_seed, count):
+    pool = SpareEnvPool([SeededEnv() for _ in range(count)], base_seed)
+    try:
+        return {pool.take()[1] for _ in range(count)}
+    finally:
+        pool.close()
+
+
+def test_spare_seeds_do_not_collide_across_adjacent_simulators():
+    # the simulators of a pool are seeded with base_seed + i
+    simulator_seeds = set(range(4))
+    seeds = [spare_seeds(seed, 3) for seed in simulator_seeds]
+
+    assert all(len(spares) == 3 for spares in seeds)
+    assert len(set.union(*seeds)) == 12
+    assert not set.union(*seeds) & simulator_seeds
+
+
+def test_spare_seeds_repeat_under_the_same_seed():
+    assert spare_seeds(7, 2) == spare_seeds(7, 2)
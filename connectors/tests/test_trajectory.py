@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from gym_connectors import GymSimulator, TrajectoryReader, TrajectoryRecorder
+
+
+class MountainCarContinuous(GymSimulator):
+    environment_name = 'MountainCarContinuous-v0'
+    state_mapping = {"position": 0, "velocity": 1}
+    action_mapping = {"command": 0}
+
+
+@pytest.fixture
+def simulator(monkeypatch, tmp_path):
+    monkeypatch.setenv('BONSAI_HEADLESS', 'True')
+    # no simulator_interface.json, the converters keep the order of the mappings
+    monkeypatch.chdir(tmp_path)
+    return MountainCarContinuous(iteration_limit=0)
+
+
+def test_records_the_actions_sent_to_a_mapped_simulator(simulator, tmp_path):
+    commands = [0.25, -0.5, 0.75, -1.0, 0.0] * 8
+    recorder = TrajectoryRecorder(str(tmp_path / 'recording'), chunk_size=32, stage_size=16)
+    simulator.attach_recorder(recorder)
+
+    observations = []
+    simulator.episode_start({})
+    for command in commands:
+        observations.append([simulator.bonsai_state["position"], simulator.bonsai_state["velocity"]])
+        simulator.episode_step({"command": command})
+    recorder.close()
+
+    reader = TrajectoryReader(str(tmp_path / 'recording'))
+    assert len(reader) == len(commands)
+    assert len(reader.chunks) == 2
+    np.testing.assert_allclose(reader.column('action')[:, 0], commands)
+    np.testing.assert_allclose(reader.column('observation'), observations, rtol=1e-6)
+
+    episodes = list(reader.episodes())
+    assert [episode.episode for episode in episodes] == [0]
+    assert np.isclose(episodes[0].rewards.sum(), simulator.episode_reward)
+
+
+def test_copies_arrays_the_env_reuses(tmp_path):
+    recorder = TrajectoryRecorder(str(tmp_path), chunk_size=8, stage_size=4)
+    recorder.start_episode()
+    observation = np.zeros(2)
+    action = np.zeros(1, dtype=np.float32)
+    for step in range(6):
+        observation[:] = step
+        action[0] = -step
+        recorder.record(observation, action, 1.0, step == 5)
+    recorder.close()
+
+    reader = TrajectoryReader(str(tmp_path))
+    np.testing.assert_array_equal(reader.column('observation')[:, 0], np.arange(6))
+    np.testing.assert_array_equal(reader.column('action')[:, 0], -np.arange(6))
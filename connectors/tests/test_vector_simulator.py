@@ -0,0 +1,18 @@
+from gym_connectors import GymSimulator, VectorGymSimulator
+
+
+class CartPole(GymSimulator):
+    environment_name = 'CartPole-v1'
+
+
+def test_builds_the_copies_headless(monkeypatch, tmp_path):
+    monkeypatch.delenv('BONSAI_HEADLESS', raising=False)
+    monkeypatch.chdir(tmp_path)
+    envs = VectorGymSimulator(CartPole, 3)
+    try:
+        simulators = envs.backend.simulators
+        assert len(simulators) == 3
+        assert all(simulator._headless for simulator in simulators)
+        assert all(simulator._renderer is None for simulator in simulators)
+    finally:
+        envs.close()
@@ -1,14 +1,17 @@
+import argparse
 import logging
 from os import write
-import requests
+from gym_connectors import NumpyPolicy, PredictionClient, open_sink
 from typing import Any, Dict
 from cartpole import CartPole
-from tensorboardX import SummaryWriter
 
 class BonsaiAgent(object):
     """ The agent that gets the action from the trained brain exported as docker image and started locally
     """
 
+    def __init__(self, client: PredictionClient = None):
+        self.client = client or PredictionClient()
+
     def act(self, state) -> Dict[str, Any]:
         action = self.predict(state)
         #simulator expects action to be integer
@@ -16,13 +19,20 @@ class BonsaiAgent(object):
         return action
 
     def predict(self, state):
-        #local endpoint when running trained brain locally in docker container
-        url = "http://localhost:5000/v1/prediction"
+        #local endpoint of the trained brain running in docker, unless BONSAI_PREDICTION_URL is set
+        return self.client.predict(state)
 
-        response = requests.get(url, json=state)
-        action = response.json()
 
-        return action
+class LocalAgent(object):
+    """ The agent that gets the action from the net trained by cross_entropy_agent.py, without a brain
+    """
+
+    def __init__(self, model_path: str):
+        # a few microseconds per step, the net runs with NumPy only
+        self.policy = NumpyPolicy.load(model_path)
+
+    def act(self, state) -> Dict[str, Any]:
+        return self.policy(state)
 
 
 class RandomAgent(object):
@@ -40,14 +50,21 @@ if __name__ == '__main__':
     log = logging.getLogger("cartpole")
     log.setLevel(level='INFO')
 
-    writer = SummaryWriter()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=None,
+                        help="Net saved by cross_entropy_agent.py, used instead of the brain.")
+    args, _ = parser.parse_known_args()
+
+    metrics = open_sink(comment="-cartpole-agent")
+
     # we will use our environment (wrapper of OpenAI env)
     cartpole = CartPole()
 
     # specify which agent you want to use,
-    # BonsaiAgent that uses trained Brain or
+    # BonsaiAgent that uses trained Brain,
+    # LocalAgent that uses the net trained by cross_entropy_agent.py or
     # RandomAgent that randomly selects next action
-    agent = BonsaiAgent()
+    agent = LocalAgent(args.model) if args.model else BonsaiAgent()
 
     episode_count = 100
 
@@ -71,11 +88,12 @@ if __name__ == '__main__':
                 cum_reward += reward
 
                 if cartpole.halted():
-                    writer.add_scalar("reward", cum_reward, i )
+                    metrics.add_scalar("reward", cum_reward, i)
+                    metrics.add_scalar("episode_length", cartpole.iteration_count, i)
                     break
-                writer.flush()
             cartpole.episode_finish("")
 
-        writer.close()    
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        metrics.close()
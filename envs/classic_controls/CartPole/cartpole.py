@@ -1,9 +1,11 @@
 import logging
 from typing import Any, Dict
 
-from gym_connectors import BonsaiConnector, GymSimulator
+import numpy as np
+from gym_connectors import BatchedCartPole, BonsaiConnector, GymSimulator, get_tracer
 
 log = logging.getLogger("cartpole")
+trace = get_tracer("cartpole")
 
 class CartPole(GymSimulator):
     """ Implements the methods specific to Open AI Gym CartPole environment 
@@ -11,6 +13,16 @@ class CartPole(GymSimulator):
 
     environment_name = 'CartPole-v1'      # Environment name, from openai-gym
 
+    # places of the Bonsai state and action fields in the gym observation and action
+    state_mapping = {"cart_position": 0,
+                     "cart_velocity": 1,
+                     "pole_angle": 2,
+                     "pole_angular_velocity": 3}
+    action_mapping = {"command": None}
+
+    # steps many instances at once in VectorGymSimulator(CartPole, n, backend='batched')
+    batched_kernel = BatchedCartPole
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the CartPole environment
         """
@@ -21,23 +33,19 @@ class CartPole(GymSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
-    def gym_to_state(self, observation):
-        """ Converts openai environment observation to Bonsai state, as defined in inkling
-        """    
-        self.bonsai_state = {"cart_position": float(observation[0]),
-                       "cart_velocity": float(observation[1]),
-                       "pole_angle":    float(observation[2]),
-                       "pole_angular_velocity": float(observation[3])}
-					   
-        return self.bonsai_state
+    def gym_episode_start(self, config: Dict[str, Any]):
+        """ Resets the environment, config can set the initial cart position and pole angle
+        """
+        observation = super().gym_episode_start(config)
+        if not config:
+            return observation
 
-    def state_to_gym(self, state):
-        return [state["cart_position"],state["cart_velocity"], state["pole_angle"], state["pole_angular_velocity"] ]
+        state = np.array(self._env.unwrapped.state, dtype=np.float64)
+        state[0] = config.get("initial_cart_position", state[0])
+        state[2] = config.get("initial_pole_angle", state[2])
+        self._env.unwrapped.state = state
 
-    def action_to_gym(self, action):
-        """ Converts Bonsai action type into openai environment action.       
-        """ 
-        return action['command']
+        return np.array(state, dtype=np.float32)
 
     def gym_to_action(self, gym_action):
         return {"command": gym_action}
@@ -45,7 +53,8 @@ class CartPole(GymSimulator):
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment 
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
 if __name__ == "__main__":
@@ -56,9 +65,7 @@ if __name__ == "__main__":
     log = logging.getLogger("cartpole")
     log.setLevel(level='DEBUG')
 
-    #if more information is needed, uncomment this
-    #gymlog = logging.getLogger("GymSimulator")
-    #gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=cartpole,GymSimulator
 
     cartpole = CartPole()
     connector = BonsaiConnector(cartpole)
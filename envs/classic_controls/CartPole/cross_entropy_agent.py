@@ -1,7 +1,7 @@
+import argparse
 import logging
-from collections import namedtuple
+from time import perf_counter
 import numpy as np
-from tensorboardX import SummaryWriter
 
 import torch
 import torch.nn as nn
@@ -11,8 +11,15 @@ import torch.optim as optim
 HIDDEN_SIZE = 128
 BATCH_SIZE = 16
 PERCENTILE = 70
+# envs stepped together, each iteration every env plays BATCH_SIZE / NUM_ENVS episodes
+NUM_ENVS = 16
+# best episodes kept across iterations and trained on with the elites of each batch
+ELITE_EPISODES = 16
+# the discrete commands of CartPole, push the cart to the left or to the right
+N_ACTIONS = 2
 
 from cartpole import CartPole
+from gym_connectors import NumpyPolicy, VectorGymSimulator, open_sink, save_policy
 
 class Net(nn.Module):
     def __init__(self, obs_size, hidden_size, n_actions):
@@ -26,89 +33,225 @@ class Net(nn.Module):
     def forward(self, x):
         return self.net(x)
 
+    def save(self, path, state_fields, action_field='command'):
+        """ Saves the weights as an npz file that NumpyPolicy loads without torch
+        """
+        layers = [layer for layer in self.net if isinstance(layer, nn.Linear)]
+        save_policy(path,
+                    [layer.weight.detach().numpy() for layer in layers],
+                    [layer.bias.detach().numpy() for layer in layers],
+                    state_fields, action_field)
+
+    @classmethod
+    def load(cls, path):
+        """ Creates the net saved with save()
+        """
+        policy = NumpyPolicy.load(path)
+        # NumpyPolicy holds the weights transposed
+        obs_size, hidden_size = policy.weights[0].shape
+        n_actions = policy.weights[1].shape[1]
+
+        net = cls(obs_size, hidden_size, n_actions)
+        layers = [layer for layer in net.net if isinstance(layer, nn.Linear)]
+        with torch.no_grad():
+            for layer, weight, bias in zip(layers, policy.weights, policy.biases):
+                layer.weight.copy_(torch.from_numpy(weight.T.copy()))
+                layer.bias.copy_(torch.from_numpy(bias))
+        return net
+
+class EpisodeBuffer:
+    """ The steps of the episodes of one iteration, in arrays that grow by doubling
+
+        Every row holds the observation, the action and the id of the episode
+        of one step, the rows of the envs stepped together are appended as one block
+    """
+
+    def __init__(self, obs_size, capacity=4096):
+        self.observations = np.empty((capacity, obs_size), dtype=np.float32)
+        self.actions = np.empty(capacity, dtype=np.int64)
+        self.episodes = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def clear(self):
+        self.size = 0
+
+    def _reserve(self, count):
+        capacity = len(self.actions)
+        if self.size + count <= capacity:
+            return
+        while capacity < self.size + count:
+            capacity *= 2
+
+        for name in ('observations', 'actions', 'episodes'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def append(self, observations, actions, episodes):
+        count = len(actions)
+        self._reserve(count)
+        self.observations[self.size:self.size + count] = observations
+        self.actions[self.size:self.size + count] = actions
+        self.episodes[self.size:self.size + count] = episodes
+        self.size += count
+
+    def select(self, episode_ids):
+        """ Returns the observations and actions of the given episodes grouped by
+            episode in the order of episode_ids, and the length of each episode
+        """
+        episodes = self.episodes[:self.size]
+        rows = np.flatnonzero(np.isin(episodes, episode_ids))
+        # stable, so the steps of an episode stay in order
+        position = np.argsort(episode_ids)[np.searchsorted(np.sort(episode_ids), episodes[rows])]
+        rows = rows[np.argsort(position, kind='stable')]
+        lengths = np.bincount(position, minlength=len(episode_ids))
+        return self.observations[rows], self.actions[rows], lengths
+
+    @property
+    def nbytes(self):
+        return self.observations.nbytes + self.actions.nbytes + self.episodes.nbytes
+
+
+class EliteBuffer:
+    """ Keeps the steps of the best episodes seen so far, at most max_episodes of them
+    """
+
+    def __init__(self, obs_size, max_episodes):
+        self.max_episodes = max_episodes
+        self.observations = np.empty((0, obs_size), dtype=np.float32)
+        self.actions = np.empty(0, dtype=np.int64)
+        self.lengths = np.empty(0, dtype=np.int64)
+        self.rewards = np.empty(0, dtype=np.float64)
+
+    def update(self, observations, actions, lengths, rewards):
+        """ Adds the episodes and drops the worst ones beyond max_episodes,
+            on equal rewards the newer episodes are kept
+        """
+        observations = np.concatenate([self.observations, observations])
+        actions = np.concatenate([self.actions, actions])
+        lengths = np.concatenate([self.lengths, lengths])
+        rewards = np.concatenate([self.rewards, rewards])
+
+        if len(rewards) > self.max_episodes:
+            newest_first = np.argsort(-rewards[::-1], kind='stable')[:self.max_episodes]
+            keep = np.zeros(len(rewards), dtype=bool)
+            keep[len(rewards) - 1 - newest_first] = True
+
+            steps = np.repeat(keep, lengths)
+            observations, actions = observations[steps], actions[steps]
+            lengths, rewards = lengths[keep], rewards[keep]
+
+        self.observations, self.actions, self.lengths, self.rewards = observations, actions, lengths, rewards
+
+    @property
+    def nbytes(self):
+        return self.observations.nbytes + self.actions.nbytes + self.lengths.nbytes + self.rewards.nbytes
+
+
 class CartPoleTraining:
     """ Training cartpole using cross entropy agoritham based on the code from the book
     'Deep Reinforcement Learning Hands-On'
     """
-    Episode = namedtuple('Episode', field_names=['reward', 'steps'])
-    EpisodeStep = namedtuple('EpisodeStep', field_names=['observation', 'action'])
 
-    def __init__(self) -> None:
-        self.cartpole = CartPole()
+    def __init__(self, num_envs: int = NUM_ENVS, backend: str = 'batched', workers: int = None,
+                 elite_episodes: int = ELITE_EPISODES) -> None:
+        """ Creates the envs the rollouts are collected from, the 'batched' backend
+            steps them with one array operation, 'subprocess' spreads the gym envs
+            over worker processes (one per env unless workers is given)
+        """
+        options = {"workers": workers} if backend == 'subprocess' and workers else {}
+        self.envs = VectorGymSimulator(CartPole, num_envs, backend=backend, **options)
+        self.rng = np.random.RandomState()
 
-    def iterate_batches(self, net, batch_size):
-        batch = []
-        episode_reward = 0.0
-        episode_steps = []
+        # every observation value is mapped to a state field
+        self.obs_size = len(CartPole.state_mapping)
+        self.buffer = EpisodeBuffer(self.obs_size)
+        self.elites = EliteBuffer(self.obs_size, elite_episodes)
 
-        #start the episode
-        self.cartpole.episode_start()
-        state = self.cartpole.get_state()
+    def action_probabilities(self, net, observations):
+        """ Runs one forward pass for the observations of all the envs
+        """
+        with torch.no_grad():
+            logits = net(torch.as_tensor(observations, dtype=torch.float32))
+            return torch.softmax(logits, dim=1).numpy()
 
-        obs = self.cartpole.state_to_gym(state)
+    def sample_actions(self, probabilities):
+        """ Samples one action per row of the probabilities
+        """
+        cumulative = probabilities.cumsum(axis=1)
+        actions = (self.rng.random_sample((len(probabilities), 1)) > cumulative).sum(axis=1)
+        return np.minimum(actions, probabilities.shape[1] - 1)
 
-        sm = nn.Softmax(dim=1)
-        while True:
-            obs_v = torch.FloatTensor([obs])
-            act_probs_v = sm(net(obs_v))
-            act_probs = act_probs_v.data.numpy()[0]
-            action = np.random.choice(len(act_probs), p=act_probs)
-            
-            bonsai_action = self.cartpole.gym_to_action(action)
-
-            self.cartpole.episode_step(bonsai_action)
+    def iterate_batches(self, net, batch_size):
+        """ Yields the ids and rewards of batches of whole episodes played with
+            the current weights of the net, their steps are in self.buffer
 
-            is_done = self.cartpole.halted()
-            reward = self.cartpole.get_last_reward()
-            next_obs = self.cartpole.state_to_gym(self.cartpole.get_state())
+            Every iteration starts all the envs again and each env plays the same
+            number of episodes, so the longer episodes are not left out of the
+            batch in favour of the ones that finished first
+        """
+        envs = self.envs
+        quota = -(-batch_size // envs.num_envs)
 
-            episode_reward += reward
-            step = self.EpisodeStep(observation=obs, action=action)
-            episode_steps.append(step)
-            if is_done:
-                e = self.Episode(reward=episode_reward, steps=episode_steps)
-                batch.append(e)
-                episode_reward = 0.0
-                episode_steps = []
-                self.cartpole.episode_finish("")
+        while True:
+            taken = []
+            counts = np.zeros(envs.num_envs, dtype=np.int64)
+            env_episodes = np.arange(envs.num_envs)
+            next_episode = envs.num_envs
+            self.buffer.clear()
 
-                self.cartpole.episode_start()
-                state = self.cartpole.get_state()
+            envs.episode_start()
+            while counts.min() < quota:
+                obs = envs.get_state()
+                actions = self.sample_actions(self.action_probabilities(net, obs))
+                envs.episode_step(actions)
+                self.buffer.append(obs, actions, env_episodes)
 
-                next_obs = self.cartpole.state_to_gym(state)
+                for index in np.flatnonzero(envs.finished):
+                    if counts[index] < quota:
+                        taken.append((counts[index], index, env_episodes[index], envs.last_episode_rewards[index]))
+                        counts[index] += 1
+                    env_episodes[index] = next_episode
+                    next_episode += 1
 
-                if len(batch) == batch_size:
-                    yield batch
-                    batch = []
-            obs = next_obs
+            taken.sort(key=lambda episode: episode[:2])
+            taken = taken[:batch_size]
+            yield (np.array([episode for _, _, episode, _ in taken]),
+                   np.array([reward for _, _, _, reward in taken]))
 
     def filter_batch(self, batch, percentile):
-        rewards = list(map(lambda s: s.reward, batch))
+        """ Returns the steps of the elite episodes of the batch and of the elite
+            buffer as tensors, then keeps the best of them in the elite buffer
+        """
+        episode_ids, rewards = batch
         reward_bound = np.percentile(rewards, percentile)
         reward_mean = float(np.mean(rewards))
 
-        train_obs = []
-        train_act = []
-        for reward, steps in batch:
-            if reward < reward_bound:
-                continue
-            train_obs.extend(map(lambda step: step.observation, steps))
-            train_act.extend(map(lambda step: step.action, steps))
+        elite = rewards >= reward_bound
+        train_obs, train_act, lengths = self.buffer.select(episode_ids[elite])
+
+        if self.elites.max_episodes > 0:
+            kept_obs, kept_act = self.elites.observations, self.elites.actions
+            self.elites.update(train_obs, train_act, lengths, rewards[elite])
+            train_obs = np.concatenate([train_obs, kept_obs])
+            train_act = np.concatenate([train_act, kept_act])
 
-        train_obs_v = torch.FloatTensor(train_obs)
-        train_act_v = torch.LongTensor(train_act)
+        train_obs_v = torch.from_numpy(train_obs)
+        train_act_v = torch.from_numpy(train_act)
         return train_obs_v, train_act_v, reward_bound, reward_mean
 
     def train(self):
-        obs_size = self.cartpole._env.unwrapped.observation_space.shape[0]
-        n_actions = self.cartpole._env.unwrapped.action_space.n
-
-        net = Net(obs_size, HIDDEN_SIZE, n_actions)
+        net = Net(self.obs_size, HIDDEN_SIZE, N_ACTIONS)
         objective = nn.CrossEntropyLoss()
         optimizer = optim.Adam(params=net.parameters(), lr=0.01)
-        writer = SummaryWriter(comment="-cartpole")
+        metrics = open_sink(comment="-cartpole")
 
+        started = perf_counter()
+        iteration_started = started
         for iter_no, batch in enumerate(self.iterate_batches(net, BATCH_SIZE)):
+            rollout_time = perf_counter() - iteration_started
+
             obs_v, acts_v, reward_b, reward_m = self.filter_batch(batch, PERCENTILE)
             optimizer.zero_grad()
             action_scores_v = net(obs_v)
@@ -117,26 +260,49 @@ class CartPoleTraining:
             optimizer.step()
             
             #env.render()
-            
-            print("%d: loss=%.3f, reward_mean=%.1f, rw_bound=%.1f" % (
-                iter_no, loss_v.item(), reward_m, reward_b))
-            writer.add_scalar("loss", loss_v.item(), iter_no)
-            writer.add_scalar("reward_bound", reward_b, iter_no)
-            writer.add_scalar("reward_mean", reward_m, iter_no)
+
+            iteration_time = perf_counter() - iteration_started
+            buffer_mb = (self.buffer.nbytes + self.elites.nbytes) / 2 ** 20
+            iteration_started = perf_counter()
+
+            print("%d: loss=%.3f, reward_mean=%.1f, rw_bound=%.1f, time=%.1fms (rollout %.1fms), buffers=%.2fMB" % (
+                iter_no, loss_v.item(), reward_m, reward_b, iteration_time * 1000, rollout_time * 1000, buffer_mb))
+            metrics.add_scalars({"loss": loss_v.item(),
+                                 "reward_bound": reward_b,
+                                 "reward_mean": reward_m,
+                                 "iteration_seconds": iteration_time,
+                                 "rollout_seconds": rollout_time,
+                                 "buffer_megabytes": buffer_mb}, iter_no)
             if reward_m > 199:
-                print("Solved!")
+                print("Solved in %.1fs!" % (perf_counter() - started))
                 break
-        writer.close()
+        metrics.close()
+        self.envs.close()
+        return net
+
+    def state_fields(self):
+        """ Returns the Bonsai state fields in the order of the gym observation
+        """
+        return [field for field, _ in sorted(CartPole.state_mapping.items(), key=lambda item: item[1])]
 
 if __name__ == '__main__':
     logging.basicConfig()
     log = logging.getLogger("cartpole")
     log.setLevel(level='INFO')
 
-    cross_entropy_agent = CartPoleTraining()
-    cross_entropy_agent.train()
-    
-    #TODO  save the model after training and load it in agent 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-envs', type=int, default=NUM_ENVS)
+    parser.add_argument('--backend', default='batched', choices=['batched', 'subprocess', 'sync'],
+                        help="'subprocess' steps the gym envs in worker processes, one per core with --workers.")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--elite-episodes', type=int, default=ELITE_EPISODES,
+                        help="Best episodes kept across iterations, 0 trains on the elites of each batch only.")
+    parser.add_argument('--model', default='cartpole_net.npz',
+                        help="File the trained net is saved to, used by agent.py --model.")
+    args, _ = parser.parse_known_args()
+
+    cross_entropy_agent = CartPoleTraining(args.num_envs, args.backend, args.workers, args.elite_episodes)
+    net = cross_entropy_agent.train()
 
-    # we will use our environment (wrapper of OpenAI env)
-    cartpole = CartPole()
+    net.save(args.model, cross_entropy_agent.state_fields())
+    print("Saved the trained net to %s" % args.model)
@@ -1,5 +1,5 @@
 import logging
-import requests
+from gym_connectors import PredictionClient, open_sink
 from typing import Any, Dict
 from mountain_car import MountainCar
 
@@ -8,19 +8,17 @@ class BonsaiAgent(object):
     """ The agent that gets the action from the trained brain exported as docker image and started locally
     """
 
+    def __init__(self, client: PredictionClient = None):
+        self.client = client or PredictionClient()
+
     def act(self, state) -> Dict[str, Any]:
         action = self.predict(state)
         action["command"] = int(action["command"])
         return action
 
     def predict(self, state):
-        #local endpoint when running trained brain locally in docker container
-        url = "http://localhost:5000/v1/prediction"
-
-        response = requests.get(url, json=state)
-        action = response.json()
-
-        return action
+        #local endpoint of the trained brain running in docker, unless BONSAI_PREDICTION_URL is set
+        return self.client.predict(state)
 
 
 class RandomAgent(object):
@@ -46,6 +44,8 @@ if __name__ == '__main__':
     # RandomAgent that randomly selects next action
     agent = BonsaiAgent()
 
+    metrics = open_sink(comment="-mountain-car-agent")
+
     episode_count = 100
 
     try:
@@ -65,7 +65,11 @@ if __name__ == '__main__':
                 if mountain_car.halted():
                     break
 
+            metrics.add_scalar("reward", mountain_car.get_episode_reward(), i)
+            metrics.add_scalar("episode_length", mountain_car.iteration_count, i)
             mountain_car.episode_finish("")
 
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        metrics.close()
@@ -1,9 +1,11 @@
 import logging
 from typing import Any, Dict
 
-from gym_connectors import BonsaiConnector, GymSimulator
+import numpy as np
+from gym_connectors import BatchedMountainCar, BonsaiConnector, GymSimulator, get_tracer
 
 log = logging.getLogger("mountain-car")
+trace = get_tracer("mountain-car")
 
 class MountainCar(GymSimulator):
     """ Implements the methods specific to Open AI Gym Mountain Car environment 
@@ -11,6 +13,14 @@ class MountainCar(GymSimulator):
     
     environment_name = 'MountainCar-v0'      # Environment name, from openai-gym
 
+    # places of the Bonsai state and action fields in the gym observation and action
+    state_mapping = {"position": 0,
+                     "speed": 1}
+    action_mapping = {"command": None}     # Open AI env doesn't expect array here
+
+    # steps many instances at once in VectorGymSimulator(MountainCar, n, backend='batched')
+    batched_kernel = BatchedMountainCar
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the Mountain Car environment
         """
@@ -19,26 +29,25 @@ class MountainCar(GymSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
-    # convert openai gym observation to our state type
-
-    def gym_to_state(self, observation) -> Dict[str, Any]:
-        """ Converts openai environment observation to Bonsai state, as defined in inkling
+    def gym_episode_start(self, config: Dict[str, Any]):
+        """ Resets the environment, config can set the initial position and speed
         """
-        self.bonsai_state = {"position": float(observation[0]),
-                             "speed": float(observation[1])}
+        observation = super().gym_episode_start(config)
+        if not config:
+            return observation
 
-        return self.bonsai_state
+        state = np.array(self._env.unwrapped.state, dtype=np.float64)
+        state[0] = config.get("initial_position", state[0])
+        state[1] = config.get("initial_speed", state[1])
+        self._env.unwrapped.state = state
 
-    def action_to_gym(self, action: Dict[str, Any]):
-        """ Converts Bonsai action type into openai environment action.       
-        """
-        actionValue = action['command']    #Open AI env doesn't expect array here
-        return actionValue
+        return np.array(state, dtype=np.float32)
 
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment 
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
 
@@ -50,9 +59,7 @@ if __name__ == "__main__":
     log = logging.getLogger("mountain-car")
     log.setLevel(level='DEBUG')
 
-    #if more information is needed, uncomment this
-    #gymlog = logging.getLogger("GymSimulator")
-    #gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=mountain-car,GymSimulator
 
     mountain_car = MountainCar()
     connector = BonsaiConnector(mountain_car)
@@ -2,9 +2,10 @@ import logging
 from typing import Any, Dict
 
 import numpy as np
-from gym_connectors import BonsaiConnector, GymSimulator
+from gym_connectors import BatchedPendulum, BonsaiConnector, GymSimulator, get_tracer
 
 log = logging.getLogger("pendulum")
+trace = get_tracer("pendulum")
 
 class Pendulum(GymSimulator):
     """ Implements the methods specific to Open AI Gym Pendulum environment 
@@ -12,6 +13,18 @@ class Pendulum(GymSimulator):
 
     environment_name = 'Pendulum-v0'           # Environment name, from openai-gym
 
+    # places of the Bonsai state and action fields in the gym observation and action
+    state_mapping = {"cos_theta": 0,
+                     "sin_theta": 1,
+                     "angular_velocity": 2}
+    action_mapping = {"command": 0}        # Pendulum environment expects an array of actions
+
+    # steps many instances at once in VectorGymSimulator(Pendulum, n, backend='batched')
+    batched_kernel = BatchedPendulum
+
+    # the render thread draws the last torque applied as well
+    render_attributes = ('state', 'last_u')
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the Pendulum environment
         """
@@ -21,21 +34,6 @@ class Pendulum(GymSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
-    def gym_to_state(self, observation) -> Dict[str, Any]:
-        """ Converts openai environment observation to Bonsai state, as defined in inkling
-        """
-        self.bonsai_state = {"cos_theta": float(observation[0]),
-                             "sin_theta": float(observation[1]),
-                             "angular_velocity": float(observation[2])}
-
-        return self.bonsai_state
-
-    def action_to_gym(self, action: Dict[str, Any]):
-        """ Converts Bonsai action type into openai environment action.       
-        """
-        actionValue = action['command']
-        return [actionValue]      # Pendulum environment expects an array of actions 
-
     def gym_episode_start(self, config: Dict[str, Any]):
         """ Called during episode_start() to return the initial observation
             after reseting the gym environment. 
@@ -69,7 +67,8 @@ class Pendulum(GymSimulator):
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment 
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
 
@@ -81,9 +80,7 @@ if __name__ == "__main__":
     log = logging.getLogger("pendulum")
     log.setLevel(level='DEBUG')
 
-    #if more information is needed, uncomment this
-    #gymlog = logging.getLogger("GymSimulator")
-    #gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=pendulum,GymSimulator
 
     pendulum = Pendulum()
     connector = BonsaiConnector(pendulum)
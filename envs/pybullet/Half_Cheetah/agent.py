@@ -1,5 +1,5 @@
 import logging
-import requests
+from gym_connectors import PredictionClient, open_sink
 from typing import Any, Dict
 from half_cheetah import HalfCheetah
 
@@ -8,19 +8,17 @@ class BonsaiAgent(object):
     """ The agent that gets the action from the trained brain exported as docker image and started locally
     """
 
+    def __init__(self, client: PredictionClient = None):
+        self.client = client or PredictionClient()
+
     def act(self, state) -> Dict[str, Any]:
         action = self.predict(state)
 
         return action
 
     def predict(self, state):
-        # local endpoint when running trained brain locally in docker container
-        url = "http://localhost:5000/v1/prediction"
-
-        response = requests.get(url, json=state)
-        action = response.json()
-
-        return action
+        # local endpoint of the trained brain running in docker, unless BONSAI_PREDICTION_URL is set
+        return self.client.predict(state)
 
 
 if __name__ == '__main__':
@@ -36,6 +34,8 @@ if __name__ == '__main__':
     # RandomAgent that randomly selects next action
     agent = BonsaiAgent()
 
+    metrics = open_sink(comment="-half-cheetah-agent")
+
     # half_cheetah._env.render()
     # half_cheetah._env.reset()
 
@@ -67,7 +67,11 @@ if __name__ == '__main__':
                 if half_cheetah.halted():
                     break
 
+            metrics.add_scalar("reward", half_cheetah.get_episode_reward(), i)
+            metrics.add_scalar("episode_length", half_cheetah.iteration_count, i)
             half_cheetah.episode_finish("")
 
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        metrics.close()
@@ -3,9 +3,10 @@ from typing import Any, Dict
 
 
 import numpy as np
-from gym_connectors import BonsaiConnector, PyBulletSimulator
+from gym_connectors import BonsaiConnector, PyBulletSimulator, get_tracer
 
 log = logging.getLogger("half_cheetah")
+trace = get_tracer("half_cheetah")
 
 
 class HalfCheetah(PyBulletSimulator):
@@ -15,6 +16,11 @@ class HalfCheetah(PyBulletSimulator):
     # Environment name, from openai-gym
     environment_name = 'HalfCheetahPyBulletEnv-v0'
 
+    # the observation is sent as is, the joints and progress are added by gym_to_state
+    state_mapping = {"obs": ...}
+    # Half Cheetah environment expects an array of actions
+    action_mapping = {"j1": 0, "j2": 1, "j3": 2, "j4": 3, "j5": 4, "j6": 5}
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the Half cheetah environment
         """
@@ -24,46 +30,34 @@ class HalfCheetah(PyBulletSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
+    def make_environment(self, headless):
+        super().make_environment(headless)
+
+        # the robot outlives the resets of the environment
+        self._unwrapped = self._env.unwrapped
+        self._robot = self._unwrapped.robot
+
     def gym_to_state(self, state) -> Dict[str, Any]:
         """ Converts openai environment state to Bonsai state, as defined in inkling
         """
-
-        joint_speeds = self._env.unwrapped.robot.joint_speeds
-
-        joints_at_limit = float(self._env.unwrapped.robot.joints_at_limit)
-
-        potential = float(self._env.unwrapped.potential)
+        potential = float(self._unwrapped.potential)
         if self.prev_potential is None:
             self.prev_potential = potential
 
-        progress = potential - self.prev_potential
-
-        self.bonsai_state = {"obs": state.tolist(),
-                             "joint_speeds": joint_speeds.tolist(),
-                             "joints_at_limit": joints_at_limit,
-                             "progress": progress}
+        self.bonsai_state = super().gym_to_state(state)
+        self.bonsai_state["joint_speeds"] = self._robot.joint_speeds.tolist()
+        self.bonsai_state["joints_at_limit"] = float(self._robot.joints_at_limit)
+        self.bonsai_state["progress"] = potential - self.prev_potential
 
         self.prev_potential = potential
 
         return self.bonsai_state
 
-    def action_to_gym(self, action: Dict[str, Any]):
-        """ Converts Bonsai action type into openai environment action.
-        """
-        j1 = action['j1']
-        j2 = action['j2']
-        j3 = action['j3']
-        j4 = action['j4']
-        j5 = action['j5']
-        j6 = action['j6']
-
-        # Half Cheetah environment expects an array of actions
-        return [j1, j2, j3, j4, j5, j6]
-
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
     def initialize_camera(self, distance, yaw, pitch, x=0, y=0, z=0):
@@ -83,9 +77,7 @@ if __name__ == "__main__":
     log = logging.getLogger("half_cheetah")
     log.setLevel(level='INFO')
 
-    # if more information is needed, uncomment this
-    # gymlog = logging.getLogger("GymSimulator")
-    # gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=half_cheetah,GymSimulator
 
     half_cheetah = HalfCheetah()
     connector = BonsaiConnector(half_cheetah)
@@ -1,5 +1,5 @@
 import logging
-import requests
+from gym_connectors import PredictionClient, open_sink
 from typing import Any, Dict
 from hopper import Hopper
 
@@ -8,19 +8,17 @@ class BonsaiAgent(object):
     """ The agent that gets the action from the trained brain exported as docker image and started locally
     """
 
+    def __init__(self, client: PredictionClient = None):
+        self.client = client or PredictionClient()
+
     def act(self, state) -> Dict[str, Any]:
         action = self.predict(state)
 
         return action
 
     def predict(self, state):
-        # local endpoint when running trained brain locally in docker container
-        url = "http://localhost:5000/v1/prediction"
-
-        response = requests.get(url, json=state)
-        action = response.json()
-
-        return action
+        # local endpoint of the trained brain running in docker, unless BONSAI_PREDICTION_URL is set
+        return self.client.predict(state)
 
 
 if __name__ == '__main__':
@@ -33,18 +31,14 @@ if __name__ == '__main__':
 
     # setting initial camera position
     hopper.initialize_camera(distance=2, yaw=10, pitch=-20)
-<<<<<<< HEAD
-=======
-
-    # setting initial camera position
-    hopper.initialize_camera(distance=2, yaw=10, pitch=-20)
->>>>>>> a7a19c68ba9116d31ce4ce6aa41b78dcd515d250
 
     # specify which agent you want to use,
     # BonsaiAgent that uses trained Brain or
     # RandomAgent that randomly selects next action
     agent = BonsaiAgent()
 
+    metrics = open_sink(comment="-hopper-agent")
+
     # hopper._env.render()
     # hopper._env.reset()
 
@@ -68,7 +62,11 @@ if __name__ == '__main__':
                 if hopper.halted():
                     break
 
+            metrics.add_scalar("reward", hopper.get_episode_reward(), i)
+            metrics.add_scalar("episode_length", hopper.iteration_count, i)
             hopper.episode_finish("")
 
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        metrics.close()
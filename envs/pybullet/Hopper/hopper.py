@@ -3,9 +3,10 @@ from typing import Any, Dict
 
 
 import numpy as np
-from gym_connectors import BonsaiConnector, PyBulletSimulator
+from gym_connectors import BonsaiConnector, PyBulletSimulator, get_tracer
 
 log = logging.getLogger("hopper")
+trace = get_tracer("hopper")
 
 
 class Hopper(PyBulletSimulator):
@@ -14,6 +15,11 @@ class Hopper(PyBulletSimulator):
 
     environment_name = 'HopperPyBulletEnv-v0'  # Environment name, from openai-gym
 
+    # the observation is sent as is, the body position and reward are added by gym_to_state
+    state_mapping = {"obs": ...}
+    # Hopper environment expects an array of actions
+    action_mapping = {"j1": 0, "j2": 1, "j3": 2}
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the Hopper environment
         """
@@ -22,38 +28,30 @@ class Hopper(PyBulletSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
+    def make_environment(self, headless):
+        super().make_environment(headless)
+
+        # the robot outlives the resets of the environment
+        self._robot = self._env.unwrapped.robot
+
     def gym_to_state(self, state) -> Dict[str, Any]:
         """ Converts openai environment state to Bonsai state, as defined in inkling
         """
-        
-        x = float(self._env.unwrapped.robot.body_xyz[0])
-
-        y = float(self._env.unwrapped.robot.body_xyz[1])
+        self.bonsai_state = super().gym_to_state(state)
 
-        z = float(self._env.unwrapped.robot.body_xyz[2])
-
-        self.bonsai_state = {"obs": state.tolist(),
-                             "rew": self.get_last_reward(),
-                             "body_x": x,
-                             "body_y": y,
-                             "body_z": z}
+        x, y, z = self._robot.body_xyz
+        self.bonsai_state["body_x"] = float(x)
+        self.bonsai_state["body_y"] = float(y)
+        self.bonsai_state["body_z"] = float(z)
+        self.bonsai_state["rew"] = self.get_last_reward()
 
         return self.bonsai_state
 
-    def action_to_gym(self, action: Dict[str, Any]):
-        """ Converts Bonsai action type into openai environment action.
-        """
-        j1 = action['j1']
-        j2 = action['j2']
-        j3 = action['j3']
-
-        # Hopper environment expects an array of actions
-        return [j1, j2, j3]
-
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
     def initialize_camera(self, distance, yaw, pitch, x=0, y=0, z=0):
@@ -73,9 +71,7 @@ if __name__ == "__main__":
     log = logging.getLogger("hopper")
     log.setLevel(level='INFO')
 
-    # if more information is needed, uncomment this
-    # gymlog = logging.getLogger("GymSimulator")
-    # gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=hopper,GymSimulator
 
     hopper = Hopper()
     connector = BonsaiConnector(hopper)
@@ -2,9 +2,10 @@ import logging
 from typing import Any, Dict
 
 
-from gym_connectors import BonsaiConnector, PyBulletSimulator
+from gym_connectors import BonsaiConnector, PyBulletSimulator, get_tracer
 
 log = logging.getLogger("reacher")
+trace = get_tracer("reacher")
 
 
 class Reacher(PyBulletSimulator):
@@ -13,6 +14,20 @@ class Reacher(PyBulletSimulator):
 
     environment_name = 'ReacherPyBulletEnv-v0'  # Environment name, from openai-gym
 
+    # the rewards and progress are added by gym_to_state
+    # gama is the name used by the inkling, the interface declares gamma
+    state_mapping = {"target_x": 0,
+                     "target_y": 1,
+                     "to_target_x": 2,
+                     "to_target_y": 3,
+                     "cos_theta": 4,
+                     "sin_theta": 5,
+                     "theta_velocity": 6,
+                     "gama": 7,
+                     "gama_velocity": 8}
+    # Reacher environment expects an array of actions
+    action_mapping = {"central_joint_torque": 0, "elbow_joint_torque": 1}
+
     def __init__(self, iteration_limit=200, skip_frame=1):
         """ Initializes the Reacher environment
         """
@@ -22,45 +37,32 @@ class Reacher(PyBulletSimulator):
 
         super().__init__(iteration_limit, skip_frame)
 
+    def make_environment(self, headless):
+        super().make_environment(headless)
+
+        self._unwrapped = self._env.unwrapped
+
     def gym_to_state(self, observation) -> Dict[str, Any]:
         """ Converts openai environment state to Bonsai state, as defined in inkling
         """
-        potential = float(self._env.unwrapped.potential)
+        potential = float(self._unwrapped.potential)
         if self.prev_potential is None:
             self.prev_potential = potential
 
-        progress = potential - self.prev_potential
-        
-        self.bonsai_state = {"target_x": float(observation[0]),
-                             "target_y": float(observation[1]),
-                             "to_target_x": float(observation[2]),
-                             "to_target_y": float(observation[3]),
-                             "cos_theta": float(observation[4]),
-                             "sin_theta": float(observation[5]),
-                             "theta_velocity": float(observation[6]),
-                             "gama": float(observation[7]),
-                             "gama_velocity": float(observation[8]),
-                             "rew": self.get_last_reward(),
-                             "episode_rew": self.get_episode_reward(),
-                             "progress": progress}
-        
-        self.prev_potential = potential
-        
-        return self.bonsai_state
+        self.bonsai_state = super().gym_to_state(observation)
+        self.bonsai_state["rew"] = self.get_last_reward()
+        self.bonsai_state["episode_rew"] = self.get_episode_reward()
+        self.bonsai_state["progress"] = potential - self.prev_potential
 
-    def action_to_gym(self, action: Dict[str, Any]):
-        """ Converts Bonsai action type into openai environment action.
-        """
-        central_joint_torque = action['central_joint_torque']
-        elbow_joint_torque = action['elbow_joint_torque']
+        self.prev_potential = potential
 
-        # Reacher environment expects an array of actions
-        return [central_joint_torque, elbow_joint_torque]
+        return self.bonsai_state
 
     def get_state(self) -> Dict[str, Any]:
         """ Returns the current state of the environment
         """
-        log.debug('get_state: {}'.format(self.bonsai_state))
+        if trace.enabled:
+            trace.trace('get_state: %s', self.bonsai_state)
         return self.bonsai_state
 
     def episode_start(self, config: Dict[str, Any] = None) -> None:
@@ -86,9 +88,7 @@ if __name__ == "__main__":
     log = logging.getLogger("reacher")
     log.setLevel(level='INFO')
 
-    # if more information is needed, uncomment this
-    # gymlog = logging.getLogger("GymSimulator")
-    # gymlog.setLevel(level='DEBUG')
+    # if more information is needed, set GYM_CONNECTORS_TRACE=reacher,GymSimulator
 
     reacher = Reacher()
     connector = BonsaiConnector(reacher)